@@ -0,0 +1,83 @@
+import time
+import logging
+from collections import deque
+from typing import Callable, Deque, Dict, Hashable
+
+
+_logger = logging.getLogger(__name__)
+
+
+class RequestPacer():
+    """Schedules requests to IB TWS within its pacing limits.
+
+    Works as a token bucket, where every spent token is returned exactly one
+    period after it was spent. Unlike a continuously refilled bucket, this
+    never exceeds the limit within any sliding window, so requests can be
+    sent right at the pacing ceiling without causing a violation.
+    """
+
+    def __init__(self,
+                 max_requests: int,
+                 period: float,
+                 identical_request_gap: float = 0,
+                 max_requests_per_contract: int = 0,
+                 contract_period: float = 0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self._max_requests = max_requests
+        self._period = period
+        self._identical_request_gap = identical_request_gap
+        self._max_requests_per_contract = max_requests_per_contract
+        self._contract_period = contract_period
+        self._clock = clock
+        self._slots: Deque[float] = deque(maxlen=max_requests)
+        self._identical_slots: Dict[Hashable, float] = {}
+        self._contract_slots: Dict[Hashable, Deque[float]] = {}
+
+    def reserve(self, request_key: Hashable, contract_key: Hashable) -> float:
+        """Reserve the earliest allowed slot for a request
+
+        :param request_key: Identifies identical requests
+        :type request_key: Hashable
+        :param contract_key: Identifies requests for the same contract
+        :type contract_key: Hashable
+        :return: Seconds to wait before sending the request
+        :rtype: float
+        """
+
+        now = self._clock()
+        self._prune(now=now)
+        # Slots are handed out in order, so the bucket stays sorted
+        slot = max(now, self._slots[-1]) if self._slots else now
+        if len(self._slots) == self._max_requests:
+            slot = max(slot, self._slots[0] + self._period)
+        if self._max_requests_per_contract > 0:
+            contract_slots = self._contract_slots.setdefault(
+                contract_key, deque(maxlen=self._max_requests_per_contract))
+            if len(contract_slots) == self._max_requests_per_contract:
+                slot = max(slot, contract_slots[0] + self._contract_period)
+        if request_key in self._identical_slots:
+            slot = max(slot, self._identical_slots[request_key]
+                       + self._identical_request_gap)
+        self._slots.append(slot)
+        if self._max_requests_per_contract > 0:
+            contract_slots.append(slot)
+        if self._identical_request_gap > 0:
+            self._identical_slots[request_key] = slot
+        return slot - now
+
+    def get_remaining_budget(self) -> int:
+        """Number of requests, that can be sent right now without waiting"""
+
+        window_start = self._clock() - self._period
+        used = sum(1 for slot in self._slots if slot > window_start)
+        return self._max_requests - used
+
+    # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
+
+    def _prune(self, now: float) -> None:
+        self._identical_slots = {
+            key: slot for key, slot in self._identical_slots.items()
+            if slot + self._identical_request_gap > now}
+        self._contract_slots = {
+            key: slots for key, slots in self._contract_slots.items()
+            if slots[-1] + self._contract_period > now}
@@ -0,0 +1,145 @@
+import logging
+from itertools import cycle
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from ib_insync.ib import IB
+
+from barbucket.api.request_pacer import RequestPacer
+from barbucket.util.config_reader import ConfigReader
+
+
+_logger = logging.getLogger(__name__)
+
+# IB pacing limits for historical data requests, they apply per gateway
+_HISTORICAL_MAX_REQUESTS = 60
+_HISTORICAL_PERIOD = 600
+_HISTORICAL_IDENTICAL_REQUEST_GAP = 15
+_HISTORICAL_MAX_REQUESTS_PER_CONTRACT = 5
+_HISTORICAL_CONTRACT_PERIOD = 2
+# IB limit for all other messages, it applies per client connection
+_MESSAGES_MAX_REQUESTS = 50
+_MESSAGES_PERIOD = 1
+
+
+class TwsConnection():
+    """A single client connection to a TWS or IB gateway, together with the
+    pacers for its requests"""
+
+    def __init__(self, host: str, port: int, client_id: int,
+                 historical_pacer: RequestPacer, ib: IB) -> None:
+        self.host = host
+        self.port = port
+        self.client_id = client_id
+        self.historical_pacer = historical_pacer
+        self.messages_pacer = RequestPacer(
+            max_requests=_MESSAGES_MAX_REQUESTS,
+            period=_MESSAGES_PERIOD)
+        self.ib = ib
+        self.ib.RaiseRequestErrors = True  # Enable exceptions
+
+    def __repr__(self) -> str:
+        return f"{self.host}:{self.port}/{self.client_id}"
+
+
+class TwsConnectionPool():
+    """Opens several client connections to one or more TWS or IB gateways
+    and hands them out in turn.
+
+    The client ids are read from the option 'client_ids_option' within the
+    'tws_connector' section, so different processes can use separate ids and
+    run side by side. 'ib_factory' creates the IB instance of every
+    connection and allows to connect against a simulated TWS.
+    """
+
+    def __init__(self, config_reader: ConfigReader,
+                 client_ids_option: str,
+                 ib_factory: Callable[[], IB] = IB) -> None:
+        self._config_reader = config_reader
+        self._client_ids_option = client_ids_option
+        self._ib_factory = ib_factory
+        self._connections: List[TwsConnection] = []
+        self._turns: Optional[Iterator[TwsConnection]] = None
+
+    def connect(self) -> None:
+        """Connect all client ids to all gateways"""
+
+        historical_pacers: Dict[Tuple[str, int], RequestPacer] = {}
+        connections = []
+        # Interleave the gateways, so taking turns spreads the requests
+        # across them
+        for client_id in self._get_client_ids():
+            for host, port in self._get_gateways():
+                pacer = historical_pacers.setdefault(
+                    (host, port), RequestPacer(
+                        max_requests=_HISTORICAL_MAX_REQUESTS,
+                        period=_HISTORICAL_PERIOD,
+                        identical_request_gap=_HISTORICAL_IDENTICAL_REQUEST_GAP,
+                        max_requests_per_contract=_HISTORICAL_MAX_REQUESTS_PER_CONTRACT,
+                        contract_period=_HISTORICAL_CONTRACT_PERIOD))
+                connections.append(TwsConnection(
+                    host=host, port=port, client_id=client_id,
+                    historical_pacer=pacer, ib=self._ib_factory()))
+        try:
+            for connection in connections:
+                connection.ib.connect(
+                    host=connection.host, port=connection.port,
+                    clientId=connection.client_id, readonly=True)
+                _logger.debug(f"Connected to TWS on '{connection}'.")
+        except BaseException:
+            for connection in connections:
+                connection.ib.disconnect()
+            raise
+        self._connections = connections
+        self._turns = cycle(connections)
+
+    def disconnect(self) -> None:
+        """Disconnect all connections"""
+
+        for connection in self._connections:
+            connection.ib.disconnect()
+            _logger.debug(f"Disconnected from TWS on '{connection}'.")
+        self._connections = []
+        self._turns = None
+
+    def get_connection(self) -> TwsConnection:
+        """Get the next connection in turn
+
+        :return: Connection to send the next request to
+        :rtype: TwsConnection
+        """
+
+        if self._turns is None:
+            raise ConnectionError("Connection pool is not connected.")
+        return next(self._turns)
+
+    def get_connections(self) -> List[TwsConnection]:
+        """Get all open connections"""
+
+        return list(self._connections)
+
+    def get_size(self) -> int:
+        """Number of open connections"""
+
+        return len(self._connections)
+
+    # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
+
+    def _get_client_ids(self) -> List[int]:
+        client_ids = self._config_reader.get_config_value_list(
+            section="tws_connector", option=self._client_ids_option)
+        return [int(client_id) for client_id in client_ids]
+
+    def _get_gateways(self) -> List[Tuple[str, int]]:
+        gateways = [(
+            self._config_reader.get_config_value_single(
+                section="tws_connector", option="host"),
+            int(self._config_reader.get_config_value_single(
+                section="tws_connector", option="port")))]
+        additional_gateways = self._config_reader.get_config_value_list(
+            section="tws_connector", option="additional_gateways")
+        for gateway in additional_gateways:
+            if gateway.strip() == "":
+                continue
+            host, port = gateway.strip().rsplit(":", maxsplit=1)
+            gateways.append((host, int(port)))
+        return gateways
@@ -1,9 +1,16 @@
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple, Union, Deque
+from collections import deque
+from datetime import date
+from math import ceil
+import asyncio
 import logging
 
-from ib_insync.ib import IB
+from ib_insync import util
 from ib_insync.contract import Stock, ContractDetails
+from ib_insync.objects import BarData
+from ib_insync.wrapper import RequestError
 
+from barbucket.api.tws_connection_pool import TwsConnection, TwsConnectionPool
 from barbucket.domain_model.data_classes import Contract, Quote, ContractDetailsIb
 from barbucket.domain_model.types import Api, Exchange, TickerSymbol, ApiNotationTranslator, Api
 from barbucket.util.config_reader import ConfigReader
@@ -11,35 +18,33 @@ from barbucket.util.custom_exceptions import InvalidDataReceivedError
 
 _logger = logging.getLogger(__name__)
 
+# Longest duration in days, that IB accepts for one request
+_MAX_DAYS_PER_REQUEST = 365
+
 
 class TwsConnector():
     """Provides methods to download data from IB TWS"""
 
     def __init__(self, config_reader: ConfigReader,
-                 api_notation_translator: ApiNotationTranslator) -> None:
+                 api_notation_translator: ApiNotationTranslator,
+                 connection_pool: TwsConnectionPool) -> None:
         self._config_reader = config_reader
         self._api_notation_translator = api_notation_translator
-        self._ib = IB()  # Create connection objec
-        self._ib.RaiseRequestErrors = True  # Enable exceptions
+        self._connection_pool = connection_pool
         logging.getLogger("ib_insync").setLevel(
             logging.WARN)  # todo: change with verbosity level option
 
     def connect(self) -> None:
         """Connect to TWS"""
 
-        HOST = self._config_reader.get_config_value_single(
-            section="tws_connector",
-            option="host")
-        PORT = int(self._config_reader.get_config_value_single(
-            section="tws_connector",
-            option="port"))
-        self._ib.connect(host=HOST, port=PORT, clientId=1, readonly=True)
-        _logger.debug(f"Connected to TWS on '{HOST}:{PORT}'.")
+        self._connection_pool.connect()
+        _logger.debug(f"Connected to TWS with "
+                      f"{self._connection_pool.get_size()} connections.")
 
     def disconnect(self) -> None:
         """Disconnect from TWS"""
 
-        self._ib.disconnect()
+        self._connection_pool.disconnect()
         _logger.debug("Disconnected from TWS.")
 
     def download_historical_quotes(
@@ -47,8 +52,13 @@ class TwsConnector():
         """Download historical quotes for a contract from IB TWS"""
 
         ib_contract = self._create_ib_contract(contract)
+        connection = self._connection_pool.get_connection()
+        delay = self._reserve_historical_request(
+            connection=connection, ib_contract=ib_contract,
+            duration=duration, end='')
+        connection.ib.sleep(delay)
         # Download quotes
-        ib_quotes = self._ib.reqHistoricalData(
+        ib_quotes = connection.ib.reqHistoricalData(
             contract=ib_contract,
             endDateTime='',
             durationStr=duration,
@@ -58,28 +68,184 @@ class TwsConnector():
         _logger.debug(
             f"Received {len(ib_quotes)} quotes for '{contract}' with "
             f"timeframe '{duration.replace(' ', '')}' from TWS.")
+        return self._create_quotes(contract=contract, ib_quotes=ib_quotes)
 
-        # Reformat recieved data
-        quotes = []
-        for ib_quote in ib_quotes:
-            quote = Quote(
-                # setting ‘contract' would cause a conflict within identity map, so we set 'contract_id'
-                contract_id=contract.id,
-                date=ib_quote.date,
-                open=ib_quote.open,
-                high=ib_quote.high,
-                low=ib_quote.low,
-                close=ib_quote.close,
-                volume=ib_quote.volume)
-            quotes.append(quote)
-        return quotes
+    def download_historical_quotes_concurrently(
+            self, requests: Iterable[Tuple[Contract, Optional[date]]],
+            initial_duration: str,
+            max_in_flight: int
+    ) -> Iterator[Tuple[Contract, Union[List[Quote], RequestError]]]:
+        """Download historical quotes for many contracts from IB TWS, keeping
+        up to 'max_in_flight' contracts in flight at the same time.
+
+        Every request holds the date of the first quote to download, or None
+        to download the 'initial_duration'. Results are yielded in the order
+        of the given requests. Failed requests yield the RequestError instead
+        of the quotes. The requests iterable is consumed lazily, so stopping
+        it drains the open requests.
+        """
+
+        pending: Deque[Tuple[Contract, asyncio.Task]] = deque()
+        requests = iter(requests)
+        loop = util.getLoop()
+        while True:
+            while len(pending) < max_in_flight:
+                try:
+                    contract, start_date = next(requests)
+                except StopIteration:
+                    break
+                duration = self.plan_historical_request(
+                    start_date=start_date, initial_duration=initial_duration)
+                task = loop.create_task(self._download_historical_quotes_async(
+                    contract=contract, duration=duration,
+                    start_date=start_date))
+                pending.append((contract, task))
+            if not pending:
+                return
+            contract, task = pending.popleft()
+            try:
+                quotes = util.run(task)
+            except RequestError as e:
+                yield contract, e
+            else:
+                yield contract, quotes
+
+    def plan_historical_request(
+            self, start_date: Optional[date], initial_duration: str) -> str:
+        """Find the shortest duration, that IB accepts, to download the
+        period from 'start_date' until today with one request
+
+        'ADJUSTED_LAST' quotes can only be requested until now, so long gaps
+        are not split into requests with an earlier 'endDateTime'. Gaps of
+        more than a year are requested in whole years and the received
+        quotes are trimmed to the gap.
+
+        :param start_date: First date to download, None to download the
+            'initial_duration'
+        :type start_date: Optional[date]
+        :param initial_duration: IB duration string for contracts without
+            quotes
+        :type initial_duration: str
+        :return: IB duration string
+        :rtype: str
+        """
+
+        if start_date is None:
+            return initial_duration
+        n_days = max((date.today() - start_date).days + 1, 1)
+        if n_days <= _MAX_DAYS_PER_REQUEST:
+            return f"{n_days} D"
+        return f"{ceil(n_days / _MAX_DAYS_PER_REQUEST)} Y"
 
     def download_contract_details(self, contract: Contract) -> ContractDetailsIb:
         """Download details for a contract from IB TWS
         """
 
         ib_contract = self._create_ib_contract(contract)
-        ib_details = self._ib.reqContractDetails(ib_contract)
+        connection = self._connection_pool.get_connection()
+        delay = connection.messages_pacer.reserve(
+            request_key=None, contract_key=None)
+        connection.ib.sleep(delay)
+        ib_details = connection.ib.reqContractDetails(ib_contract)
+        return self._create_details(contract=contract, ib_details=ib_details)
+
+    def download_contract_details_concurrently(
+            self, contracts: Iterable[Contract]
+    ) -> Iterator[Tuple[Contract, Union[ContractDetailsIb, RequestError,
+                                        InvalidDataReceivedError]]]:
+        """Download details for many contracts from IB TWS, keeping one
+        request in flight on every connection.
+
+        Results are yielded in the order of the given contracts. Failed
+        requests yield the exception instead of the details. The contracts
+        iterable is consumed lazily.
+        """
+
+        pending: Deque[Tuple[Contract, asyncio.Task]] = deque()
+        contracts = iter(contracts)
+        loop = util.getLoop()
+        while True:
+            while len(pending) < self._connection_pool.get_size():
+                try:
+                    contract = next(contracts)
+                except StopIteration:
+                    break
+                task = loop.create_task(
+                    self._download_contract_details_async(contract=contract))
+                pending.append((contract, task))
+            if not pending:
+                return
+            contract, task = pending.popleft()
+            try:
+                details = util.run(task)
+            except (RequestError, InvalidDataReceivedError) as e:
+                yield contract, e
+            else:
+                yield contract, details
+
+    def get_remaining_historical_budget(self) -> int:
+        """Number of historical data requests, that can be sent right now
+        without waiting for IB pacing limits"""
+
+        # Connections to the same gateway share their pacer
+        pacers = {id(connection.historical_pacer): connection.historical_pacer
+                  for connection in self._connection_pool.get_connections()}
+        return sum(pacer.get_remaining_budget() for pacer in pacers.values())
+
+    # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
+
+    def _reserve_historical_request(
+            self, connection: TwsConnection, ib_contract: Stock,
+            duration: str, end: Union[date, str]) -> float:
+        contract_key = (
+            ib_contract.symbol, ib_contract.exchange, ib_contract.currency)
+        request_key = (contract_key, duration, end)
+        delay = connection.historical_pacer.reserve(
+            request_key=request_key, contract_key=contract_key)
+        _logger.debug(
+            f"Reserved historical data request for '{ib_contract.symbol}' on "
+            f"'{connection}' in {delay:.1f}s, remaining budget is "
+            f"{connection.historical_pacer.get_remaining_budget()} requests.")
+        return delay
+
+    async def _download_historical_quotes_async(
+            self, contract: Contract, duration: str,
+            start_date: Optional[date]) -> List[Quote]:
+        ib_contract = self._create_ib_contract(contract)
+        connection = self._connection_pool.get_connection()
+        delay = self._reserve_historical_request(
+            connection=connection, ib_contract=ib_contract,
+            duration=duration, end='')
+        await asyncio.sleep(delay)
+        ib_quotes = await connection.ib.reqHistoricalDataAsync(
+            contract=ib_contract,
+            endDateTime='',
+            durationStr=duration,
+            barSizeSetting='1 day',
+            whatToShow='ADJUSTED_LAST',
+            useRTH=True)
+        if start_date is not None:
+            # Durations in years reach further back than the gap
+            ib_quotes = [ib_quote for ib_quote in ib_quotes
+                         if ib_quote.date >= start_date]
+        _logger.debug(
+            f"Received {len(ib_quotes)} quotes for '{contract}' with "
+            f"timeframe '{duration.replace(' ', '')}' from TWS.")
+        return self._create_quotes(contract=contract, ib_quotes=ib_quotes)
+
+    async def _download_contract_details_async(
+            self, contract: Contract) -> ContractDetailsIb:
+        ib_contract = self._create_ib_contract(contract)
+        connection = self._connection_pool.get_connection()
+        delay = connection.messages_pacer.reserve(
+            request_key=None, contract_key=None)
+        await asyncio.sleep(delay)
+        ib_details = await connection.ib.reqContractDetailsAsync(ib_contract)
+        return self._create_details(contract=contract, ib_details=ib_details)
+
+    def _create_details(
+            self, contract: Contract,
+            ib_details: List[ContractDetails]) -> ContractDetailsIb:
         self._validate_details(contract=contract, details=ib_details)
         _logger.debug(
             f"Received contract_details for '{contract}' from TWS")
@@ -96,7 +262,21 @@ class TwsConnector():
             subcategory=ib_details[0].subcategory)
         return details
 
-    # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
+    def _create_quotes(
+            self, contract: Contract, ib_quotes: List[BarData]) -> List[Quote]:
+        quotes = []
+        for ib_quote in ib_quotes:
+            quote = Quote(
+                # setting ‘contract' would cause a conflict within identity map, so we set 'contract_id'
+                contract_id=contract.id,
+                date=ib_quote.date,
+                open=ib_quote.open,
+                high=ib_quote.high,
+                low=ib_quote.low,
+                close=ib_quote.close,
+                volume=ib_quote.volume)
+            quotes.append(quote)
+        return quotes
 
     def _create_ib_contract(self, contract: Contract) -> Stock:
         exchange = Exchange[contract.exchange]
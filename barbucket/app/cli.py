@@ -7,6 +7,8 @@ from barbucket.builders.contracts_sync_processor_builder import build_contracts_
 from barbucket.builders.contract_details_ib_processor_builder import build_contract_details_ib_processor
 from barbucket.builders.contract_details_tv_processor_builder import build_contract_details_tv_processor
 from barbucket.builders.quotes_processor_builder import build_quotes_processor
+from barbucket.builders.quotes_quality_checker_builder import build_quotes_quality_checker
+from barbucket.builders.quotes_schema_migrator_builder import build_quotes_schema_migrator
 from barbucket.builders.universe_processor_builder import build_universe_processor
 from barbucket.domain_model.types import Exchange, ContractType
 
@@ -79,16 +81,61 @@ def quotes() -> None:
 
 @quotes.command()
 @click.option("-u", "--universe", "universe", required=True, type=str)
-def download(universe: str) -> None:
+@click.option("-r", "--resume", "resume", is_flag=True, default=False,
+              help="Continue the last run for this universe")
+def download(universe: str, resume: bool) -> None:
     """Download quotes from IB TWS"""
 
     universe = universe.upper()
     _logger.debug(
         f"User requested to download quotes from TWS for universe "
-        f"'{universe}' via the cli.")
+        f"'{universe}' (resume: {resume}) via the cli.")
     ib_quotes_processor = build_quotes_processor()
     ib_quotes_processor.download_historical_quotes(
-        universe=universe)
+        universe=universe, resume=resume)
+
+
+@quotes.command()
+@click.option("-u", "--universe", "universe", required=True, type=str)
+@click.option("-f", "--filtered-universe", "filtered_universe", type=str,
+              default=None,
+              help="Create a universe of all members, that passed")
+def check(universe: str, filtered_universe: str) -> None:
+    """Check the quality of quotes"""
+
+    universe = universe.upper()
+    _logger.debug(
+        f"User requested to check the quotes of universe '{universe}' via "
+        f"the cli.")
+    quotes_quality_checker = build_quotes_quality_checker()
+    quotes_quality_checker.check_universe(universe=universe)
+    if filtered_universe is not None:
+        quotes_quality_checker.create_filtered_universe(
+            universe=universe, name=filtered_universe.upper())
+
+
+@quotes.command()
+@click.option("-u", "--universe", "universe", required=True, type=str)
+def reset_no_data(universe: str) -> None:
+    """Download contracts without data again on the next run"""
+
+    universe = universe.upper()
+    _logger.debug(
+        f"User requested to reset the contracts without data of universe "
+        f"'{universe}' via the cli.")
+    ib_quotes_processor = build_quotes_processor()
+    ib_quotes_processor.reset_no_data_statuses(universe=universe)
+
+
+@quotes.command()
+def migrate_schema() -> None:
+    """Move quotes into the configured table layout"""
+
+    _logger.debug(
+        f"User requested to migrate the quotes schema via the cli.")
+    quotes_schema_migrator = build_quotes_schema_migrator()
+    n_quotes = quotes_schema_migrator.migrate()
+    _logger.info(f"Migrated {n_quotes} quotes.")
 
 
 # Group universes
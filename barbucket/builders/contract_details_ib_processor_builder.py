@@ -1,5 +1,6 @@
 from pathlib import Path
 
+from barbucket.api.tws_connection_pool import TwsConnectionPool
 from barbucket.api.tws_connector import TwsConnector
 from barbucket.business_logic.contract_details_ib_processor import ContractDetailsIbProcessor
 from barbucket.domain_model.data_classes import Base
@@ -24,9 +25,13 @@ def build_contract_details_ib_processor():
         base_class=Base)
     orm_session = orm_connector.get_session()
 
+    connection_pool = TwsConnectionPool(
+        config_reader=config_reader,
+        client_ids_option="details_client_ids")
     tws_connector = TwsConnector(
         config_reader=config_reader,
-        api_notation_translator=api_notation_translator)
+        api_notation_translator=api_notation_translator,
+        connection_pool=connection_pool)
 
     contract_details_ib_db_manager = ContractDetailsIbDbManager(
         orm_session=orm_session)
@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Optional
 
 from barbucket.business_logic.contracts_sync_processor import ContractSyncProcessor
 from barbucket.datasource_connectors.contract_extractor import ContractExtractor
@@ -10,6 +11,7 @@ from barbucket.domain_model.data_classes import Base
 from barbucket.domain_model.types import ApiNotationTranslator
 from barbucket.persistence.connectionstring_assembler import ConnectionStringAssembler
 from barbucket.persistence.data_managers import ContractsDbManager
+from barbucket.persistence.listing_page_cache import ListingPageCache
 from barbucket.persistence.orm_connector import OrmConnector
 from barbucket.util.config_reader import ConfigReader
 
@@ -29,7 +31,10 @@ def build_contracts_sync_processor():
     orm_session = orm_connector.get_session()
 
     downloader = HtmlDownloader(
-        api_notation_translator=api_notation_translator)
+        api_notation_translator=api_notation_translator,
+        page_cache=_build_listing_page_cache(config_reader=config_reader),
+        requests_per_second=float(config_reader.get_config_value_single(
+            section="contracts", option="listing_requests_per_second")))
     corrector = HtmlCorrector()
     pagecount_extractor = PageCountExtractor()
 
@@ -40,7 +45,11 @@ def build_contracts_sync_processor():
         downloader=downloader,
         corrector=corrector,
         pagecount_extractor=pagecount_extractor,
-        contract_extractor=contract_extractor,)
+        contract_extractor=contract_extractor,
+        max_concurrent_requests=int(config_reader.get_config_value_single(
+            section="contracts", option="listing_concurrent_requests")),
+        parse_processes=int(config_reader.get_config_value_single(
+            section="contracts", option="listing_parse_processes")))
 
     contracts_db_manager = ContractsDbManager(orm_session=orm_session)
 
@@ -50,3 +59,17 @@ def build_contracts_sync_processor():
         orm_session=orm_session)
 
     return contracts_sync_processor
+
+
+def _build_listing_page_cache(
+        config_reader: ConfigReader) -> Optional[ListingPageCache]:
+    directory = config_reader.get_config_value_single(
+        section="contracts", option="listing_cache_directory")
+    if directory == "":
+        return None
+    page_cache = ListingPageCache(
+        directory=Path.home() / ".barbucket" / directory,
+        ttl=float(config_reader.get_config_value_single(
+            section="contracts", option="listing_cache_ttl")))
+    page_cache.prune()
+    return page_cache
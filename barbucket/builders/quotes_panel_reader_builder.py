@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from barbucket.business_logic.quotes_panel_reader import QuotesPanelReader
+from barbucket.domain_model.data_classes import Base
+from barbucket.persistence.connectionstring_assembler import ConnectionStringAssembler
+from barbucket.persistence.data_managers import QuotesDbManager, QuotesStatusDbManager, UniverseDbManager
+from barbucket.persistence.orm_connector import OrmConnector
+from barbucket.builders.quotes_processor_builder import build_quotes_store
+from barbucket.util.config_reader import ConfigReader
+
+
+def build_quotes_panel_reader():
+    config_reader = ConfigReader(
+        filepath=Path.home() / ".barbucket/config.cfg")
+
+    connstring_assembler = ConnectionStringAssembler(
+        config_reader=config_reader)
+
+    orm_connector = OrmConnector(
+        connstring_assembler=connstring_assembler,
+        base_class=Base)
+    orm_session = orm_connector.get_session()
+
+    universe_db_manager = UniverseDbManager(orm_session=orm_session)
+
+    quotes_db_manager = QuotesDbManager(
+        orm_session=orm_session,
+        quotes_store=build_quotes_store(config_reader=config_reader),
+        compact=config_reader.get_config_value_single(
+            section="database", option="quotes_schema") == "compact")
+
+    status_db_manager = QuotesStatusDbManager(orm_session=orm_session)
+
+    cache_directory = config_reader.get_config_value_single(
+        section="quotes", option="panel_cache_directory")
+
+    quotes_panel_reader = QuotesPanelReader(
+        universe_db_manager=universe_db_manager,
+        quotes_db_manager=quotes_db_manager,
+        status_db_manager=status_db_manager,
+        cache_directory=(None if cache_directory == ""
+                         else Path.home() / ".barbucket" / cache_directory))
+
+    return quotes_panel_reader
@@ -1,12 +1,18 @@
 from pathlib import Path
+from typing import Optional
 
+from barbucket.api.tws_connection_pool import TwsConnectionPool
 from barbucket.api.tws_connector import TwsConnector
 from barbucket.business_logic.quotes_processor import QuotesProcessor
+from barbucket.business_logic.quotes_status_handler import QuotesStatusHandler
+from barbucket.business_logic.quotes_writer import QuotesWriter
 from barbucket.domain_model.data_classes import Base
 from barbucket.domain_model.types import ApiNotationTranslator
 from barbucket.persistence.connectionstring_assembler import ConnectionStringAssembler
-from barbucket.persistence.data_managers import QuotesDbManager, UniverseDbManager
+from barbucket.persistence.data_managers import QuotesDbManager, QuotesJournalDbManager, QuotesStatusDbManager, UniverseDbManager
 from barbucket.persistence.orm_connector import OrmConnector
+from barbucket.persistence.parquet_quotes_store import ParquetQuotesStore
+from barbucket.persistence.quotes_cache import QuotesCache
 from barbucket.util.config_reader import ConfigReader
 
 
@@ -26,17 +32,66 @@ def build_quotes_processor():
 
     universe_db_manager = UniverseDbManager(orm_session=orm_session)
 
-    quotes_db_manager = QuotesDbManager(orm_session=orm_session)
+    quotes_store = build_quotes_store(config_reader=config_reader)
+    quotes_cache = _build_quotes_cache(config_reader=config_reader)
+    compact = config_reader.get_config_value_single(
+        section="database", option="quotes_schema") == "compact"
+    quotes_db_manager = QuotesDbManager(
+        orm_session=orm_session, quotes_store=quotes_store,
+        quotes_cache=quotes_cache, compact=compact)
 
+    status_db_manager = QuotesStatusDbManager(orm_session=orm_session)
+
+    journal_db_manager = QuotesJournalDbManager(orm_session=orm_session)
+
+    # The writer runs in its own thread and needs its own session
+    writer_session = orm_connector.create_session()
+    quotes_writer = QuotesWriter(
+        quotes_db_manager=QuotesDbManager(
+            orm_session=writer_session, quotes_store=quotes_store,
+            quotes_cache=quotes_cache, compact=compact),
+        status_db_manager=QuotesStatusDbManager(orm_session=writer_session),
+        journal_db_manager=QuotesJournalDbManager(orm_session=writer_session),
+        config_reader=config_reader,
+        orm_session=writer_session)
+
+    connection_pool = TwsConnectionPool(
+        config_reader=config_reader,
+        client_ids_option="quotes_client_ids")
     tws_connector = TwsConnector(
         config_reader=config_reader,
-        api_notation_translator=api_notation_translator)
+        api_notation_translator=api_notation_translator,
+        connection_pool=connection_pool)
+
+    status_handler = QuotesStatusHandler()
 
     quotes_processor = QuotesProcessor(
         universe_db_manager=universe_db_manager,
         quotes_db_manager=quotes_db_manager,
+        status_db_manager=status_db_manager,
+        journal_db_manager=journal_db_manager,
+        quotes_writer=quotes_writer,
         tws_connector=tws_connector,
+        status_handler=status_handler,
         config_reader=config_reader,
         orm_session=orm_session)
 
     return quotes_processor
+
+
+def build_quotes_store(config_reader: ConfigReader) -> Optional[ParquetQuotesStore]:
+    storage = config_reader.get_config_value_single(
+        section="database", option="quotes_storage")
+    if storage != "parquet":
+        return None
+    directory = config_reader.get_config_value_single(
+        section="database", option="parquet_directory")
+    return ParquetQuotesStore(directory=Path.home() / ".barbucket" / directory)
+
+
+def _build_quotes_cache(config_reader: ConfigReader) -> Optional[QuotesCache]:
+    directory = config_reader.get_config_value_single(
+        section="database", option="quotes_cache_directory")
+    if directory == "":
+        return None
+    return QuotesCache(directory=Path.home() / ".barbucket" / directory)
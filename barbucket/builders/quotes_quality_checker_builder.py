@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from barbucket.builders.quotes_processor_builder import build_quotes_store
+from barbucket.business_logic.quotes_quality_checker import QuotesQualityChecker
+from barbucket.domain_model.data_classes import Base
+from barbucket.persistence.connectionstring_assembler import ConnectionStringAssembler
+from barbucket.persistence.data_managers import ContractsDbManager, QuotesDbManager, QuotesQualityDbManager, UniverseDbManager
+from barbucket.persistence.orm_connector import OrmConnector
+from barbucket.util.config_reader import ConfigReader
+
+
+def build_quotes_quality_checker():
+    config_reader = ConfigReader(
+        filepath=Path.home() / ".barbucket/config.cfg")
+
+    connstring_assembler = ConnectionStringAssembler(
+        config_reader=config_reader)
+    orm_connector = OrmConnector(
+        connstring_assembler=connstring_assembler,
+        base_class=Base)
+    orm_session = orm_connector.get_session()
+
+    universe_db_manager = UniverseDbManager(orm_session=orm_session)
+
+    contracts_db_manager = ContractsDbManager(orm_session=orm_session)
+
+    quotes_db_manager = QuotesDbManager(
+        orm_session=orm_session,
+        quotes_store=build_quotes_store(config_reader=config_reader),
+        compact=config_reader.get_config_value_single(
+            section="database", option="quotes_schema") == "compact")
+
+    quality_db_manager = QuotesQualityDbManager(orm_session=orm_session)
+
+    quotes_quality_checker = QuotesQualityChecker(
+        universe_db_manager=universe_db_manager,
+        contracts_db_manager=contracts_db_manager,
+        quotes_db_manager=quotes_db_manager,
+        quality_db_manager=quality_db_manager,
+        config_reader=config_reader,
+        orm_session=orm_session)
+
+    return quotes_quality_checker
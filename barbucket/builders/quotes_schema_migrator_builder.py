@@ -0,0 +1,33 @@
+from pathlib import Path
+
+from barbucket.business_logic.quotes_schema_migrator import QuotesSchemaMigrator
+from barbucket.domain_model.data_classes import Base
+from barbucket.persistence.connectionstring_assembler import ConnectionStringAssembler
+from barbucket.persistence.data_managers import QuotesDbManager
+from barbucket.persistence.orm_connector import OrmConnector
+from barbucket.util.config_reader import ConfigReader
+
+
+def build_quotes_schema_migrator():
+    config_reader = ConfigReader(
+        filepath=Path.home() / ".barbucket/config.cfg")
+
+    connstring_assembler = ConnectionStringAssembler(
+        config_reader=config_reader)
+    orm_connector = OrmConnector(
+        connstring_assembler=connstring_assembler,
+        base_class=Base)
+    orm_session = orm_connector.get_session()
+
+    # Migrate into the configured schema
+    compact = config_reader.get_config_value_single(
+        section="database", option="quotes_schema") == "compact"
+
+    quotes_schema_migrator = QuotesSchemaMigrator(
+        source_db_manager=QuotesDbManager(
+            orm_session=orm_session, compact=not compact),
+        target_db_manager=QuotesDbManager(
+            orm_session=orm_session, compact=compact),
+        orm_session=orm_session)
+
+    return quotes_schema_migrator
@@ -1,4 +1,5 @@
 import logging
+from typing import Iterator, List, Union
 
 from sqlalchemy.orm import Session
 import enlighten
@@ -6,7 +7,7 @@ from ib_insync.wrapper import RequestError
 
 from barbucket.api.tws_connector import TwsConnector
 from barbucket.persistence.data_managers import ContractDetailsIbDbManager, ContractsDbManager
-from barbucket.domain_model.data_classes import Contract
+from barbucket.domain_model.data_classes import Contract, ContractDetailsIb
 from barbucket.util.custom_exceptions import InvalidDataReceivedError
 from barbucket.util.signal_handler import SignalHandler
 
@@ -37,23 +38,33 @@ class ContractDetailsIbProcessor():
         progress_bar.total = len(contracts)
         _logger.info(f"Found {len(contracts)} contracts without IB-details.")
         self._tws_connector.connect()
-        for contract in contracts:
+        # Requests are spread across all connections of the TWS connector
+        results = self._tws_connector.download_contract_details_concurrently(
+            contracts=self._create_requests(
+                contracts=contracts, signal_handler=signal_handler))
+        for contract, result in results:
             self._orm_session.expunge_all()  # for speedup
-            if signal_handler.is_exit_requested():
-                break
-            self._handle_contract(contract=contract)
+            self._handle_result(contract=contract, result=result)
             progress_bar.update(inc=1)
         self._orm_session.close()
         self._tws_connector.disconnect()
 
     # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
 
-    def _handle_contract(self, contract: Contract) -> None:
-        try:
-            details = self._tws_connector.download_contract_details(
-                contract=contract)
-        except (RequestError, InvalidDataReceivedError) as e:
-            _logger.info(e.message)
+    def _create_requests(
+            self, contracts: List[Contract],
+            signal_handler: SignalHandler) -> Iterator[Contract]:
+        for contract in contracts:
+            if signal_handler.is_exit_requested():
+                return
+            yield contract
+
+    def _handle_result(
+            self, contract: Contract,
+            result: Union[ContractDetailsIb, RequestError,
+                          InvalidDataReceivedError]) -> None:
+        if isinstance(result, (RequestError, InvalidDataReceivedError)):
+            _logger.info(result.message)
         else:
-            self._details_db_manager.add_to_db(details=details)
+            self._details_db_manager.add_to_db(details=result)
             self._orm_session.commit()
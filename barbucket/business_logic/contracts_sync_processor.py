@@ -1,11 +1,13 @@
 import logging
 import datetime
+from typing import Dict, List, Tuple
 
 from sqlalchemy.orm import Session
 
 from barbucket.datasource_connectors.ib_exchange_listing_reader import IbExchangeListingReader
 from barbucket.persistence.data_managers import ContractsDbManager
 from barbucket.domain_model.data_classes import Contract
+from barbucket.domain_model.listing_contract import ContractKey, ListingContract
 from barbucket.domain_model.types import ContractType, Exchange
 from barbucket.util.custom_exceptions import ExitSignalDetectedError
 
@@ -24,32 +26,38 @@ class ContractSyncProcessor():
         self.override_user_acknowledge = False
 
     def sync_contracts_to_listing(self, exchange: Exchange) -> None:
+        """Add contracts from the exchange listing, that are missing in the
+        database, and remove contracts, that are not listed anymore.
+
+        Listing pages are compared against an index of the keys of the
+        database contracts, while the following pages are still downloading.
+        Only added and removed contracts are kept in memory.
+        """
+
+        contract_filters = (
+            Contract.contract_type == ContractType.STOCK.name,
+            Contract.exchange == exchange.name)
+        db_keys = self._contracts_db_manager.get_keys_by_filters(
+            filters=contract_filters)
         # Get contracts
         try:
-            web_contracts = self._listing_reader.read_ib_exchange_listing(
-                exchange=exchange)
+            removed_ids, added_contracts = self._diff_listing(
+                exchange=exchange, db_keys=db_keys)
         except ExitSignalDetectedError as e:
             _logger.info(e.message)
             return
-        contract_filters = (
-            Contract.contract_type == ContractType.STOCK.name,
-            Contract.exchange == exchange.name)
-        db_contracts = self._contracts_db_manager.get_by_filters(
-            filters=contract_filters)
-        wc = set(web_contracts)
-        dc = set(db_contracts)
-        removed_contracts = dc.difference(wc)
-        added_contracts = wc.difference(dc)
 
         # Execute
         if not self.override_user_acknowledge:
-            ua = self._user_acknowledge(n_remove=len(removed_contracts),
+            ua = self._user_acknowledge(n_remove=len(removed_ids),
                                         n_add=len(added_contracts))
         if self.override_user_acknowledge or ua:
-            for contract in removed_contracts:
+            for contract in self._contracts_db_manager.get_by_ids(
+                    contract_ids=removed_ids):
                 self._contracts_db_manager.delete_from_db(contract=contract)
-            for contract in added_contracts:
-                self._contracts_db_manager.add_to_db(contract=contract)
+            for listing_contract in added_contracts:
+                self._contracts_db_manager.add_to_db(
+                    contract=Contract(**listing_contract._asdict()))
             self._orm_session.commit()
         else:
             _logger.info("Aborted.")
@@ -57,6 +65,22 @@ class ContractSyncProcessor():
 
     # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
 
+    def _diff_listing(
+            self, exchange: Exchange, db_keys: Dict[ContractKey, int]
+    ) -> Tuple[List[int], List[ListingContract]]:
+        unlisted_keys = dict(db_keys)
+        added_contracts: Dict[ContractKey, ListingContract] = {}
+        for page_contracts in self._listing_reader.read_ib_exchange_listing_pages(
+                exchange=exchange):
+            for listing_contract in page_contracts:
+                key = listing_contract.get_key()
+                if key in db_keys:
+                    unlisted_keys.pop(key, None)
+                else:
+                    # The first listing of duplicates wins
+                    added_contracts.setdefault(key, listing_contract)
+        return list(unlisted_keys.values()), list(added_contracts.values())
+
     def _user_acknowledge(self, n_remove: int, n_add: int) -> bool:
         print(f"{n_add} new contracts will be added and {n_remove} deprecated "
               f"contracts will be removed. Do you want to continue? (Y/N): ",
@@ -0,0 +1,152 @@
+import logging
+from datetime import date, datetime
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from barbucket.domain_model.quotes_panel import QuotesPanel
+from barbucket.persistence.data_managers import QuotesDbManager, QuotesStatusDbManager, UniverseDbManager
+
+
+_logger = logging.getLogger(__name__)
+
+
+class QuotesPanelReader():
+    """Provides cross-sectional views on the quotes of a universe.
+
+    With a cache directory, complete panels are stored as '.npz' files per
+    universe and column. A cached panel is reused, as long as neither the
+    members of the universe nor the latest quotes status update of any member
+    have changed.
+    """
+
+    def __init__(
+            self,
+            universe_db_manager: UniverseDbManager,
+            quotes_db_manager: QuotesDbManager,
+            status_db_manager: QuotesStatusDbManager,
+            cache_directory: Optional[Path] = None) -> None:
+        self._universe_db_manager = universe_db_manager
+        self._quotes_db_manager = quotes_db_manager
+        self._status_db_manager = status_db_manager
+        self._cache_directory = cache_directory
+
+    def get_panel(self, universe: str, column: str = "close",
+                  start: Optional[date] = None,
+                  end: Optional[date] = None) -> QuotesPanel:
+        """Read one quote column of all members of a universe as a dense
+        matrix
+
+        :param universe: Universe to read the quotes for
+        :type universe: str
+        :param column: Quote column to read
+        :type column: str
+        :param start: First date to read
+        :type start: Optional[date]
+        :param end: Last date to read
+        :type end: Optional[date]
+        :return: Panel with a column for every member, sorted by contract id
+        :rtype: QuotesPanel
+        """
+
+        member_ids = np.array(
+            self._universe_db_manager.get_member_ids(name=universe),
+            dtype=np.int64)
+        last_update = self._status_db_manager.get_last_update(
+            universe=universe)
+        panel = self._read_cached_panel(
+            universe=universe, column=column, member_ids=member_ids,
+            last_update=last_update)
+        if panel is not None:
+            return _slice_dates(panel=panel, start=start, end=end)
+        if (self._cache_directory is None) or (last_update is None):
+            # Nothing to cache, only read the requested dates
+            return self._read_panel(
+                universe=universe, column=column, member_ids=member_ids,
+                start=start, end=end)
+        # The cache keeps the complete history
+        panel = self._read_panel(
+            universe=universe, column=column, member_ids=member_ids)
+        self._write_cached_panel(
+            universe=universe, column=column, panel=panel,
+            last_update=last_update)
+        return _slice_dates(panel=panel, start=start, end=end)
+
+    # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
+
+    def _read_panel(
+            self, universe: str, column: str, member_ids: np.ndarray,
+            start: Optional[date] = None,
+            end: Optional[date] = None) -> QuotesPanel:
+        quotes = self._quotes_db_manager.get_quotes(
+            universe=universe, start=start, end=end, columns=[column],
+            as_frame=False)
+        return _pivot(
+            contract_ids=quotes["contract_id"], dates=quotes["date"],
+            values=quotes[column], member_ids=member_ids)
+
+    def _get_cache_path(self, universe: str, column: str) -> Path:
+        return self._cache_directory / f"{universe}.{column}.npz"
+
+    def _read_cached_panel(
+            self, universe: str, column: str, member_ids: np.ndarray,
+            last_update: Optional[datetime]) -> Optional[QuotesPanel]:
+        if (self._cache_directory is None) or (last_update is None):
+            return None
+        path = self._get_cache_path(universe=universe, column=column)
+        if not path.is_file():
+            return None
+        with np.load(path) as cached:
+            is_current = (
+                (str(cached["last_update"]) == last_update.isoformat()) and
+                np.array_equal(cached["contract_ids"], member_ids))
+            if not is_current:
+                _logger.debug(f"Cached panel at '{path}' is outdated.")
+                return None
+            _logger.debug(f"Read panel from cache at '{path}'.")
+            return QuotesPanel(
+                dates=cached["dates"], contract_ids=cached["contract_ids"],
+                values=cached["values"])
+
+    def _write_cached_panel(
+            self, universe: str, column: str, panel: QuotesPanel,
+            last_update: Optional[datetime]) -> None:
+        self._cache_directory.mkdir(parents=True, exist_ok=True)
+        path = self._get_cache_path(universe=universe, column=column)
+        np.savez(path, last_update=np.array(last_update.isoformat()),
+                 dates=panel.dates, contract_ids=panel.contract_ids,
+                 values=panel.values)
+        _logger.debug(f"Wrote panel to cache at '{path}'.")
+
+
+# ~~~~~~~~~~~~~~~~~~~~~ private functions ~~~~~~~~~~~~~~~~~~~~~
+
+
+def _pivot(contract_ids: np.ndarray, dates: np.ndarray, values: np.ndarray,
+           member_ids: np.ndarray) -> QuotesPanel:
+    # Scatter the long quotes into a matrix of all dates and members
+    panel_dates = np.unique(dates)
+    matrix = np.full((len(panel_dates), len(member_ids)), np.nan,
+                     dtype=np.float32)
+    rows = np.searchsorted(panel_dates, dates)
+    columns = np.searchsorted(member_ids, contract_ids)
+    matrix[rows, columns] = values
+    return QuotesPanel(
+        dates=panel_dates, contract_ids=member_ids, values=matrix)
+
+
+def _slice_dates(panel: QuotesPanel, start: Optional[date],
+                 end: Optional[date]) -> QuotesPanel:
+    first, last = 0, len(panel.dates)
+    if start is not None:
+        first = np.searchsorted(
+            panel.dates, np.datetime64(start, "D"), side="left")
+    if end is not None:
+        last = np.searchsorted(
+            panel.dates, np.datetime64(end, "D"), side="right")
+    if (first, last) == (0, len(panel.dates)):
+        return panel
+    return QuotesPanel(
+        dates=panel.dates[first:last], contract_ids=panel.contract_ids,
+        values=panel.values[first:last])
@@ -1,114 +1,425 @@
 import logging
-from datetime import date
-from math import ceil
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
 
 import numpy as np
 import enlighten
 from ib_insync.wrapper import RequestError
 from sqlalchemy.orm import Session
 
-from barbucket.domain_model.data_classes import Contract
-from barbucket.persistence.data_managers import UniverseDbManager, QuotesDbManager
+from barbucket.domain_model.data_classes import Contract, Quote, QuotesJournalEntry, QuotesStatus
+from barbucket.domain_model.types import QuotesJournalOutcome, QuotesStatusCode
+from barbucket.persistence.data_managers import UniverseDbManager, QuotesDbManager, QuotesJournalDbManager, QuotesStatusDbManager
 from barbucket.api.tws_connector import TwsConnector
+from barbucket.business_logic.quotes_status_handler import QuotesStatusHandler
+from barbucket.business_logic.quotes_writer import QuotesWriter
 from barbucket.util.signal_handler import SignalHandler
 from barbucket.util.config_reader import ConfigReader
 
 
 _logger = logging.getLogger(__name__)
 
+# Stored prices may be rounded to four decimals
+_PRICE_ABSOLUTE_TOLERANCE = 0.0001
+
 
 class QuotesProcessor():
-    """Provides methods to download historical quotes from TWS."""
+    """Provides methods to download historical quotes from TWS.
+
+    Quotes are downloaded with adjusted prices, so after a split or a
+    dividend, IB revises the complete history of a contract. Incremental
+    downloads are compared with the stored quotes of their overlap and
+    revised contracts get their full history downloaded again.
+    """
 
     def __init__(
             self,
             universe_db_manager: UniverseDbManager,
             quotes_db_manager: QuotesDbManager,
+            status_db_manager: QuotesStatusDbManager,
+            journal_db_manager: QuotesJournalDbManager,
+            quotes_writer: QuotesWriter,
             tws_connector: TwsConnector,
-            # status_hadler: QuotesStatusHandler,
+            status_handler: QuotesStatusHandler,
             config_reader: ConfigReader,
             orm_session: Session) -> None:
         self._universes_db_manager = universe_db_manager
         self._quotes_db_manager = quotes_db_manager
+        self._status_db_manager = status_db_manager
+        self._journal_db_manager = journal_db_manager
+        self._quotes_writer = quotes_writer
         self._tws_connector = tws_connector
-        # self._status_handler = status_hadler
+        self._status_handler = status_handler
+        self._statuses: Dict[int, QuotesStatus] = {}
+        self._overlap_quotes: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._revised_contracts: List[Contract] = []
+        self._refreshed_ids: Set[int] = set()
+        self._incremental_ids: Set[int] = set()
+        self._stored_until: Dict[int, date] = {}
         self._config_reader = config_reader
         self._orm_session = orm_session
         self._pb_manager = enlighten.get_manager()  # Setup progress bar
         self._progress_bar = self._pb_manager.counter(
             total=0, desc="Contracts", unit="contracts")
 
-    def download_historical_quotes(self, universe: str) -> None:
+    def download_historical_quotes(
+            self, universe: str, resume: bool = False) -> None:
         """Download historical quotes from TWS
 
         :param universe: Universe to download quotes for
         :type universe: str
+        :param resume: Continue the last run for this universe, skipping
+            finished contracts and deferring failed ones
+        :type resume: bool
         """
 
         signal_handler = SignalHandler()
 
+        if not resume:
+            self._journal_db_manager.delete_universe(universe=universe)
+            self._orm_session.commit()
         contracts = self._universes_db_manager.get_members(name=universe)
-        self._progress_bar.total = len(contracts)
+        plan = self._plan_downloads(universe=universe, contracts=contracts)
+        if resume:
+            plan = self._order_for_resume(universe=universe, plan=plan)
+        self._progress_bar.total = len(plan)
+        max_in_flight = int(self._config_reader.get_config_value_single(
+            section="quotes", option="concurrent_requests"))
+        initial_duration = self._config_reader.get_config_value_single(
+            section="quotes", option="initial_duration")
         self._tws_connector.connect()  # todo catch exceptioin if tws is not available
-        for contract in contracts:
-            if signal_handler.is_exit_requested():
-                self._tws_connector.disconnect()
-                return
-            self._handle_contract(contract=contract)
-        _logger.info(
-            f"Finished downloading historical data for universe "
-            f"'{universe}'")
+        budget = self._tws_connector.get_remaining_historical_budget()
+        if len(plan) > budget:
+            _logger.info(
+                f"Planned {len(plan)} downloads exceed the IB pacing budget "
+                f"of {budget} requests, further requests are delayed.")
+        requests = self._create_requests(
+            plan=plan, signal_handler=signal_handler)
+        results = self._tws_connector.download_historical_quotes_concurrently(
+            requests=requests, initial_duration=initial_duration,
+            max_in_flight=max_in_flight)
+        self._quotes_writer.start()
+        try:
+            for contract, result in results:
+                self._handle_result(
+                    universe=universe, contract=contract, result=result)
+            if self._revised_contracts and \
+                    not signal_handler.is_exit_requested():
+                self._refresh_revised_contracts(
+                    universe=universe, signal_handler=signal_handler,
+                    initial_duration=initial_duration,
+                    max_in_flight=max_in_flight)
+        finally:
+            # Also on errors, flush everything that was already downloaded
+            self._quotes_writer.stop()
+        n_quotes_written, n_quotes_skipped = \
+            self._quotes_writer.get_quotes_counts()
+        _logger.info(f"Wrote {n_quotes_written} new or changed quotes, "
+                     f"skipped {n_quotes_skipped} unchanged quotes.")
+        if not signal_handler.is_exit_requested():
+            _logger.info(
+                f"Finished downloading historical data for universe "
+                f"'{universe}'")
         self._tws_connector.disconnect()
         self._orm_session.close()
 
+    def reset_no_data_statuses(self, universe: str) -> int:
+        """Forget, that contracts of a universe had no data, so they are
+        downloaded again on the next run
+
+        :param universe: Universe to reset the contracts of
+        :type universe: str
+        :return: Number of reset contracts
+        :rtype: int
+        """
+
+        n_reset = self._status_db_manager.delete_statuses(
+            universe=universe, status_code=QuotesStatusCode.NO_DATA)
+        self._orm_session.commit()
+        _logger.info(f"Reset {n_reset} contracts without data of universe "
+                     f"'{universe}'.")
+        return n_reset
+
     # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
 
-    def _handle_contract(self, contract: Contract) -> None:
-        if self._is_quotes_recent(contract=contract):
-            self._progress_bar.total -= 1
-            self._progress_bar.update(incr=0)
-            return
-        duration = self._get_download_duration(contract=contract)
-        try:
-            quotes = self._tws_connector.download_historical_quotes(
-                contract=contract, duration=duration)
-        except RequestError as e:
+    def _order_for_resume(
+            self, universe: str,
+            plan: List[Tuple[Contract, Optional[date]]]
+    ) -> List[Tuple[Contract, Optional[date]]]:
+        # Only planned contracts are ordered, skipped ones are not
+        # downloaded at all
+        outcomes = self._journal_db_manager.get_outcomes(universe=universe)
+        open_requests = [(contract, start_date)
+                         for contract, start_date in plan
+                         if contract.id not in outcomes]
+        known_bad_requests = [
+            (contract, start_date) for contract, start_date in plan
+            if outcomes.get(contract.id) in (
+                QuotesJournalOutcome.FAILED.name,
+                QuotesJournalOutcome.NO_DATA.name)]
+        n_done = len(plan) - len(open_requests) - len(known_bad_requests)
+        _logger.info(
+            f"Resuming last run for universe '{universe}': {n_done} "
+            f"planned contracts done, {len(open_requests)} open, "
+            f"{len(known_bad_requests)} failed contracts deferred.")
+        return open_requests + known_bad_requests
+
+    def _plan_downloads(
+            self, universe: str,
+            contracts: List[Contract]
+    ) -> List[Tuple[Contract, Optional[date]]]:
+        # Decide for all contracts at once from the compact status table,
+        # before any request is sent
+        self._statuses = self._status_db_manager.get_statuses(
+            universe=universe)
+        latest_dates = self._get_latest_dates(
+            universe=universe, contracts=contracts)
+        today = np.datetime64(date.today(), "D")
+        has_quotes = np.array(
+            [contract.id in latest_dates for contract in contracts],
+            dtype=bool)
+        begindates = np.array(
+            [latest_dates.get(contract.id, today) for contract in contracts],
+            dtype="datetime64[D]")
+        missing_quotes = np.busday_count(
+            begindates=begindates, enddates=today)
+        redownload_days = int(self._config_reader.get_config_value_single(
+            section="quotes", option="redownload_days"))
+        # Revised contracts are downloaded completely, even if recent
+        is_revised = np.array(
+            [self._status_handler.is_revised(
+                status=self._statuses.get(contract.id))
+             for contract in contracts],
+            dtype=bool)
+        is_recent = has_quotes & ~is_revised & \
+            (missing_quotes < redownload_days)
+        # Contracts without any quotes, that had no data recently. Once a
+        # contract has quotes, it is always updated.
+        no_data_retry_days = int(self._config_reader.get_config_value_single(
+            section="quotes", option="no_data_retry_days"))
+        no_data_since = datetime.now() - timedelta(days=no_data_retry_days)
+        is_no_data = ~has_quotes & np.array(
+            [self._status_handler.is_no_data(
+                status=self._statuses.get(contract.id), since=no_data_since)
+             for contract in contracts],
+            dtype=bool)
+        is_skipped = is_recent | is_no_data
+        start_dates = self._get_start_dates(
+            has_quotes=has_quotes & ~is_revised, latest_dates=begindates)
+        plan = [(contract, start_date)
+                for contract, start_date, skipped
+                in zip(contracts, start_dates, is_skipped) if not skipped]
+        self._refreshed_ids = {
+            contract.id for contract, revised in zip(contracts, is_revised)
+            if revised}
+        self._incremental_ids = {
+            contract.id for contract, start_date in plan
+            if start_date is not None}
+        # Lets the writer skip comparing quotes, that can't be stored yet
+        self._stored_until = {
+            contract.id: latest_dates.get(contract.id, date.min)
+            for contract, _ in plan}
+        self._overlap_quotes = self._read_overlap_quotes(plan=plan)
+        n_initial = int(np.count_nonzero(~has_quotes & ~is_skipped))
+        n_refresh = len(self._refreshed_ids)
+        _logger.info(
+            f"Planned downloads for universe '{universe}': {n_initial} "
+            f"initial, {n_refresh} full refreshes of revised quotes, "
+            f"{len(plan) - n_initial - n_refresh} incremental, "
+            f"{int(np.count_nonzero(is_recent))} skipped as recent, "
+            f"{int(np.count_nonzero(is_no_data))} skipped without data "
+            f"within the last {no_data_retry_days} days.")
+        return plan
+
+    def _read_overlap_quotes(
+            self, plan: List[Tuple[Contract, Optional[date]]]
+    ) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        # Stored dates and closes of all incremental downloads, with one
+        # query per distinct start date
+        contract_ids_by_start: Dict[date, List[int]] = {}
+        for contract, start_date in plan:
+            if start_date is not None:
+                contract_ids_by_start.setdefault(start_date, []).append(
+                    contract.id)
+        overlap_quotes = {}
+        for start_date, contract_ids in contract_ids_by_start.items():
+            quotes = self._quotes_db_manager.get_quotes(
+                contract_ids=contract_ids, start=start_date,
+                columns=["close"], as_frame=False)
+            boundaries = np.flatnonzero(np.diff(quotes["contract_id"])) + 1
+            for ids, dates, closes in zip(
+                    np.split(quotes["contract_id"], boundaries),
+                    np.split(quotes["date"], boundaries),
+                    np.split(quotes["close"], boundaries)):
+                if len(ids) > 0:
+                    overlap_quotes[int(ids[0])] = (dates, closes)
+        return overlap_quotes
+
+    def _get_latest_dates(
+            self, universe: str, contracts: List[Contract]) -> Dict[int, date]:
+        latest_dates = {
+            contract_id: status.latest_quote_requested
+            for contract_id, status in self._statuses.items()
+            if self._status_handler.has_quotes(status=status)}
+        if any(contract.id not in self._statuses for contract in contracts):
+            # Quotes, that were stored before their status was tracked
+            stored_dates = self._quotes_db_manager.get_latest_quote_dates(
+                universe=universe)
+            for contract_id, latest_date in stored_dates.items():
+                if contract_id not in self._statuses:
+                    latest_dates[contract_id] = latest_date
+        return latest_dates
+
+    def _get_start_dates(
+            self, has_quotes: np.ndarray,
+            latest_dates: np.ndarray) -> List[Optional[date]]:
+        # Start the given number of business days before the latest quote,
+        # to also receive revised quotes. The connector derives the requests.
+        overlap_days = int(self._config_reader.get_config_value_single(
+            section="quotes", option="overlap_days"))
+        start_dates = np.busday_offset(
+            latest_dates, -overlap_days, roll="backward")
+        return [start_date.item() if existing else None
+                for existing, start_date in zip(has_quotes, start_dates)]
+
+    def _create_requests(
+            self, plan: List[Tuple[Contract, Optional[date]]],
+            signal_handler: SignalHandler
+    ) -> Iterator[Tuple[Contract, Optional[date]]]:
+        # Consumed lazily by the connector, so stopping here lets the
+        # requests already in flight finish and get stored
+        for contract, start_date in plan:
+            if signal_handler.is_exit_requested():
+                return
+            yield contract, start_date
+
+    def _refresh_revised_contracts(
+            self, universe: str, signal_handler: SignalHandler,
+            initial_duration: str, max_in_flight: int) -> None:
+        contracts, self._revised_contracts = self._revised_contracts, []
+        _logger.info(f"Downloading the full history of {len(contracts)} "
+                     f"contracts with revised quotes.")
+        self._refreshed_ids.update(contract.id for contract in contracts)
+        requests = self._create_requests(
+            plan=[(contract, None) for contract in contracts],
+            signal_handler=signal_handler)
+        results = self._tws_connector.download_historical_quotes_concurrently(
+            requests=requests, initial_duration=initial_duration,
+            max_in_flight=max_in_flight)
+        for contract, result in results:
+            self._handle_result(
+                universe=universe, contract=contract, result=result)
+
+    def _is_revised(self, contract_id: int, quotes: List[Quote]) -> bool:
+        # Compare the received quotes with the stored quotes of the overlap.
+        # The latest stored quote is skipped, it may be from an unfinished
+        # trading day.
+        if contract_id not in self._overlap_quotes:
+            return False
+        stored_dates, stored_closes = self._overlap_quotes.pop(contract_id)
+        dates = np.array([quote.date for quote in quotes],
+                         dtype="datetime64[D]")
+        closes = np.array([quote.close for quote in quotes], dtype=float)
+        _, stored_indices, indices = np.intersect1d(
+            stored_dates[:-1], dates, assume_unique=True,
+            return_indices=True)
+        tolerance = float(self._config_reader.get_config_value_single(
+            section="quotes", option="revision_tolerance"))
+        return not np.allclose(
+            closes[indices], stored_closes[stored_indices], rtol=tolerance,
+            atol=_PRICE_ABSOLUTE_TOLERANCE)
+
+    def _handle_result(
+            self, universe: str, contract: Contract,
+            result: Union[List[Quote], RequestError]) -> None:
+        previous = self._statuses.get(contract.id)
+        if isinstance(result, RequestError):
             _logger.info(f"Problem downloading quotes for contract "
-                         f"'{contract}': {e.message}")
-            if e.reqId != -1:  # -1 are system errors
-                self._progress_bar.update(incr=1)
-            return
-        else:
-            self._quotes_db_manager.upsert_to_db(quotes=quotes)
-            self._orm_session.commit()
+                         f"'{contract}': {result.message}")
+            if result.reqId == -1:  # -1 are system errors
+                return
+            if _is_no_data_error(error=result):
+                self._handle_no_data(
+                    universe=universe, contract=contract, previous=previous,
+                    error=result)
+                return
+            status = self._status_handler.create_failed_status(
+                contract_id=contract.id, code=QuotesStatusCode.FAILED,
+                previous=previous, error=result)
+            journal_entry = self._create_journal_entry(
+                universe=universe, contract=contract,
+                outcome=QuotesJournalOutcome.FAILED, error=result)
+            self._quotes_writer.put(
+                quotes=[], journal_entry=journal_entry, status=status)
             self._progress_bar.update(incr=1)
+            return
+        if not result:
+            self._handle_no_data(
+                universe=universe, contract=contract, previous=previous)
+            return
+        if self._is_revised(contract_id=contract.id, quotes=result):
+            # Stored quotes stay untouched until the full history arrives
+            _logger.info(f"Adjusted quotes of contract '{contract}' were "
+                         f"revised, refreshing its full history.")
+            status = self._status_handler.create_revised_status(
+                contract_id=contract.id, previous=previous)
+            self._quotes_writer.put(quotes=[], status=status)
+            self._revised_contracts.append(contract)
+            return
+        replace = contract.id in self._refreshed_ids
+        if replace:
+            # The new history replaces the stored range
+            previous = None
+        status = self._status_handler.create_successful_status(
+            contract_id=contract.id, quotes=result, previous=previous)
+        journal_entry = self._create_journal_entry(
+            universe=universe, contract=contract,
+            outcome=QuotesJournalOutcome.DONE)
+        self._quotes_writer.put(
+            quotes=result, journal_entry=journal_entry, status=status,
+            replace=replace, stored_until=self._stored_until.get(contract.id))
+        self._progress_bar.update(incr=1)
 
-    def _is_quotes_recent(self, contract: Contract) -> bool:
-        if not self._quotes_db_manager.contract_has_quotes(contract=contract):
-            return False
-        redownload_days = int(self._config_reader.get_config_value_single(
-            section='quotes', option='redownload_days'))
-        last_quote_date = self._quotes_db_manager.get_latest_quote_date(
-            contract=contract)
-        missing_quotes = np.busday_count(
-            begindates=last_quote_date, enddates=date.today())
-        return (missing_quotes < redownload_days)  # log
-
-    def _get_download_duration(self, contract: Contract) -> str:
-        if not self._quotes_db_manager.contract_has_quotes(contract=contract):
-            initial_duration = self._config_reader.get_config_value_single(
-                section="quotes", option="initial_duration")
-            return initial_duration
+    def _handle_no_data(
+            self, universe: str, contract: Contract,
+            previous: Optional[QuotesStatus],
+            error: Optional[RequestError] = None) -> None:
+        if contract.id in self._incremental_ids:
+            # No new quotes since the stored ones, e.g. over a weekend or
+            # holidays. The contract is up to date.
+            outcome = QuotesJournalOutcome.DONE
+            status = None
+            if previous is not None:
+                status = self._status_handler.create_unchanged_status(
+                    contract_id=contract.id, previous=previous)
         else:
-            overlap_days = int(self._config_reader.get_config_value_single(
-                section="quotes", option="overlap_days"))
-            last_quote_date = self._quotes_db_manager.get_latest_quote_date(
-                contract=contract)
-            missing_quotes = np.busday_count(
-                begindates=last_quote_date, enddates=date.today())
-            # todo: this logic belongs into the API class
-            if missing_quotes < 250:  # Api accepts only certain number of days
-                duration = str(missing_quotes + overlap_days) + " D"
-            else:
-                duration = str(ceil(missing_quotes / 220)) + " Y"
-            return duration
+            outcome = QuotesJournalOutcome.NO_DATA
+            status = self._status_handler.create_failed_status(
+                contract_id=contract.id, code=QuotesStatusCode.NO_DATA,
+                previous=previous, error=error)
+        journal_entry = self._create_journal_entry(
+            universe=universe, contract=contract, outcome=outcome,
+            error=error)
+        self._quotes_writer.put(
+            quotes=[], journal_entry=journal_entry, status=status)
+        self._progress_bar.update(incr=1)
+
+    def _create_journal_entry(
+            self, universe: str, contract: Contract,
+            outcome: QuotesJournalOutcome,
+            error: Optional[RequestError] = None) -> QuotesJournalEntry:
+        return QuotesJournalEntry(
+            universe=universe,
+            contract_id=contract.id,
+            outcome=outcome.name,
+            error_code=(error.code if error is not None else None),
+            error_text=(error.message[:255] if error is not None else None),
+            updated_at=datetime.now())
+
+
+# ~~~~~~~~~~~~~~~~~~~~~ private functions ~~~~~~~~~~~~~~~~~~~~~
+
+
+def _is_no_data_error(error: RequestError) -> bool:
+    # IB reports missing data as a generic historical data service error
+    return (error.code == 162) and ("no data" in error.message.lower())
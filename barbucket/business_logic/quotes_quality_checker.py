@@ -0,0 +1,143 @@
+import logging
+from datetime import datetime
+from typing import Dict, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from barbucket.domain_model.data_classes import QuotesQualityCheck
+from barbucket.persistence.data_managers import ContractsDbManager, QuotesDbManager, QuotesQualityDbManager, UniverseDbManager
+from barbucket.util.config_reader import ConfigReader
+
+
+_logger = logging.getLogger(__name__)
+
+
+class QuotesQualityChecker():
+    """Checks the quotes of all members of a universe against the rules of
+    the 'quality_check' config section.
+
+    Gaps and missing quotes are counted in business days (Monday to Friday).
+    Missing quotes at the end are counted until the latest quote of the whole
+    universe, so holidays and the time of the last download do not fail all
+    contracts at once.
+    """
+
+    def __init__(
+            self,
+            universe_db_manager: UniverseDbManager,
+            contracts_db_manager: ContractsDbManager,
+            quotes_db_manager: QuotesDbManager,
+            quality_db_manager: QuotesQualityDbManager,
+            config_reader: ConfigReader,
+            orm_session: Session) -> None:
+        self._universe_db_manager = universe_db_manager
+        self._contracts_db_manager = contracts_db_manager
+        self._quotes_db_manager = quotes_db_manager
+        self._quality_db_manager = quality_db_manager
+        self._config_reader = config_reader
+        self._orm_session = orm_session
+
+    def check_universe(self, universe: str) -> Dict[int, QuotesQualityCheck]:
+        """Check and store the quotes quality of all members of a universe
+
+        :param universe: Universe to check
+        :type universe: str
+        :return: Check result for every member
+        :rtype: Dict[int, QuotesQualityCheck]
+        """
+
+        member_ids = np.array(
+            self._universe_db_manager.get_member_ids(name=universe),
+            dtype=np.int64)
+        quotes = self._quotes_db_manager.get_quotes(
+            universe=universe, columns=[], as_frame=False)
+        counts, missing_at_end, max_gaps = _compute_metrics(
+            member_ids=member_ids, contract_ids=quotes["contract_id"],
+            dates=quotes["date"])
+        passed = self._evaluate_rules(
+            counts=counts, missing_at_end=missing_at_end, max_gaps=max_gaps)
+        checked_at = datetime.now()
+        checks = [
+            QuotesQualityCheck(
+                contract_id=contract_id, quotes_count=count,
+                missing_quotes_at_end=None if count == 0 else missing,
+                max_gap_size=None if count == 0 else gap,
+                passed=is_passed, checked_at=checked_at)
+            for contract_id, count, missing, gap, is_passed in zip(
+                member_ids.tolist(), counts.tolist(), missing_at_end.tolist(),
+                max_gaps.tolist(), passed.tolist())]
+        self._quality_db_manager.add_all_to_db(checks=checks)
+        self._orm_session.commit()
+        _logger.info(f"Checked quotes of {len(checks)} members of universe "
+                     f"'{universe}', {int(passed.sum())} passed.")
+        return {check.contract_id: check for check in checks}
+
+    def create_filtered_universe(self, universe: str, name: str) -> None:
+        """Create a universe of all members of another universe, whose quotes
+        passed the last check
+
+        :param universe: Checked universe
+        :type universe: str
+        :param name: Name of the new universe
+        :type name: str
+        """
+
+        if self._universe_db_manager.is_existing(name=name):
+            _logger.info(f"Universe '{name}' already exists.")
+            return
+        contract_ids = self._quality_db_manager.get_passed_contract_ids(
+            universe=universe)
+        contracts = self._contracts_db_manager.get_by_ids(
+            contract_ids=contract_ids)
+        self._universe_db_manager.create_universe(
+            name=name, contracts=contracts)
+        self._orm_session.commit()
+        _logger.info(f"Created universe '{name}' with {len(contracts)} "
+                     f"contracts.")
+
+    # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
+
+    def _evaluate_rules(self, counts: np.ndarray, missing_at_end: np.ndarray,
+                        max_gaps: np.ndarray) -> np.ndarray:
+        min_quotes_count = int(self._config_reader.get_config_value_single(
+            section="quality_check", option="min_quotes_count"))
+        max_missing_quotes_at_end = int(
+            self._config_reader.get_config_value_single(
+                section="quality_check", option="max_missing_quotes_at_end"))
+        max_gap_size = int(self._config_reader.get_config_value_single(
+            section="quality_check", option="max_gap_size"))
+        return ((counts > 0) &
+                (counts >= min_quotes_count) &
+                (missing_at_end <= max_missing_quotes_at_end) &
+                (max_gaps <= max_gap_size))
+
+
+# ~~~~~~~~~~~~~~~~~~~~~ private functions ~~~~~~~~~~~~~~~~~~~~~
+
+
+def _compute_metrics(member_ids: np.ndarray, contract_ids: np.ndarray,
+                     dates: np.ndarray
+                     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Quotes are sorted by contract and date. Every metric has one entry per
+    # member, members without quotes get a count of 0.
+    n_members = len(member_ids)
+    counts = np.zeros(n_members, dtype=np.int64)
+    missing_at_end = np.zeros(n_members, dtype=np.int64)
+    max_gaps = np.zeros(n_members, dtype=np.int64)
+    if len(dates) == 0:
+        return counts, missing_at_end, max_gaps
+    positions = np.searchsorted(member_ids, contract_ids)
+    counts += np.bincount(positions, minlength=n_members)
+    is_same_contract = contract_ids[1:] == contract_ids[:-1]
+    # Business days between consecutive quotes, without a quote
+    gaps = np.busday_count(dates[:-1], dates[1:]) - 1
+    gaps = np.where(is_same_contract, gaps, 0).clip(min=0)
+    np.maximum.at(max_gaps, positions[1:], gaps)
+    # Business days after the last quote of every contract until the latest
+    # quote of all contracts
+    is_last = np.append(~is_same_contract, True)
+    end = dates.max() + np.timedelta64(1, "D")
+    missing_at_end[positions[is_last]] = np.busday_count(
+        dates[is_last] + np.timedelta64(1, "D"), end)
+    return counts, missing_at_end, max_gaps
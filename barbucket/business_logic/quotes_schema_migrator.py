@@ -0,0 +1,63 @@
+import logging
+
+from sqlalchemy.orm import Session
+
+from barbucket.domain_model.data_classes import Quote
+from barbucket.persistence.data_managers import QuotesDbManager
+
+
+_logger = logging.getLogger(__name__)
+
+
+class QuotesSchemaMigrator():
+    """Moves all quotes from the table of one quotes schema to the other.
+
+    Quotes are moved in batches of contracts, every batch is deleted from the
+    source table and committed together with its copy. An interrupted
+    migration continues, where it stopped.
+    """
+
+    def __init__(
+            self,
+            source_db_manager: QuotesDbManager,
+            target_db_manager: QuotesDbManager,
+            orm_session: Session,
+            batch_size: int = 100) -> None:
+        self._source_db_manager = source_db_manager
+        self._target_db_manager = target_db_manager
+        self._orm_session = orm_session
+        self._batch_size = batch_size
+
+    def migrate(self) -> int:
+        """Move all quotes to the target schema
+
+        :return: Number of moved quotes
+        :rtype: int
+        """
+
+        contract_ids = self._source_db_manager.get_contract_ids()
+        n_quotes = 0
+        for i in range(0, len(contract_ids), self._batch_size):
+            batch = contract_ids[i:i + self._batch_size]
+            n_quotes += self._move_batch(contract_ids=batch)
+            self._orm_session.commit()
+            _logger.info(f"Migrated quotes of {i + len(batch)} of "
+                         f"{len(contract_ids)} contracts.")
+        return n_quotes
+
+    # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
+
+    def _move_batch(self, contract_ids: list) -> int:
+        arrays = self._source_db_manager.get_quotes(
+            contract_ids=contract_ids, as_frame=False)
+        quotes = [
+            Quote(contract_id=contract_id, date=date_, open=open_, high=high,
+                  low=low, close=close, volume=volume)
+            for contract_id, date_, open_, high, low, close, volume in zip(
+                arrays["contract_id"].tolist(), arrays["date"].tolist(),
+                arrays["open"].tolist(), arrays["high"].tolist(),
+                arrays["low"].tolist(), arrays["close"].tolist(),
+                arrays["volume"].tolist())]
+        self._target_db_manager.upsert_to_db(quotes=quotes)
+        self._source_db_manager.delete_quotes(contract_ids=contract_ids)
+        return len(quotes)
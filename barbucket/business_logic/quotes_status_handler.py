@@ -1,48 +1,99 @@
-pass
-# import logging
-# from datetime import date, timedelta
-
-# import numpy as np
-
-# from barbucket.domain_model.data_classes import QuotesStatus
-# from barbucket.util.config_reader import ConfigReader
-
-
-# _logger = logging.getLogger(__name__)
-
-
-# class QuotesStatusHandler():
-#     @classmethod
-#     def has_error_status(cls, status: QuotesStatus) -> bool:
-#         if status.status_code > 1:
-#             return True
-#         else:
-#             return False
-
-#     @classmethod
-#     def is_quotes_recent(cls, status: QuotesStatus) -> bool:
-#         if status.status_code == 0:
-#             return False
-#         elif status.status_code > 1:
-#             return False
-#         else:  # quotes existing
-#             redownload_days = int(ConfigReader.get_config_value_single(
-#                 section="quotes", option="redownload_days"))
-#             age_days = np.busday_count(
-#                 status.latest_quote_requested, date.today())
-#             if age_days > redownload_days:
-#                 return False
-#             else:
-#                 return True
-
-#     @classmethod
-#     def update_download_successful(cls, status: QuotesStatus) -> QuotesStatus:
-#         status.status_code = 1
-#         status.status_text = "Download successful"
-#         status.
-#         return status
-
-#     @classmethod
-#     def update_download_failed(cls, status: QuotesStatus) -> QuotesStatus:
-#         status.
-#         return status
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from ib_insync.wrapper import RequestError
+
+from barbucket.domain_model.data_classes import Quote, QuotesStatus
+from barbucket.domain_model.types import QuotesStatusCode
+
+
+_logger = logging.getLogger(__name__)
+
+
+class QuotesStatusHandler():
+    """Derives the new download status of a contracts quotes"""
+
+    def has_quotes(self, status: Optional[QuotesStatus]) -> bool:
+        return (status is not None) and \
+            (status.latest_quote_requested is not None)
+
+    def is_no_data(self, status: Optional[QuotesStatus],
+                   since: Optional[datetime] = None) -> bool:
+        """Check, if no data was received, optionally only since a time"""
+
+        return (status is not None) and \
+            (status.status_code == QuotesStatusCode.NO_DATA.value) and \
+            ((since is None) or (status.updated_at >= since))
+
+    def is_revised(self, status: Optional[QuotesStatus]) -> bool:
+        return (status is not None) and \
+            (status.status_code == QuotesStatusCode.REVISED.value)
+
+    def create_successful_status(
+            self, contract_id: int, quotes: List[Quote],
+            previous: Optional[QuotesStatus]) -> QuotesStatus:
+        dates = [quote.date for quote in quotes]
+        earliest = min(dates)
+        latest = max(dates)
+        if self.has_quotes(status=previous):
+            earliest = min(earliest, previous.earliest_quote_requested)
+            latest = max(latest, previous.latest_quote_requested)
+        return QuotesStatus(
+            contract_id=contract_id,
+            status_code=QuotesStatusCode.SUCCESSFUL.value,
+            status_text="Download successful",
+            error_code=None,
+            earliest_quote_requested=earliest,
+            latest_quote_requested=latest,
+            updated_at=datetime.now())
+
+    def create_unchanged_status(
+            self, contract_id: int,
+            previous: QuotesStatus) -> QuotesStatus:
+        # The request succeeded without new quotes, the stored ones are
+        # up to date
+        return QuotesStatus(
+            contract_id=contract_id,
+            status_code=QuotesStatusCode.SUCCESSFUL.value,
+            status_text="No new quotes received",
+            error_code=None,
+            earliest_quote_requested=previous.earliest_quote_requested,
+            latest_quote_requested=previous.latest_quote_requested,
+            updated_at=datetime.now())
+
+    def create_revised_status(
+            self, contract_id: int,
+            previous: Optional[QuotesStatus]) -> QuotesStatus:
+        # Keep the range of quotes, until the full history is replaced
+        return QuotesStatus(
+            contract_id=contract_id,
+            status_code=QuotesStatusCode.REVISED.value,
+            status_text="Adjusted prices revised, full refresh pending",
+            error_code=None,
+            earliest_quote_requested=(
+                previous.earliest_quote_requested if previous is not None
+                else None),
+            latest_quote_requested=(
+                previous.latest_quote_requested if previous is not None
+                else None),
+            updated_at=datetime.now())
+
+    def create_failed_status(
+            self, contract_id: int, code: QuotesStatusCode,
+            previous: Optional[QuotesStatus],
+            error: Optional[RequestError] = None) -> QuotesStatus:
+        # Keep the range of quotes, that is already stored
+        return QuotesStatus(
+            contract_id=contract_id,
+            status_code=code.value,
+            status_text=(error.message[:255] if error is not None
+                         else "No quotes received"),
+            error_code=(error.code if error is not None else None),
+            earliest_quote_requested=(
+                previous.earliest_quote_requested if previous is not None
+                else None),
+            latest_quote_requested=(
+                previous.latest_quote_requested if previous is not None
+                else None),
+            updated_at=datetime.now())
@@ -0,0 +1,168 @@
+import logging
+import queue
+import threading
+import time
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from barbucket.domain_model.data_classes import Quote, QuotesJournalEntry, QuotesStatus
+from barbucket.persistence.data_managers import QuotesDbManager, QuotesJournalDbManager, QuotesStatusDbManager
+from barbucket.util.config_reader import ConfigReader
+
+
+_logger = logging.getLogger(__name__)
+
+_STOP = None
+
+
+class QuotesWriter():
+    """Stores downloaded quotes from a bounded queue within a separate thread
+    and commits them in batches."""
+
+    def __init__(
+            self,
+            quotes_db_manager: QuotesDbManager,
+            status_db_manager: QuotesStatusDbManager,
+            journal_db_manager: QuotesJournalDbManager,
+            config_reader: ConfigReader,
+            orm_session: Session) -> None:
+        self._quotes_db_manager = quotes_db_manager
+        self._status_db_manager = status_db_manager
+        self._journal_db_manager = journal_db_manager
+        self._config_reader = config_reader
+        self._orm_session = orm_session
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+        self._n_written = 0
+        self._n_quotes_written = 0
+        self._n_quotes_skipped = 0
+
+    def start(self) -> None:
+        """Start the writer thread"""
+
+        queue_size = int(self._config_reader.get_config_value_single(
+            section="quotes", option="write_queue_size"))
+        self._batch_size = int(self._config_reader.get_config_value_single(
+            section="quotes", option="commit_batch_size"))
+        self._batch_interval = float(self._config_reader.get_config_value_single(
+            section="quotes", option="commit_interval"))
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._n_written = 0
+        self._n_quotes_written = 0
+        self._n_quotes_skipped = 0
+        self._thread = threading.Thread(
+            target=self._run, name="QuotesWriter", daemon=True)
+        self._thread.start()
+        _logger.debug(f"Started quotes writer with queue size {queue_size}.")
+
+    def put(self, quotes: List[Quote],
+            journal_entry: Optional[QuotesJournalEntry] = None,
+            status: Optional[QuotesStatus] = None,
+            replace: bool = False,
+            stored_until: Optional[date] = None) -> None:
+        """Queue quotes, journal entry and status of one contract for
+        writing, blocks if the queue is full. All are committed together.
+        With 'replace', all stored quotes of the contract are deleted first.
+        Quotes after 'stored_until', the latest stored quote date if known,
+        are written without comparing them to the stored ones.
+
+        :raises Exception: Writing a previous batch failed
+        """
+
+        self._raise_error()
+        self._queue.put((quotes, journal_entry, status, replace,
+                         stored_until))
+
+    def stop(self) -> int:
+        """Write all queued quotes, commit and stop the writer thread
+
+        :raises Exception: Writing failed
+        :return: Number of contracts written
+        :rtype: int
+        """
+
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join()
+            self._thread = None
+        self._raise_error()
+        _logger.debug(f"Stopped quotes writer after writing quotes for "
+                      f"{self._n_written} contracts.")
+        return self._n_written
+
+    def get_quotes_counts(self) -> Tuple[int, int]:
+        """Number of quotes written and of unchanged quotes skipped since the
+        last start"""
+
+        return self._n_quotes_written, self._n_quotes_skipped
+
+    # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
+
+    def _run(self) -> None:
+        n_pending = 0
+        last_commit = time.monotonic()
+        is_stopped = False
+        try:
+            while True:
+                timeout = None
+                if n_pending > 0:
+                    timeout = max(
+                        0, last_commit + self._batch_interval - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = ([], None, None, False, None)
+                if item is _STOP:
+                    is_stopped = True
+                    break
+                quotes, journal_entry, status, replace, stored_until = item
+                if replace and quotes:
+                    self._quotes_db_manager.delete_quotes(
+                        contract_ids={quote.contract_id for quote in quotes})
+                    stored_until = date.min
+                if quotes:
+                    # All quotes of an item belong to the same contract
+                    n_quotes_written = self._quotes_db_manager.upsert_to_db(
+                        quotes=quotes,
+                        stored_until=None if stored_until is None else
+                        {quotes[0].contract_id: stored_until})
+                    self._n_quotes_written += n_quotes_written
+                    self._n_quotes_skipped += len(quotes) - n_quotes_written
+                if journal_entry is not None:
+                    self._journal_db_manager.add_to_db(entry=journal_entry)
+                if status is not None:
+                    self._status_db_manager.add_to_db(status=status)
+                if quotes or (journal_entry is not None) or \
+                        (status is not None):
+                    # Later items of the same contract merge into these rows
+                    self._orm_session.flush()
+                    n_pending += 1
+                if (n_pending >= self._batch_size) or (
+                        n_pending > 0 and
+                        time.monotonic() - last_commit >= self._batch_interval):
+                    self._commit(n_pending=n_pending)
+                    n_pending = 0
+                    last_commit = time.monotonic()
+            if n_pending > 0:
+                self._commit(n_pending=n_pending)
+        except BaseException as e:
+            self._error = e
+            self._orm_session.rollback()
+            # Keep draining, so producers never block on a dead writer
+            while not is_stopped:
+                is_stopped = self._queue.get() is _STOP
+        finally:
+            self._orm_session.close()
+
+    def _commit(self, n_pending: int) -> None:
+        self._orm_session.commit()
+        self._n_written += n_pending
+        _logger.debug(f"Committed quotes for {n_pending} contracts.")
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
@@ -1,10 +1,9 @@
 import logging
-from typing import List
+from typing import Iterable, List
 
-from bs4 import BeautifulSoup
-
-from barbucket.domain_model.data_classes import Contract
+from barbucket.domain_model.listing_contract import ListingContract
 from barbucket.domain_model.types import Api, Exchange, ContractType, ApiNotationTranslator
+from barbucket.datasource_connectors.listing_page_parser import ListingRow, parse_listing_page
 import barbucket.util.custom_exceptions as custom_exceptions
 
 
@@ -15,27 +14,38 @@ class ContractExtractor():
     def __init__(self, api_notation_translator: ApiNotationTranslator) -> None:
         self._api_notation_translator = api_notation_translator
 
-    def extract_contracts(self, html: str, exchange: Exchange) -> List[Contract]:
-        soup = BeautifulSoup(html, 'html.parser')
-        tables = soup.find_all(
-            'table', class_='table table-striped table-bordered')
-        rows = tables[2].tbody.find_all('tr')
+    def extract_contracts(self, html: str,
+                          exchange: Exchange) -> List[ListingContract]:
+        return self.create_contracts(
+            rows=parse_listing_page(html=html).rows, exchange=exchange)
+
+    def create_contracts(self, rows: Iterable[ListingRow],
+                         exchange: Exchange) -> List[ListingContract]:
+        """Create contracts from the rows of an exchange listing page
+
+        :param rows: Rows, as returned by 'parse_listing_page()'
+        :type rows: Iterable[ListingRow]
+        :param exchange: Exchange of the listing
+        :type exchange: Exchange
+        :return: Contracts of the rows
+        :rtype: List[ListingContract]
+        """
+
         website_contracts = []
-        for row in rows:
-            columns = row.find_all('td')
+        for broker_name, name, exchange_name, currency in rows:
             exchange_symbol = self._api_notation_translator.get_ticker_symbol_from_api_notation(
-                name=columns[2].text.strip(),
+                name=exchange_name,
                 api=Api.IB)
             broker_symbol = self._api_notation_translator.get_ticker_symbol_from_api_notation(
-                name=columns[0].text.strip(),
+                name=broker_name,
                 api=Api.IB)
-            contract = Contract(
+            contract = ListingContract(
                 contract_type=ContractType.STOCK.name,
-                exchange_symbol=exchange_symbol.name,
+                exchange=exchange.name,
                 broker_symbol=broker_symbol.name,
-                name=columns[1].text.strip(),
-                currency=columns[3].text.strip(),
-                exchange=exchange.name)
+                currency=currency,
+                exchange_symbol=exchange_symbol.name,
+                name=name)
             website_contracts.append(contract)
         if website_contracts == []:
             raise custom_exceptions.InvalidDataReceivedError(
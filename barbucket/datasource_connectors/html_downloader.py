@@ -1,18 +1,66 @@
+import logging
+import threading
+import time
+from typing import Optional
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from barbucket.api.request_pacer import RequestPacer
 from barbucket.domain_model.types import Api, Exchange, ApiNotationTranslator
+from barbucket.persistence.listing_page_cache import CachedPage, ListingPageCache
+
+
+_logger = logging.getLogger(__name__)
+
+# Seconds to wait for the connection and for every read from the IB website
+_TIMEOUT = (10, 30)
+_MAX_RETRIES = 4
+# Retries wait 1, 2, 4, ... seconds, unless the server sends 'Retry-After'
+_BACKOFF_FACTOR = 1
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
 
 
 class HtmlDownloader():
-    def __init__(self, api_notation_translator: ApiNotationTranslator) -> None:
+    """Downloads exchange listings from the IB website.
+
+    All requests share one session, so connections are kept alive and reused
+    between pages. Failed requests and responses with status 429 or 5xx are
+    retried with exponential backoff. With 'requests_per_second', requests
+    are spread evenly over time, also between threads.
+
+    With a 'page_cache', pages are kept on disk. Pages within its TTL are
+    read from the cache without any request. Stale pages are revalidated with
+    'If-None-Match' and 'If-Modified-Since', so an unchanged page costs a
+    '304 Not Modified' instead of a full download. Without a cache, every
+    page is downloaded completely. Only requests to the website count
+    against 'requests_per_second', pages from the cache are read at once.
+    """
+
+    def __init__(self, api_notation_translator: ApiNotationTranslator,
+                 session: Optional[requests.Session] = None,
+                 page_cache: Optional[ListingPageCache] = None,
+                 requests_per_second: Optional[float] = None) -> None:
+        if (requests_per_second is not None) and (requests_per_second <= 0):
+            raise ValueError(
+                f"Config option 'listing_requests_per_second' must be "
+                f"greater than 0, not {requests_per_second}.")
         self._api_notation_translator = api_notation_translator
+        self._session = session or create_session()
+        self._page_cache = page_cache
+        self._pacer: Optional[RequestPacer] = None
+        if requests_per_second is not None:
+            self._pacer = RequestPacer(
+                max_requests=1, period=1 / requests_per_second)
+        self._pacer_lock = threading.Lock()
 
     def get_weblisting_singlepage(self, exchange: Exchange) -> str:
         ex = self._api_notation_translator.get_api_notation_for_exchange(
             exchange=exchange, api=Api.IB)
         url = (f"https://www.interactivebrokers.com/en/index.php?f=567&exch="
                f"{ex}")
-        return requests.get(url).text
+        return self._get(url=url, exchange=exchange, page=0)
 
     def get_weblisting_multipage(self, exchange: Exchange, page: int) -> str:
         ex = self._api_notation_translator.get_api_notation_for_exchange(
@@ -20,4 +68,72 @@ class HtmlDownloader():
         url = (f"https://www.interactivebrokers.com/en/index.php?f=2222"
                f"&exch={ex}&showcategories=STK&p=&cc=&limit="
                f"100&page={page}")
-        return requests.get(url).text
+        return self._get(url=url, exchange=exchange, page=page)
+
+    def close(self) -> None:
+        """Close all pooled connections"""
+
+        self._session.close()
+
+    # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
+
+    def _get(self, url: str, exchange: Exchange, page: int) -> str:
+        cached_page = None
+        if self._page_cache is not None:
+            cached_page = self._page_cache.read(
+                exchange=exchange.name, page=page)
+        if (cached_page is not None) and \
+                self._page_cache.is_fresh(cached_page=cached_page):
+            _logger.debug(f"Read page '{url}' from cache.")
+            return cached_page.html
+        headers = {}
+        if cached_page is not None:
+            if cached_page.etag:
+                headers["If-None-Match"] = cached_page.etag
+            if cached_page.last_modified:
+                headers["If-Modified-Since"] = cached_page.last_modified
+        self._wait_for_pacer(url=url, exchange=exchange)
+        response = self._session.get(url, headers=headers, timeout=_TIMEOUT)
+        if (response.status_code == 304) and (cached_page is not None):
+            _logger.debug(f"Page '{url}' is not modified.")
+            self._write_cached_page(
+                exchange=exchange, page=page, cached_page=cached_page)
+            return cached_page.html
+        response.raise_for_status()
+        self._write_cached_page(
+            exchange=exchange, page=page, cached_page=CachedPage(
+                html=response.text,
+                etag=response.headers.get("ETag", ""),
+                last_modified=response.headers.get("Last-Modified", "")))
+        return response.text
+
+    def _wait_for_pacer(self, url: str, exchange: Exchange) -> None:
+        # Show some mercy to IB webserver and dont get yourself banned
+        if self._pacer is None:
+            return
+        with self._pacer_lock:
+            wait = self._pacer.reserve(request_key=url, contract_key=exchange)
+        time.sleep(wait)
+
+    def _write_cached_page(self, exchange: Exchange, page: int,
+                           cached_page: CachedPage) -> None:
+        if self._page_cache is not None:
+            self._page_cache.write(
+                exchange=exchange.name, page=page, cached_page=cached_page)
+
+
+def create_session() -> requests.Session:
+    """Create a session, that retries failed requests and accepts compressed
+    responses"""
+
+    retry = Retry(
+        total=_MAX_RETRIES,
+        backoff_factor=_BACKOFF_FACTOR,
+        status_forcelist=_RETRY_STATUSES,
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True)
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(max_retries=retry))
+    session.mount("http://", HTTPAdapter(max_retries=retry))
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    return session
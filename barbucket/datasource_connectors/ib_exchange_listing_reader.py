@@ -1,11 +1,14 @@
-import time
 import logging
-from typing import List
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+from typing import Deque, Iterator, List, Optional, Tuple
 from abc import ABC, abstractmethod
 
 import enlighten
 
-from barbucket.domain_model.data_classes import Contract
+from barbucket.domain_model.listing_contract import ListingContract
 from barbucket.util.signal_handler import SignalHandler
 from barbucket.util.custom_exceptions import ExitSignalDetectedError
 from barbucket.domain_model.types import Exchange
@@ -13,6 +16,7 @@ from barbucket.datasource_connectors.html_downloader import HtmlDownloader
 from barbucket.datasource_connectors.html_corrector import HtmlCorrector
 from barbucket.datasource_connectors.contract_extractor import ContractExtractor
 from barbucket.datasource_connectors.pagecount_extractor import PageCountExtractor
+from barbucket.datasource_connectors.listing_page_parser import ListingPage, parse_listing_page
 
 
 _logger = logging.getLogger(__name__)
@@ -28,7 +32,8 @@ class IbExchangeListingReader(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def read_ib_exchange_listing(self, exchange: Exchange) -> List[Contract]:
+    def read_ib_exchange_listing_pages(
+            self, exchange: Exchange) -> Iterator[List[ListingContract]]:
         raise NotImplementedError
 
 
@@ -43,14 +48,14 @@ class IbExchangeListingSinglepageReader(IbExchangeListingReader):
         self._corrector = corrector
         self._contract_extractor = contract_extractor
 
-    def read_ib_exchange_listing(self, exchange: Exchange) -> List[Contract]:
+    def read_ib_exchange_listing_pages(
+            self, exchange: Exchange) -> Iterator[List[ListingContract]]:
         """Read contracts from exchange listing website
 
-        :param cont_type: Contracts type to read
         :param exchange: Exchange to read from
         :type exchange: Exchange
-        :return: Contracts from website
-        :rtype: List[Dict[str, Any]]
+        :return: Contracts from website, as a single page
+        :rtype: Iterator[List[ListingContract]]
         """
 
         html = self._downloader.get_weblisting_singlepage(
@@ -58,59 +63,125 @@ class IbExchangeListingSinglepageReader(IbExchangeListingReader):
         # html = self._corrector.correct_ib_error_singlepage(html=html)
         web_contracts = self._contract_extractor.extract_contracts(
             html, exchange=exchange)
-        return web_contracts
+        yield web_contracts
 
 
 class IbExchangeListingMultipageReader(IbExchangeListingReader):
-    """Exchange listings reader for multipage listings"""
+    """Exchange listings reader for multipage listings
+
+    The first page is read on its own, to learn the page count. All further
+    pages are downloaded in parallel, with at most 'max_concurrent_requests'
+    downloads in flight and at most twice as many pages ahead of the
+    consumer. The downloader limits the requests per second. With more than
+    one 'parse_processes', the pages are parsed within a pool of processes,
+    otherwise within the downloading threads.
+    """
 
     def __init__(self,
                  downloader: HtmlDownloader,
                  corrector: HtmlCorrector,
                  pagecount_extractor: PageCountExtractor,
-                 contract_extractor: ContractExtractor) -> None:
+                 contract_extractor: ContractExtractor,
+                 max_concurrent_requests: int,
+                 parse_processes: int) -> None:
+        if max_concurrent_requests < 1:
+            raise ValueError(
+                f"Config option 'listing_concurrent_requests' must be at "
+                f"least 1, not {max_concurrent_requests}.")
+        if parse_processes < 1:
+            raise ValueError(
+                f"Config option 'listing_parse_processes' must be at least "
+                f"1, not {parse_processes}.")
         self._downloader = downloader
         self._corrector = corrector
         self._pagecount_extractor = pagecount_extractor
         self._contract_extractor = contract_extractor
+        self._max_concurrent_requests = max_concurrent_requests
+        self._parse_processes = parse_processes
 
-    def read_ib_exchange_listing(self, exchange: Exchange) -> List[Contract]:
-        """Read contracts from exchange listing website
+    def read_ib_exchange_listing_pages(
+            self, exchange: Exchange) -> Iterator[List[ListingContract]]:
+        """Read contracts from exchange listing website page by page.
+
+        Pages are yielded in order, while the following pages are still
+        being downloaded. Closing the iterator stops the download.
 
-        :param type_: Contracts type to read
-        :type type_: str
         :param exchange: Exchange to read from
-        :type exchange: str
-        :return: Contracts from website
-        :rtype: List[Dict[str, Any]]
+        :type exchange: Exchange
+        :return: Contracts from website, one list per page
+        :rtype: Iterator[List[ListingContract]]
         """
 
-        web_contracts: List[Contract] = []
-        current_page = 1
-        page_count = 1
         signal_handler = SignalHandler()
         pb_manager = enlighten.get_manager()
         progress_bar = pb_manager.counter(total=0, desc="Pages", unit="pages")
 
-        while current_page <= page_count:
-            html = self._downloader.get_weblisting_multipage(
-                exchange=exchange, page=current_page)
-            # html = self._corrector.correct_ib_error_multipage(html=html)
-            if current_page == 1:
-                page_count = self._pagecount_extractor.get_page_count(
-                    html)
-                progress_bar.total = page_count
-            page_contracts = self._contract_extractor.extract_contracts(
-                html=html, exchange=exchange)
-            _logger.debug(f"Scraped IB exchange listing for '{exchange.name}', "
-                          f"page {current_page}.")
-            web_contracts += page_contracts
-            if signal_handler.is_exit_requested():
-                raise ExitSignalDetectedError(
-                    "User pressed 'Ctrl+C'.")  # is handled above
-            progress_bar.update(incr=1)
-            current_page += 1
-            if current_page != page_count:
-                # show some mercy to IB webserver and dont get yourself banned
-                time.sleep(3)
-        return web_contracts
+        html = self._download_page(exchange=exchange, page=1)
+        page_count = self._pagecount_extractor.get_page_count(html)
+        progress_bar.total = page_count
+        yield self._create_contracts(
+            listing_page=parse_listing_page(html=html), exchange=exchange,
+            page=1)
+        progress_bar.update(incr=1)
+
+        parse_executor = None
+        if self._parse_processes > 1:
+            # Forking is unsafe, while the download threads are running
+            parse_executor = ProcessPoolExecutor(
+                max_workers=self._parse_processes,
+                mp_context=multiprocessing.get_context("spawn"))
+        executor = ThreadPoolExecutor(
+            max_workers=self._max_concurrent_requests,
+            thread_name_prefix="listing")
+        # Only a few pages are downloaded ahead of the consumer, to keep
+        # memory bounded on long listings
+        window = self._max_concurrent_requests * 2
+        pages = iter(range(2, page_count + 1))
+        futures: Deque[Tuple[int, Future]] = deque()
+        try:
+            for page in islice(pages, window):
+                futures.append((page, executor.submit(
+                    self._read_page, exchange, page, parse_executor)))
+            while futures:
+                if signal_handler.is_exit_requested():
+                    raise ExitSignalDetectedError(
+                        "User pressed 'Ctrl+C'.")  # is handled above
+                page, future = futures.popleft()
+                listing_page = future.result()
+                for next_page in islice(pages, 1):
+                    futures.append((next_page, executor.submit(
+                        self._read_page, exchange, next_page, parse_executor)))
+                yield self._create_contracts(
+                    listing_page=listing_page, exchange=exchange, page=page)
+                progress_bar.update(incr=1)
+        finally:
+            # Pages, that were not started yet, are not downloaded anymore.
+            # Running downloads finish in the background, so closing the
+            # iterator doesn't wait for the request pacing.
+            executor.shutdown(wait=False, cancel_futures=True)
+            if parse_executor is not None:
+                parse_executor.shutdown(wait=False, cancel_futures=True)
+
+    # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
+
+    def _download_page(self, exchange: Exchange, page: int) -> str:
+        html = self._downloader.get_weblisting_multipage(
+            exchange=exchange, page=page)
+        # html = self._corrector.correct_ib_error_multipage(html=html)
+        return html
+
+    def _read_page(self, exchange: Exchange, page: int,
+                   parse_executor: Optional[ProcessPoolExecutor]
+                   ) -> ListingPage:
+        html = self._download_page(exchange=exchange, page=page)
+        if parse_executor is None:
+            return parse_listing_page(html=html)
+        return parse_executor.submit(parse_listing_page, html).result()
+
+    def _create_contracts(self, listing_page: ListingPage, exchange: Exchange,
+                          page: int) -> List[ListingContract]:
+        page_contracts = self._contract_extractor.create_contracts(
+            rows=listing_page.rows, exchange=exchange)
+        _logger.debug(f"Scraped IB exchange listing for '{exchange.name}', "
+                      f"page {page}.")
+        return page_contracts
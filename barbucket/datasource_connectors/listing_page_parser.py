@@ -0,0 +1,93 @@
+import logging
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
+
+from bs4 import BeautifulSoup
+try:
+    import lxml.html
+except ImportError:  # optional dependency
+    lxml = None
+
+
+_logger = logging.getLogger(__name__)
+
+_TABLE_CLASS = "table table-striped table-bordered"
+# The contracts are listed within the third of these tables
+_CONTRACTS_TABLE_INDEX = 2
+# Broker symbol, name, exchange symbol, currency
+ListingRow = Tuple[str, str, str, str]
+
+
+class ListingPage(NamedTuple):
+    """Contents of an exchange listing page"""
+
+    rows: Tuple[ListingRow, ...]
+    page_count: Optional[int]
+
+
+@lru_cache(maxsize=4)
+def parse_listing_page(html: str) -> ListingPage:
+    """Extract the contract rows and the page count from an exchange listing
+    page.
+
+    Uses lxml if it is installed, otherwise BeautifulSoup with the
+    'html.parser'. Both give identical results. The last pages are memoized,
+    so extracting contracts and the page count from the same page parses it
+    only once. Results can be pickled, so pages can be parsed within other
+    processes.
+
+    :param html: Html of the page
+    :type html: str
+    :return: Contract rows and page count, which is None if the page has no
+        pagination
+    :rtype: ListingPage
+    """
+
+    if lxml is None:
+        return _parse_with_beautifulsoup(html=html)
+    return _parse_with_lxml(html=html)
+
+
+# ~~~~~~~~~~~~~~~~~~~~~ private functions ~~~~~~~~~~~~~~~~~~~~~
+
+
+def _parse_with_lxml(html: str) -> ListingPage:
+    document = lxml.html.fromstring(html)
+    rows: Tuple[ListingRow, ...] = ()
+    tables = document.xpath(f"//table[@class='{_TABLE_CLASS}']")
+    if len(tables) > _CONTRACTS_TABLE_INDEX:
+        bodies = tables[_CONTRACTS_TABLE_INDEX].xpath(".//tbody")
+        if bodies:
+            rows = tuple(
+                _to_row([cell.text_content() for cell in row.xpath(".//td")])
+                for row in bodies[0].xpath(".//tr"))
+    page_count = None
+    paginations = document.xpath(
+        "//ul[contains(concat(' ', normalize-space(@class), ' '), "
+        "' pagination ')]")
+    if paginations:
+        page_buttons = paginations[0].xpath(".//li")
+        page_count = int(page_buttons[-2].text_content())
+    return ListingPage(rows=rows, page_count=page_count)
+
+
+def _parse_with_beautifulsoup(html: str) -> ListingPage:
+    soup = BeautifulSoup(html, 'html.parser')
+    rows: Tuple[ListingRow, ...] = ()
+    tables = soup.find_all('table', class_=_TABLE_CLASS)
+    if (len(tables) > _CONTRACTS_TABLE_INDEX) and \
+            (tables[_CONTRACTS_TABLE_INDEX].tbody is not None):
+        rows = tuple(
+            _to_row([cell.text for cell in row.find_all('td')])
+            for row in tables[_CONTRACTS_TABLE_INDEX].tbody.find_all('tr'))
+    page_count = None
+    pagination_tables = soup.find_all('ul', class_='pagination')
+    if pagination_tables:
+        page_buttons = pagination_tables[0].find_all('li')
+        page_count = int(page_buttons[-2].text)
+    return ListingPage(rows=rows, page_count=page_count)
+
+
+def _to_row(cells: List[str]) -> ListingRow:
+    return (cells[0].strip(), cells[1].strip(), cells[2].strip(),
+            cells[3].strip())
@@ -1,6 +1,7 @@
 import logging
 
-from bs4 import BeautifulSoup
+from barbucket.datasource_connectors.listing_page_parser import parse_listing_page
+from barbucket.util.custom_exceptions import InvalidDataReceivedError
 
 
 _logger = logging.getLogger(__name__)
@@ -8,9 +9,7 @@ _logger = logging.getLogger(__name__)
 
 class PageCountExtractor():
     def get_page_count(self, html: str) -> int:
-        soup = BeautifulSoup(html, 'html.parser')
-        pagination_tables = soup.find_all('ul', class_='pagination')
-        page_buttons = pagination_tables[0].find_all('li')
-        page_count = int(page_buttons[-2].text)
-        # todo: handle errors
+        page_count = parse_listing_page(html=html).page_count
+        if page_count is None:
+            raise InvalidDataReceivedError("No page count in webpage found.")
         return page_count
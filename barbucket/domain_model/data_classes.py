@@ -1,5 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, Date, BigInteger, ForeignKey, UniqueConstraint
+from datetime import date, timedelta
+
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, BigInteger, Boolean, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy.types import TypeDecorator
 
 
 Base = declarative_base()
@@ -33,16 +36,26 @@ class Contract(Base):
         back_populates="contract",
         cascade="all, delete",
         passive_deletes=True)
-    # quotes_status = relationship(
-    #     "QuotesStatus",
-    #     back_populates="contract",
-    #     cascade="all, delete",
-    #     passive_deletes=True)
+    quotes_status = relationship(
+        "QuotesStatus",
+        back_populates="contract",
+        cascade="all, delete",
+        passive_deletes=True)
     quote = relationship(
         "Quote",
         back_populates="contract",
         cascade="all, delete",
         passive_deletes=True)
+    quotes_journal_entries = relationship(
+        "QuotesJournalEntry",
+        back_populates="contract",
+        cascade="all, delete",
+        passive_deletes=True)
+    quotes_quality_check = relationship(
+        "QuotesQualityCheck",
+        back_populates="contract",
+        cascade="all, delete",
+        passive_deletes=True)
 
     def __eq__(self, other):
         return (
@@ -142,29 +155,85 @@ class ContractDetailsTv(Base):
             contract={self.contract})"""
 
 
-# class QuotesStatus(Base):
-#     __tablename__ = 'quotes_status'
+class QuotesStatus(Base):
+    __tablename__ = 'quotes_status'
+
+    contract_id = Column(
+        Integer,
+        ForeignKey('contracts.id', ondelete="CASCADE"),
+        primary_key=True)
+    status_code = Column(Integer)
+    status_text = Column(String(255))
+    error_code = Column(Integer)
+    earliest_quote_requested = Column(Date)
+    latest_quote_requested = Column(Date)
+    updated_at = Column(DateTime)
+
+    contract = relationship(
+        "Contract", back_populates="quotes_status")
+
+    def __repr__(self):
+        return f"""QuotesStatus(
+            contract_id={self.contract_id},
+            status_code={self.status_code},
+            status_text={self.status_text},
+            error_code={self.error_code},
+            latest_quote_requested={self.latest_quote_requested},
+            earliest_quote_requested={self.earliest_quote_requested},
+            updated_at={self.updated_at},
+            contract={self.contract})"""
+
+
+class QuotesJournalEntry(Base):
+    __tablename__ = 'quotes_journal'
+
+    universe = Column(String(100), primary_key=True)
+    contract_id = Column(
+        Integer,
+        ForeignKey('contracts.id', ondelete="CASCADE"),
+        primary_key=True)
+    outcome = Column(String(30))
+    error_code = Column(Integer)
+    error_text = Column(String(255))
+    updated_at = Column(DateTime)
+
+    contract = relationship(
+        "Contract", back_populates="quotes_journal_entries")
+
+    def __repr__(self):
+        return f"""QuotesJournalEntry(
+            universe={self.universe},
+            contract_id={self.contract_id},
+            outcome={self.outcome},
+            error_code={self.error_code},
+            error_text={self.error_text},
+            updated_at={self.updated_at})"""
+
+
+class QuotesQualityCheck(Base):
+    __tablename__ = 'quotes_quality_checks'
 
-#     contract_id = Column(
-#         Integer,
-#         ForeignKey('contracts.id', ondelete="CASCADE"),
-#         primary_key=True)
-#     status_code = Column(Integer)
-#     status_text = Column(String(255))
-#     earliest_quote_requested = Column(Date)
-#     latest_quote_requested = Column(Date)
+    contract_id = Column(
+        Integer,
+        ForeignKey('contracts.id', ondelete="CASCADE"),
+        primary_key=True)
+    quotes_count = Column(Integer)
+    missing_quotes_at_end = Column(Integer)
+    max_gap_size = Column(Integer)
+    passed = Column(Boolean)
+    checked_at = Column(DateTime)
 
-#     contract = relationship(
-#         "Contract", back_populates="quotes_status")
+    contract = relationship(
+        "Contract", back_populates="quotes_quality_check")
 
-#     def __repr__(self):
-#         return f"""QuotesStatus(
-#             contract_id={self.contract_id},
-#             status_code={self.status_code},
-#             status_text={self.status_text},
-#             latest_quote_requested={self.latest_quote_requested},
-#             earliest_quote_requested={self.earliest_quote_requested},
-#             contract={self.contract})"""
+    def __repr__(self):
+        return f"""QuotesQualityCheck(
+            contract_id={self.contract_id},
+            quotes_count={self.quotes_count},
+            missing_quotes_at_end={self.missing_quotes_at_end},
+            max_gap_size={self.max_gap_size},
+            passed={self.passed},
+            checked_at={self.checked_at})"""
 
 
 class Quote(Base):
@@ -201,3 +270,91 @@ class Quote(Base):
             close={self.close},
             volume={self.volume},
             contract={self.contract})"""
+
+
+class DayNumber(TypeDecorator):
+    """Stores a date as the number of days since 1970-01-01"""
+
+    impl = Integer
+    cache_ok = True
+    epoch = date(1970, 1, 1)
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return (value - self.epoch).days
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self.epoch + timedelta(days=value)
+
+
+class ScaledPrice(TypeDecorator):
+    """Stores a price as an integer with four fixed decimals"""
+
+    impl = BigInteger
+    cache_ok = True
+    scale = 10_000
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return round(value * self.scale)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return value / self.scale
+
+
+class RoundedVolume(TypeDecorator):
+    """Stores a volume as an integer"""
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return round(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return float(value)
+
+
+class CompactQuote(Base):
+    """Same as Quote, with integer columns only and without a rowid on
+    SQLite, so every row is stored once within the primary key B-tree,
+    clustered by contract and date."""
+
+    __tablename__ = 'quotes_compact'
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    contract_id = Column(
+        Integer,
+        ForeignKey('contracts.id', ondelete="CASCADE"),
+        primary_key=True)
+    date = Column(DayNumber, primary_key=True)
+    open = Column(ScaledPrice)
+    high = Column(ScaledPrice)
+    low = Column(ScaledPrice)
+    close = Column(ScaledPrice)
+    volume = Column(RoundedVolume)
+
+    def __eq__(self, other):
+        return (
+            (self.contract_id == other.contract_id) and
+            (self.date == other.date))
+
+    def __repr__(self):
+        return f"""CompactQuote(
+            contract_id={self.contract_id},
+            date={self.date},
+            open={self.open},
+            high={self.high},
+            low={self.low},
+            close={self.close},
+            volume={self.volume})"""
@@ -0,0 +1,26 @@
+from typing import NamedTuple, Tuple
+
+
+# contract_type, exchange, broker_symbol, currency, identifies a Contract
+ContractKey = Tuple[str, str, str, str]
+
+
+class ListingContract(NamedTuple):
+    """A contract from an exchange listing.
+
+    Lighter than an ORM Contract, so whole listings can be streamed and
+    compared against the database without creating ORM objects.
+    """
+
+    contract_type: str
+    exchange: str
+    broker_symbol: str
+    currency: str
+    exchange_symbol: str
+    name: str
+
+    def get_key(self) -> ContractKey:
+        """Key, that is equal for equal Contracts"""
+
+        return (self.contract_type, self.exchange, self.broker_symbol,
+                self.currency)
@@ -0,0 +1,23 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass
+class QuotesPanel():
+    """One quote column of many contracts on a shared date index.
+
+    'values' has one row per date and one column per contract, days without
+    a quote are NaN.
+    """
+
+    dates: np.ndarray  # datetime64[D]
+    contract_ids: np.ndarray  # int64
+    values: np.ndarray  # float32, shape (len(dates), len(contract_ids))
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            self.values,
+            index=pd.Index(self.dates, name="date"),
+            columns=pd.Index(self.contract_ids, name="contract_id"))
@@ -80,6 +80,23 @@ class StockType(Enum):
     NO_DATA = auto()
 
 
+class QuotesStatusCode(Enum):
+    """Enumeration of download states of a contracts quotes, values are
+    stored in the database"""
+    NOT_DOWNLOADED = 0
+    SUCCESSFUL = 1
+    NO_DATA = 2
+    FAILED = 3
+    REVISED = 4  # Stored history is outdated and needs a full refresh
+
+
+class QuotesJournalOutcome(Enum):
+    """Enumeration of outcomes of a quotes download for a contract"""
+    DONE = auto()
+    FAILED = auto()
+    NO_DATA = auto()
+
+
 class TickerSymbol():
     def __init__(self, name: str) -> None:
         """ """
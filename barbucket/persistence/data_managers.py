@@ -1,16 +1,43 @@
-from typing import List
+from typing import Dict, Iterable, List, Optional, Union
+import csv
+import io
 import logging
-from datetime import date
+from datetime import date, datetime
 
-from sqlalchemy import select, delete, and_
+import numpy as np
+import pandas as pd
+from sqlalchemy import Table, select, delete, and_, event, func
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
+from sqlalchemy.types import TypeDecorator
 
-from barbucket.domain_model.data_classes import\
-    Contract, UniverseMembership, ContractDetailsIb, ContractDetailsTv, Quote
+from barbucket.domain_model.data_classes import (
+    Contract, UniverseMembership, ContractDetailsIb, ContractDetailsTv, Quote,
+    QuotesJournalEntry, QuotesStatus, QuotesQualityCheck, CompactQuote,
+    ScaledPrice)
+from barbucket.domain_model.listing_contract import ContractKey
+from barbucket.domain_model.types import QuotesStatusCode
+from barbucket.persistence.parquet_quotes_store import ParquetQuotesStore
+from barbucket.persistence.quotes_cache import QUOTES_DTYPE, QuotesCache
 
 
 _logger = logging.getLogger(__name__)
 
+_ON_CONFLICT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert}
+_QUOTE_VALUE_COLUMNS = ("open", "high", "low", "close", "volume")
+_QUOTE_COLUMNS = ("contract_id", "date") + _QUOTE_VALUE_COLUMNS
+_QUOTES_STAGING_TABLE = "quotes_staging"
+_QUOTES_READ_CHUNK_SIZE = 100_000
+# Ids per IN clause, stays below the limit of bound parameters of all DBMS
+_MAX_IN_CLAUSE_IDS = 1_000
+# Received quotes within these tolerances of the stored ones are not written
+# again. They cover the rounding of the compact schema and of float32.
+_UNCHANGED_RELATIVE_TOLERANCE = 1e-6
+_UNCHANGED_PRICE_TOLERANCE = 0.00005
+_UNCHANGED_VOLUME_TOLERANCE = 0.5
+
 
 class UniverseDbManager():
     def __init__(self, orm_session: Session) -> None:
@@ -43,6 +70,16 @@ class UniverseDbManager():
                       f"from database with session '{self._orm_session}'.")
         return members
 
+    def get_member_ids(self, name: str) -> List[int]:
+        statement = (select(UniverseMembership.contract_id)
+                     .where(UniverseMembership.universe == name)
+                     .order_by(UniverseMembership.contract_id))
+        member_ids = self._orm_session.execute(statement).scalars().all()
+        _logger.debug(f"Read {len(member_ids)} member ids for universe "
+                      f"'{name}' from database with session "
+                      f"'{self._orm_session}'.")
+        return member_ids
+
     def delete_universe(self, name: str) -> None:
         statement = (delete(UniverseMembership)
                      .where(UniverseMembership.universe == name))
@@ -88,60 +125,553 @@ class ContractsDbManager():
                       f"'{self._orm_session}'.")
         return contracts
 
+    def get_keys_by_filters(self, filters) -> Dict[ContractKey, int]:
+        """Keys and ids of the contracts, without loading ORM objects"""
+
+        statement = (select(Contract.contract_type, Contract.exchange,
+                            Contract.broker_symbol, Contract.currency,
+                            Contract.id)
+                     .where(and_(*filters)))
+        keys = {tuple(row[:4]): row[4]
+                for row in self._orm_session.execute(statement)}
+        filters_string = ", ".join([str(f) for f in filters])
+        _logger.debug(f"Read {len(keys)} contract keys from database for "
+                      f"filters '{filters_string}' with session "
+                      f"'{self._orm_session}'.")
+        return keys
+
+    def get_by_ids(self, contract_ids: List[int]) -> List[Contract]:
+        contracts = []
+        for i in range(0, len(contract_ids), _MAX_IN_CLAUSE_IDS):
+            statement = (select(Contract).where(Contract.id.in_(
+                contract_ids[i:i + _MAX_IN_CLAUSE_IDS])))
+            contracts += self._orm_session.execute(statement).scalars().all()
+        _logger.debug(f"Read {len(contracts)} contracts from database by id "
+                      f"with session '{self._orm_session}'.")
+        return contracts
+
     def delete_from_db(self, contract: Contract) -> None:
         self._orm_session.delete(contract)
         _logger.debug(f"Deleted Contract '{contract}' with session "
                       f"'{self._orm_session}'")
 
 
-# class QuotesStatusDbManager():
-#     def __init__(self, orm_session: Session) -> None:
-#         self._orm_session = orm_session
+class QuotesStatusDbManager():
+    def __init__(self, orm_session: Session) -> None:
+        self._orm_session = orm_session
 
-#     def read_from_db(self, contract: Contract) -> QuotesStatus:
-#         statement = (select(QuotesStatus)
-#                      .where(QuotesStatus.contract == contract))
-#         count = self._orm_session.execute(statement).count()
-#         if count == 0:
-#             self._create_new_status(contract)
-#         status = self._orm_session.execute(statement).scalar_one()
-#         _logger.debug(f"Read QuoteStatus '{status}' from database with session "
-#                       f"'{self._orm_session}'.")
-#         return status
+    def get_statuses(self, universe: str) -> Dict[int, QuotesStatus]:
+        """Statuses of all members of a universe, that have a status"""
 
-#     def add_to_db(self, status: QuotesStatus) -> None:
-#         self._orm_session.add(status)
-#         _logger.debug(f"Added QuotesStatus '{status}' to session "
-#                       f"'{self._orm_session}'")
+        statement = (select(QuotesStatus)
+                     .join(UniverseMembership,
+                           UniverseMembership.contract_id ==
+                           QuotesStatus.contract_id)
+                     .where(UniverseMembership.universe == universe))
+        result = self._orm_session.execute(statement).scalars().all()
+        statuses = {status.contract_id: status for status in result}
+        _logger.debug(f"Read {len(statuses)} QuotesStatus for universe "
+                      f"'{universe}' from database with session "
+                      f"'{self._orm_session}'.")
+        return statuses
+
+    def get_last_update(self, universe: str) -> Optional[datetime]:
+        """Latest change of the quotes status of all members of a universe"""
+
+        statement = (select(func.max(QuotesStatus.updated_at))
+                     .join(UniverseMembership,
+                           UniverseMembership.contract_id ==
+                           QuotesStatus.contract_id)
+                     .where(UniverseMembership.universe == universe))
+        return self._orm_session.execute(statement).scalar()
+
+    def delete_statuses(self, universe: str,
+                        status_code: QuotesStatusCode) -> int:
+        """Delete the statuses with a code of all members of a universe
+
+        :return: Number of deleted statuses
+        :rtype: int
+        """
+
+        members = (select(UniverseMembership.contract_id)
+                   .where(UniverseMembership.universe == universe))
+        statement = (delete(QuotesStatus)
+                     .where(QuotesStatus.status_code == status_code.value)
+                     .where(QuotesStatus.contract_id.in_(members))
+                     .execution_options(synchronize_session=False))
+        n_deleted = self._orm_session.execute(statement).rowcount
+        _logger.debug(f"Deleted {n_deleted} QuotesStatus with code "
+                      f"'{status_code.name}' for universe '{universe}' with "
+                      f"session '{self._orm_session}'.")
+        return n_deleted
 
-#     def _create_new_status(self, contract: Contract) -> None:
-#         new_status = QuotesStatus(
-#             status_code=0,
-#             status_text="No quotes downloaded yet.")
-#         self._orm_session.add(new_status)
-#         _logger.debug(f"Created new QuotesStatus '{new_status}' for contract "
-#                       f"'{contract}' in session '{self._orm_session}'.")
+    def add_to_db(self, status: QuotesStatus) -> None:
+        self._orm_session.merge(status)
+        _logger.debug(f"Added QuotesStatus '{status}' to session "
+                      f"'{self._orm_session}'")
 
 
-class QuotesDbManager():
+class QuotesQualityDbManager():
+    def __init__(self, orm_session: Session) -> None:
+        self._orm_session = orm_session
+
+    def add_all_to_db(self, checks: List[QuotesQualityCheck]) -> None:
+        """Insert or replace the checks of many contracts at once"""
+
+        if not checks:
+            return
+        table = QuotesQualityCheck.__table__
+        rows = [{column.name: getattr(check, column.name)
+                 for column in table.columns} for check in checks]
+        dialect = self._orm_session.get_bind().dialect.name
+        if dialect in _ON_CONFLICT_INSERTS:
+            statement = _ON_CONFLICT_INSERTS[dialect](table)
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.contract_id],
+                set_={column.name: statement.excluded[column.name]
+                      for column in table.columns
+                      if column.name != "contract_id"})
+            self._orm_session.execute(statement, rows)
+        else:
+            for check in checks:
+                self._orm_session.merge(check)
+        _logger.debug(f"Added {len(checks)} QuotesQualityCheck to session "
+                      f"'{self._orm_session}'")
+
+    def get_checks(self, universe: str) -> Dict[int, QuotesQualityCheck]:
+        """Checks of all members of a universe, that were checked"""
+
+        statement = (select(QuotesQualityCheck)
+                     .join(UniverseMembership,
+                           UniverseMembership.contract_id ==
+                           QuotesQualityCheck.contract_id)
+                     .where(UniverseMembership.universe == universe))
+        result = self._orm_session.execute(statement).scalars().all()
+        checks = {check.contract_id: check for check in result}
+        _logger.debug(f"Read {len(checks)} QuotesQualityCheck for universe "
+                      f"'{universe}' from database with session "
+                      f"'{self._orm_session}'.")
+        return checks
+
+    def get_passed_contract_ids(self, universe: str) -> List[int]:
+        """Members of a universe, whose quotes passed the last check"""
+
+        statement = (select(QuotesQualityCheck.contract_id)
+                     .join(UniverseMembership,
+                           UniverseMembership.contract_id ==
+                           QuotesQualityCheck.contract_id)
+                     .where(UniverseMembership.universe == universe)
+                     .where(QuotesQualityCheck.passed)
+                     .order_by(QuotesQualityCheck.contract_id))
+        return self._orm_session.execute(statement).scalars().all()
+
+
+class QuotesJournalDbManager():
     def __init__(self, orm_session: Session) -> None:
         self._orm_session = orm_session
 
-    def upsert_to_db(self, quotes: List[Quote]) -> None:
-        # Needs to overwrite existing quotes
-        contract_id = quotes[0].contract_id
-        dates = [quote.date for quote in quotes]
-        conflicted_quotes = self._orm_session.execute(
-            select(Quote)
-            .where(and_(Quote.contract_id == contract_id, Quote.date.in_(dates)))
+    def add_to_db(self, entry: QuotesJournalEntry) -> None:
+        self._orm_session.merge(entry)
+        _logger.debug(f"Added QuotesJournalEntry '{entry}' to session "
+                      f"'{self._orm_session}'")
+
+    def get_outcomes(self, universe: str) -> Dict[int, str]:
+        statement = (select(QuotesJournalEntry.contract_id,
+                            QuotesJournalEntry.outcome)
+                     .where(QuotesJournalEntry.universe == universe))
+        rows = self._orm_session.execute(statement).all()
+        outcomes = {contract_id: outcome for contract_id, outcome in rows}
+        _logger.debug(f"Read {len(outcomes)} journal entries for universe "
+                      f"'{universe}' from database with session "
+                      f"'{self._orm_session}'.")
+        return outcomes
+
+    def delete_universe(self, universe: str) -> None:
+        statement = (delete(QuotesJournalEntry)
+                     .where(QuotesJournalEntry.universe == universe))
+        self._orm_session.execute(statement)
+        _logger.debug(f"Deleted journal entries for universe '{universe}' "
+                      f"with session '{self._orm_session}'.")
+
+
+class QuotesDbManager():
+    """Stores quotes within the database or, if a 'quotes_store' is given,
+    within that store. A 'quotes_cache' is updated on every commit of the
+    session. With 'compact', the database table of CompactQuote is used
+    instead of the one of Quote."""
+
+    def __init__(self, orm_session: Session,
+                 quotes_store: Optional[ParquetQuotesStore] = None,
+                 quotes_cache: Optional[QuotesCache] = None,
+                 compact: bool = False) -> None:
+        self._orm_session = orm_session
+        self._model = CompactQuote if compact else Quote
+        self._quotes_store = quotes_store
+        self._quotes_cache = quotes_cache
+        self._uncommitted_quotes: List[Quote] = []
+        if quotes_cache is not None:
+            event.listen(orm_session, "after_commit", self._update_cache)
+            event.listen(orm_session, "after_rollback", self._discard_cache)
+
+    def upsert_to_db(
+            self, quotes: List[Quote],
+            stored_until: Optional[Dict[int, date]] = None) -> int:
+        """Insert quotes and overwrite existing quotes of the same dates.
+        Quotes, that equal the stored ones, are skipped.
+
+        :param quotes: Quotes to write
+        :type quotes: List[Quote]
+        :param stored_until: Latest stored quote date of contracts, for which
+            it is known, 'date.min' for contracts without quotes. Later
+            quotes of these contracts are written without reading the stored
+            ones.
+        :type stored_until: Optional[Dict[int, date]]
+        :return: Number of new or changed quotes, that were written
+        :rtype: int
+        """
+
+        if not quotes:
+            return 0
+        quotes = self._drop_unchanged_quotes(
+            quotes=quotes, stored_until=stored_until or {})
+        if not quotes:
+            return 0
+        if self._quotes_cache is not None:
+            self._uncommitted_quotes.extend(quotes)
+        if self._quotes_store is not None:
+            self._quotes_store.upsert(
+                quotes=quotes,
+                exchanges=self._get_exchanges(
+                    contract_ids={quote.contract_id for quote in quotes}))
+            return len(quotes)
+        dialect = self._orm_session.get_bind().dialect.name
+        if dialect == "postgresql":
+            self._upsert_with_copy(quotes=quotes)
+        elif dialect in _ON_CONFLICT_INSERTS:
+            self._upsert_on_conflict(quotes=quotes, dialect=dialect)
+        else:
+            self._upsert_with_orm(quotes=quotes)
+        return len(quotes)
+
+    def contract_has_quotes(self, contract: Contract) -> bool:
+        if self._quotes_store is not None:
+            return contract.id in self._quotes_store.get_latest_quote_dates(
+                contract_ids=[contract.id])
+        statement = (select(self._model.contract_id)
+                     .where(self._model.contract_id == contract.id)
+                     .limit(1))
+        result = self._orm_session.execute(statement).scalar()
+        return result is not None
+
+    def get_latest_quote_date(self, contract: Contract) -> date:
+        if self._quotes_store is not None:
+            return self._quotes_store.get_latest_quote_dates(
+                contract_ids=[contract.id]).get(contract.id)
+        statement = (select(func.max(self._model.date))
+                     .where(self._model.contract_id == contract.id))
+        date_ = self._orm_session.execute(statement).scalar()
+        return date_
+
+    def get_latest_quote_dates(self, universe: str) -> Dict[int, date]:
+        """Latest quote date for every member of a universe, that has quotes"""
+
+        if self._quotes_store is not None:
+            statement = (select(UniverseMembership.contract_id)
+                         .where(UniverseMembership.universe == universe))
+            contract_ids = self._orm_session.execute(statement).scalars().all()
+            return self._quotes_store.get_latest_quote_dates(
+                contract_ids=contract_ids)
+        model = self._model
+        statement = (select(model.contract_id, func.max(model.date))
+                     .join(UniverseMembership,
+                           UniverseMembership.contract_id == model.contract_id)
+                     .where(UniverseMembership.universe == universe)
+                     .group_by(model.contract_id))
+        rows = self._orm_session.execute(statement).all()
+        latest_dates = {contract_id: date_ for contract_id, date_ in rows}
+        _logger.debug(f"Read latest quote dates for {len(latest_dates)} "
+                      f"members of universe '{universe}' from database with "
+                      f"session '{self._orm_session}'.")
+        return latest_dates
+
+    def get_quotes(
+            self, contract_ids: Optional[Iterable[int]] = None,
+            universe: Optional[str] = None,
+            start: Optional[date] = None,
+            end: Optional[date] = None,
+            columns: Optional[List[str]] = None,
+            as_frame: bool = True
+    ) -> Union[pd.DataFrame, Dict[str, np.ndarray]]:
+        """Read quotes as columns, without creating ORM objects
+
+        :param contract_ids: Contracts to read, all if None
+        :type contract_ids: Optional[Iterable[int]]
+        :param universe: Only read members of this universe
+        :type universe: Optional[str]
+        :param start: First date to read
+        :type start: Optional[date]
+        :param end: Last date to read
+        :type end: Optional[date]
+        :param columns: Columns to read besides 'contract_id' and 'date', all
+            if None
+        :type columns: Optional[List[str]]
+        :param as_frame: Return a DataFrame instead of a dict of arrays
+        :type as_frame: bool
+        :return: Quotes sorted by contract and date, dates as datetime64[D]
+        :rtype: Union[pd.DataFrame, Dict[str, np.ndarray]]
+        """
+
+        if columns is None:
+            columns = list(_QUOTE_VALUE_COLUMNS)
+        unknown_columns = set(columns) - set(_QUOTE_VALUE_COLUMNS)
+        if unknown_columns:
+            raise ValueError(f"Unknown quote columns: {unknown_columns}")
+        if self._quotes_store is not None:
+            if universe is not None:
+                member_ids = set(UniverseDbManager(
+                    orm_session=self._orm_session).get_member_ids(
+                        name=universe))
+                contract_ids = (member_ids if contract_ids is None
+                                else member_ids.intersection(contract_ids))
+            table = self._quotes_store.read(
+                contract_ids=contract_ids, start=start, end=end,
+                columns=columns)
+            arrays = {name: table[name].to_numpy()
+                      for name in table.column_names}
+            arrays["date"] = arrays["date"].astype("datetime64[D]")
+        else:
+            arrays = self._read_quote_columns(
+                contract_ids=contract_ids, universe=universe, start=start,
+                end=end, columns=columns)
+        _logger.debug(f"Read {len(arrays['date'])} quotes from database "
+                      f"with session '{self._orm_session}'.")
+        if as_frame:
+            return pd.DataFrame(arrays)
+        return arrays
+
+    def get_quotes_array(self, contract_id: int) -> np.ndarray:
+        """All quotes of a contract as an array with QUOTES_DTYPE, sorted by
+        date. With a quotes cache, this is a read-only memory map and the
+        contract is cached on its first read."""
+
+        if self._quotes_cache is not None:
+            quotes = self._quotes_cache.read(contract_id=contract_id)
+            if quotes is not None:
+                return quotes
+        arrays = self.get_quotes(contract_ids=[contract_id], as_frame=False)
+        quotes = np.empty(len(arrays["date"]), dtype=QUOTES_DTYPE)
+        quotes["date"] = arrays["date"].astype(np.int32)
+        for column in _QUOTE_VALUE_COLUMNS:
+            quotes[column] = arrays[column]
+        if self._quotes_cache is not None:
+            self._quotes_cache.write(contract_id=contract_id, quotes=quotes)
+            return self._quotes_cache.read(contract_id=contract_id)
+        return quotes
+
+    def get_contract_ids(self) -> List[int]:
+        """All contracts, that have quotes within the database table"""
+
+        statement = (select(self._model.contract_id).distinct()
+                     .order_by(self._model.contract_id))
+        return self._orm_session.execute(statement).scalars().all()
+
+    def delete_quotes(self, contract_ids: Iterable[int]) -> None:
+        """Delete all quotes of the given contracts"""
+
+        contract_ids = list(contract_ids)
+        if self._quotes_cache is not None:
+            for contract_id in contract_ids:
+                self._quotes_cache.delete(contract_id=contract_id)
+        if self._quotes_store is not None:
+            self._quotes_store.delete(contract_ids=contract_ids)
+            return
+        table = self._model.__table__
+        for i in range(0, len(contract_ids), _MAX_IN_CLAUSE_IDS):
+            statement = (delete(table)
+                         .where(table.c.contract_id.in_(
+                             contract_ids[i:i + _MAX_IN_CLAUSE_IDS])))
+            self._orm_session.execute(statement)
+        _logger.debug(f"Deleted quotes of {len(contract_ids)} contracts with "
+                      f"session '{self._orm_session}'.")
+
+    # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
+
+    def _update_cache(self, session: Session) -> None:
+        quotes, self._uncommitted_quotes = self._uncommitted_quotes, []
+        if quotes:
+            self._quotes_cache.update(quotes=quotes)
+
+    def _discard_cache(self, session: Session) -> None:
+        self._uncommitted_quotes = []
+
+    def _read_quote_columns(
+            self, contract_ids: Optional[Iterable[int]],
+            universe: Optional[str], start: Optional[date],
+            end: Optional[date], columns: List[str]) -> Dict[str, np.ndarray]:
+        table = self._model.__table__
+        statement = select(
+            table.c.contract_id, table.c.date,
+            *[table.c[column] for column in columns])
+        if universe is not None:
+            # Join the Core table, so the statement stays a Core statement
+            memberships = UniverseMembership.__table__
+            statement = (statement
+                         .join(memberships,
+                               memberships.c.contract_id ==
+                               table.c.contract_id)
+                         .where(memberships.c.universe == universe))
+        if start is not None:
+            statement = statement.where(table.c.date >= start)
+        if end is not None:
+            statement = statement.where(table.c.date <= end)
+        statement = statement.order_by(table.c.contract_id, table.c.date)
+        if contract_ids is None:
+            statements = [statement]
+        else:
+            contract_ids = sorted(set(contract_ids))
+            statements = [
+                statement.where(table.c.contract_id.in_(
+                    contract_ids[i:i + _MAX_IN_CLAUSE_IDS]))
+                for i in range(0, len(contract_ids), _MAX_IN_CLAUSE_IDS)]
+        if self._model is CompactQuote:
+            # Raw rows hold the integers as stored
+            dtype = np.dtype([("contract_id", "i8"), ("date", "i8")] +
+                             [(column, "i8") for column in columns])
+        else:
+            dtype = np.dtype(
+                [("contract_id", "i8"), ("date", "M8[D]")] +
+                [(column, "f8") for column in columns])
+        chunks = [np.empty(0, dtype=dtype)]
+        for statement in statements:
+            # Fetch from the DBAPI cursor, skipping the creation of row
+            # objects. Numpy parses the raw dates of all DBMS. No
+            # 'stream_results', as it buffers rows ahead of the cursor.
+            result = self._orm_session.execute(statement)
+            try:
+                while True:
+                    rows = result.cursor.fetchmany(_QUOTES_READ_CHUNK_SIZE)
+                    if not rows:
+                        break
+                    chunks.append(np.array(rows, dtype=dtype))
+            finally:
+                result.close()
+        quotes = np.concatenate(chunks)
+        arrays = {name: quotes[name].copy() for name in dtype.names}
+        if self._model is CompactQuote:
+            arrays["date"] = arrays["date"].astype("M8[D]")
+            for column in columns:
+                arrays[column] = arrays[column].astype("f8")
+                if column != "volume":
+                    arrays[column] /= ScaledPrice.scale
+        return arrays
+
+    def _drop_unchanged_quotes(
+            self, quotes: List[Quote],
+            stored_until: Dict[int, date]) -> List[Quote]:
+        # Of several quotes for the same contract and date, the last wins
+        quotes = list({
+            (quote.contract_id, quote.date): quote for quote in quotes
+        }.values())
+        # Only quotes, that may be stored already, are compared
+        new_quotes = [
+            quote for quote in quotes
+            if quote.date > stored_until.get(quote.contract_id, date.max)]
+        quotes = [
+            quote for quote in quotes
+            if quote.date <= stored_until.get(quote.contract_id, date.max)]
+        if not quotes:
+            return new_quotes
+        stored = self.get_quotes(
+            contract_ids={quote.contract_id for quote in quotes},
+            start=min(quote.date for quote in quotes),
+            end=max(quote.date for quote in quotes),
+            as_frame=False)
+        if len(stored["date"]) == 0:
+            return new_quotes + quotes
+        stored_keys = _get_quote_keys(
+            contract_ids=stored["contract_id"], dates=stored["date"])
+        keys = _get_quote_keys(
+            contract_ids=np.array(
+                [quote.contract_id for quote in quotes], dtype=np.int64),
+            dates=np.array(
+                [quote.date for quote in quotes], dtype="datetime64[D]"))
+        positions = np.searchsorted(stored_keys, keys).clip(
+            max=len(stored_keys) - 1)
+        is_unchanged = stored_keys[positions] == keys
+        for column in _QUOTE_VALUE_COLUMNS:
+            values = np.array(
+                [getattr(quote, column) for quote in quotes], dtype=float)
+            is_unchanged &= np.isclose(
+                values, stored[column][positions],
+                rtol=_UNCHANGED_RELATIVE_TOLERANCE,
+                atol=(_UNCHANGED_VOLUME_TOLERANCE if column == "volume"
+                      else _UNCHANGED_PRICE_TOLERANCE),
+                equal_nan=True)
+        _logger.debug(f"Skipped {int(is_unchanged.sum())} unchanged quotes.")
+        return new_quotes + [
+            quote for quote, unchanged in zip(quotes, is_unchanged)
+            if not unchanged]
+
+    def _get_exchanges(self, contract_ids: set) -> Dict[int, str]:
+        statement = (select(Contract.id, Contract.exchange)
+                     .where(Contract.id.in_(contract_ids)))
+        return dict(self._orm_session.execute(statement).all())
+
+    def _upsert_on_conflict(self, quotes: List[Quote], dialect: str) -> None:
+        # Single executemany batch, bypassing the identity map
+        table = self._model.__table__
+        statement = _ON_CONFLICT_INSERTS[dialect](table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.contract_id, table.c.date],
+            set_={column: statement.excluded[column]
+                  for column in _QUOTE_VALUE_COLUMNS})
+        rows = [_quote_to_row(quote) for quote in quotes]
+        self._orm_session.execute(statement, rows)
+        _logger.debug(f"{len(rows)} quotes upserted within session "
+                      f"'{self._orm_session}'.")
+
+    def _upsert_with_copy(self, quotes: List[Quote]) -> None:
+        # Stream into a staging table and merge with one set-based statement
+        table = self._model.__table__
+        columns = ", ".join(_QUOTE_COLUMNS)
+        updates = ", ".join(
+            f"{column} = EXCLUDED.{column}" for column in _QUOTE_VALUE_COLUMNS)
+        dbapi_connection = self._orm_session.connection().connection
+        with dbapi_connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE IF NOT EXISTS {_QUOTES_STAGING_TABLE} "
+                f"(LIKE {table.name} INCLUDING DEFAULTS) "
+                f"ON COMMIT DELETE ROWS")
+            cursor.copy_expert(
+                f"COPY {_QUOTES_STAGING_TABLE} ({columns}) FROM STDIN "
+                f"WITH (FORMAT csv)",
+                _quotes_to_csv(quotes=quotes, table=table))
+            cursor.execute(
+                f"INSERT INTO {table.name} ({columns}) "
+                f"SELECT DISTINCT ON (contract_id, date) {columns} "
+                f"FROM {_QUOTES_STAGING_TABLE} "
+                f"ON CONFLICT (contract_id, date) DO UPDATE SET {updates}")
+            cursor.execute(f"TRUNCATE {_QUOTES_STAGING_TABLE}")
+        _logger.debug(f"{len(quotes)} quotes copied and merged within "
+                      f"session '{self._orm_session}'.")
+
+    def _upsert_with_orm(self, quotes: List[Quote]) -> None:
+        model = self._model
+        if model is not Quote:
+            quotes = [model(**_quote_to_row(quote)) for quote in quotes]
+        contract_ids = {quote.contract_id for quote in quotes}
+        dates = {quote.date for quote in quotes}
+        conflicted_keys = set(self._orm_session.execute(
+            select(model.contract_id, model.date)
+            .where(and_(model.contract_id.in_(contract_ids),
+                        model.date.in_(dates)))
             .execution_options(autoflush=False)
-        ).scalars().all()
-        # self._orm_session.add_all(conflicted_quotes)  # unnecessary?
+        ).all())
         self._orm_session.expunge_all()  # to prevent conflicts in identity map
         n_added = 0
         n_replaced = 0
         for quote in quotes:
-            if quote in conflicted_quotes:
+            if (quote.contract_id, quote.date) in conflicted_keys:
                 self._orm_session.merge(quote)
                 n_replaced += 1
             else:
@@ -150,19 +680,6 @@ class QuotesDbManager():
         _logger.debug(f"{n_added} quotes added and {n_replaced} replaced "
                       f"within session '{self._orm_session}'.")
 
-    def contract_has_quotes(self, contract: Contract) -> bool:
-        statement = (select(Quote.contract_id).where(
-            Quote.contract == contract))
-        result = self._orm_session.execute(statement).scalars().all()
-        return bool(len(result))
-
-    def get_latest_quote_date(self, contract: Contract) -> date:
-        statement = select(Quote.date).\
-            where(Quote.contract == contract).\
-            order_by(Quote.date.desc())
-        date_ = self._orm_session.execute(statement).scalars().first()
-        return date_
-
 
 class ContractDetailsIbDbManager():
     _orm_session: Session
@@ -184,3 +701,42 @@ class ContractDetailsTvDbManager():
         self._orm_session.merge(details)
         _logger.debug(f"Added ContractDetailsTv '{details}' to session "
                       f"'{self._orm_session}'")
+
+
+# ~~~~~~~~~~~~~~~~~~~~~ private functions ~~~~~~~~~~~~~~~~~~~~~
+
+
+def _get_quote_keys(contract_ids: np.ndarray,
+                    dates: np.ndarray) -> np.ndarray:
+    # Single integer per contract and date, ordered like both
+    days = dates.astype("datetime64[D]").astype(np.int64)
+    return (contract_ids.astype(np.int64) << 32) + (days + 2**31)
+
+
+def _quote_to_row(quote: Quote) -> Dict:
+    return {
+        "contract_id": quote.contract_id,
+        "date": quote.date,
+        "open": quote.open,
+        "high": quote.high,
+        "low": quote.low,
+        "close": quote.close,
+        "volume": quote.volume}
+
+
+def _quotes_to_csv(quotes: List[Quote], table: Table) -> io.StringIO:
+    # COPY bypasses the bind processing of the column types
+    processors = [
+        table.c[column].type.process_bind_param
+        if isinstance(table.c[column].type, TypeDecorator) else None
+        for column in _QUOTE_COLUMNS]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for quote in quotes:
+        values = (quote.contract_id, quote.date, quote.open, quote.high,
+                  quote.low, quote.close, quote.volume)
+        writer.writerow([
+            value if processor is None else processor(value, None)
+            for processor, value in zip(processors, values)])
+    buffer.seek(0)
+    return buffer
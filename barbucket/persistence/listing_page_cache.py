@@ -0,0 +1,134 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedPage():
+    """A downloaded listing page, together with its HTTP validators"""
+
+    html: str
+    etag: str = ""
+    last_modified: str = ""
+    fetched_at: float = 0
+
+
+class ListingPageCache():
+    """Keeps downloaded exchange listing pages on disk.
+
+    Page contents are stored once per distinct content, as gzipped files named
+    by their SHA-256 digest within 'objects/'. The index file
+    'pages/<exchange>/<page>.json' points from a page to its content and
+    keeps the time it was fetched at, as well as its 'ETag' and
+    'Last-Modified' headers. Pages are fresh for 'ttl' seconds after they
+    were fetched. Stale pages are kept, so they can be revalidated with the
+    website instead of being downloaded again.
+    """
+
+    def __init__(self, directory: Path, ttl: float,
+                 clock: Callable[[], float] = time.time) -> None:
+        self._directory = directory
+        self._ttl = ttl
+        self._clock = clock
+
+    def read(self, exchange: str, page: int) -> Optional[CachedPage]:
+        """Read a cached page
+
+        :param exchange: Exchange of the listing
+        :type exchange: str
+        :param page: Page of the listing, 0 for singlepage listings
+        :type page: int
+        :return: The page, None if it is not cached
+        :rtype: Optional[CachedPage]
+        """
+
+        try:
+            with open(self._get_index_path(exchange=exchange, page=page)) \
+                    as file:
+                entry = json.load(file)
+            with gzip.open(self._get_object_path(digest=entry["digest"]),
+                           "rt", encoding="utf-8") as file:
+                html = file.read()
+        except FileNotFoundError:
+            return None
+        return CachedPage(
+            html=html, etag=entry["etag"],
+            last_modified=entry["last_modified"],
+            fetched_at=entry["fetched_at"])
+
+    def write(self, exchange: str, page: int, cached_page: CachedPage) -> None:
+        """Store a page, that was just fetched or revalidated
+
+        :param exchange: Exchange of the listing
+        :type exchange: str
+        :param page: Page of the listing, 0 for singlepage listings
+        :type page: int
+        :param cached_page: Page to store, its fetch time is set to now
+        :type cached_page: CachedPage
+        """
+
+        content = cached_page.html.encode("utf-8")
+        digest = hashlib.sha256(content).hexdigest()
+        object_path = self._get_object_path(digest=digest)
+        if not object_path.is_file():
+            # mtime=0 keeps the files of identical contents identical
+            _write_atomically(path=object_path, content=gzip.compress(
+                content, mtime=0))
+        entry = {
+            "digest": digest,
+            "etag": cached_page.etag,
+            "last_modified": cached_page.last_modified,
+            "fetched_at": self._clock()}
+        _write_atomically(
+            path=self._get_index_path(exchange=exchange, page=page),
+            content=json.dumps(entry).encode("utf-8"))
+
+    def is_fresh(self, cached_page: CachedPage) -> bool:
+        """Check, if a page was fetched within the TTL"""
+
+        return self._clock() - cached_page.fetched_at < self._ttl
+
+    def prune(self) -> None:
+        """Delete all contents, that no page points to anymore"""
+
+        digests = set()
+        for index_path in self._directory.glob("pages/*/*.json"):
+            with open(index_path) as file:
+                digests.add(json.load(file)["digest"])
+        n_deleted = 0
+        for object_path in self._directory.glob("objects/*.html.gz"):
+            if object_path.name.split(".")[0] not in digests:
+                object_path.unlink(missing_ok=True)
+                n_deleted += 1
+        _logger.debug(f"Pruned {n_deleted} unused pages from "
+                      f"'{self._directory}'.")
+
+    # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
+
+    def _get_index_path(self, exchange: str, page: int) -> Path:
+        return self._directory / "pages" / exchange / f"{page}.json"
+
+    def _get_object_path(self, digest: str) -> Path:
+        return self._directory / "objects" / f"{digest}.html.gz"
+
+
+# ~~~~~~~~~~~~~~~~~~~~~ private functions ~~~~~~~~~~~~~~~~~~~~~
+
+
+def _write_atomically(path: Path, content: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Pages are written from several threads
+    temp_path = path.parent / f".{path.name}.{threading.get_ident()}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(content)
+    os.replace(temp_path, path)
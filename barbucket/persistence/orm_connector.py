@@ -29,6 +29,14 @@ class OrmConnector():
         """
         return self._session
 
+    def create_session(self) -> Session:
+        """Create an additional session, e.g. for use within another thread
+
+        :return: New session on the same engine
+        :rtype: Session
+        """
+        return Session(bind=self._engine, autoflush=False)
+
     # ~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~
 
     def _initialize(self) -> None:
@@ -0,0 +1,200 @@
+import logging
+import os
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = None
+
+from barbucket.domain_model.data_classes import Quote
+
+
+_logger = logging.getLogger(__name__)
+
+_FILENAME = "quotes.parquet"
+
+
+class ParquetQuotesStore():
+    """Stores quotes as a Parquet dataset, partitioned by exchange and
+    contract.
+
+    Every contract is kept in a single file at
+    '<directory>/exchange=<exchange>/contract_id=<id>/quotes.parquet', that
+    is rewritten on every upsert. Reads of given contracts only open their
+    files, so they don't get slower with the size of the store. Date filters
+    are pushed down to the row groups and only the requested columns are
+    loaded.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        if pa is None:
+            raise ImportError(
+                "Storing quotes as Parquet requires 'pyarrow', install it "
+                "with 'pip install barbucket[parquet]'.")
+        self._directory = directory
+        self._file_schema = pa.schema([
+            ("date", pa.date32()),
+            ("open", pa.float32()),
+            ("high", pa.float32()),
+            ("low", pa.float32()),
+            ("close", pa.float32()),
+            ("volume", pa.float64())])
+        self._partitioning = ds.partitioning(
+            pa.schema([("exchange", pa.string()),
+                       ("contract_id", pa.int64())]),
+            flavor="hive")
+
+    def upsert(self, quotes: List[Quote], exchanges: Dict[int, str]) -> None:
+        """Append quotes and replace existing quotes of the same dates
+
+        :param quotes: Quotes to store
+        :type quotes: List[Quote]
+        :param exchanges: Exchange of every contract within the quotes
+        :type exchanges: Dict[int, str]
+        """
+
+        quotes_by_contract: Dict[int, Dict[date, Quote]] = {}
+        for quote in quotes:
+            # Later quotes of the same date win
+            quotes_by_contract.setdefault(
+                quote.contract_id, {})[quote.date] = quote
+        for contract_id, contract_quotes in quotes_by_contract.items():
+            self._upsert_contract(
+                contract_id=contract_id, exchange=exchanges[contract_id],
+                quotes=list(contract_quotes.values()))
+        _logger.debug(f"{len(quotes)} quotes of {len(quotes_by_contract)} "
+                      f"contracts upserted to '{self._directory}'.")
+
+    def read(self, contract_ids: Optional[Iterable[int]] = None,
+             start: Optional[date] = None,
+             end: Optional[date] = None,
+             columns: Optional[List[str]] = None) -> "pa.Table":
+        """Read quotes, filtered by contracts and dates
+
+        :param contract_ids: Contracts to read, all if None
+        :type contract_ids: Optional[Iterable[int]]
+        :param start: First date to read
+        :type start: Optional[date]
+        :param end: Last date to read
+        :type end: Optional[date]
+        :param columns: Columns to read besides 'contract_id' and 'date', all
+            if None
+        :type columns: Optional[List[str]]
+        :return: Quotes sorted by contract and date
+        :rtype: pa.Table
+        """
+
+        if columns is None:
+            columns = [name for name in self._file_schema.names
+                       if name != "date"]
+        columns = ["contract_id", "date"] + columns
+        if contract_ids is not None:
+            contract_ids = list(contract_ids)
+        dataset = self._get_dataset(contract_ids=contract_ids)
+        if dataset is None:
+            return pa.table(
+                {"contract_id": pa.array([], pa.int64())} |
+                {name: pa.array([], self._file_schema.field(name).type)
+                 for name in columns[1:]})
+        table = dataset.to_table(
+            columns=columns,
+            filter=_create_filter(
+                contract_ids=contract_ids, start=start, end=end))
+        return table.sort_by([("contract_id", "ascending"),
+                              ("date", "ascending")])
+
+    def delete(self, contract_ids: Iterable[int]) -> None:
+        """Delete all quotes of the given contracts"""
+
+        for contract_id in contract_ids:
+            for path in self._directory.glob(
+                    f"*/contract_id={contract_id}/{_FILENAME}"):
+                path.unlink()
+        _logger.debug(f"Deleted quotes of contracts from '{self._directory}'.")
+
+    def get_latest_quote_dates(
+            self, contract_ids: Optional[Iterable[int]] = None
+    ) -> Dict[int, date]:
+        """Latest quote date for every contract, that has quotes"""
+
+        table = self.read(contract_ids=contract_ids, columns=[])
+        latest = table.group_by("contract_id").aggregate([("date", "max")])
+        return dict(zip(latest["contract_id"].to_pylist(),
+                        latest["date_max"].to_pylist()))
+
+    # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
+
+    def _upsert_contract(
+            self, contract_id: int, exchange: str,
+            quotes: List[Quote]) -> None:
+        path = (self._directory / f"exchange={exchange}"
+                / f"contract_id={contract_id}" / _FILENAME)
+        table = pa.table({
+            "date": [quote.date for quote in quotes],
+            "open": [quote.open for quote in quotes],
+            "high": [quote.high for quote in quotes],
+            "low": [quote.low for quote in quotes],
+            "close": [quote.close for quote in quotes],
+            "volume": [quote.volume for quote in quotes]},
+            schema=self._file_schema)
+        if path.is_file():
+            existing = pq.read_table(path, schema=self._file_schema)
+            # Replace the overlap
+            is_kept = pc.invert(pc.is_in(
+                existing["date"], value_set=table["date"]))
+            table = pa.concat_tables([existing.filter(is_kept), table])
+        table = table.sort_by("date")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Readers never see a partially written file
+        temp_path = path.parent / \
+            f".{_FILENAME}.{os.getpid()}.{threading.get_ident()}.tmp"
+        pq.write_table(table, temp_path)
+        os.replace(temp_path, path)
+
+    def _get_dataset(
+            self, contract_ids: Optional[List[int]]) -> Optional["ds.Dataset"]:
+        if contract_ids is None:
+            paths = list(self._directory.glob(f"*/*/{_FILENAME}"))
+        else:
+            # The exchange of a contract is not known here, but there are
+            # only a few exchange directories
+            paths = [path for contract_id in contract_ids
+                     for path in self._directory.glob(
+                         f"*/contract_id={contract_id}/{_FILENAME}")]
+        if not paths:
+            return None
+        return ds.dataset(
+            [str(path) for path in paths], format="parquet",
+            partitioning=self._partitioning,
+            partition_base_dir=str(self._directory),
+            exclude_invalid_files=False,
+            schema=pa.unify_schemas([
+                self._file_schema, self._partitioning.schema]))
+
+
+# ~~~~~~~~~~~~~~~~~~~~~ private functions ~~~~~~~~~~~~~~~~~~~~~
+
+
+def _create_filter(contract_ids: Optional[Iterable[int]],
+                   start: Optional[date],
+                   end: Optional[date]) -> Optional["ds.Expression"]:
+    conditions = []
+    if contract_ids is not None:
+        conditions.append(ds.field("contract_id").isin(list(contract_ids)))
+    if start is not None:
+        conditions.append(ds.field("date") >= start)
+    if end is not None:
+        conditions.append(ds.field("date") <= end)
+    if not conditions:
+        return None
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression = expression & condition
+    return expression
@@ -0,0 +1,117 @@
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from barbucket.domain_model.data_classes import Quote
+
+
+_logger = logging.getLogger(__name__)
+
+QUOTES_DTYPE = np.dtype([
+    ("date", "<i4"),  # days since 1970-01-01
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8")])
+
+
+class QuotesCache():
+    """Keeps the quotes of every contract as a binary file of fixed-size
+    records, that is opened as a read-only memory map.
+
+    Files are replaced atomically, so other processes can share the pages of
+    a file through the OS page cache, while it is updated. Open maps keep
+    the version of the file, that they were opened with.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self._directory = directory
+
+    def read(self, contract_id: int) -> Optional[np.ndarray]:
+        """Open the cached quotes of a contract
+
+        :param contract_id: Contract to read the quotes for
+        :type contract_id: int
+        :return: Quotes sorted by date, None if the contract is not cached
+        :rtype: Optional[np.ndarray]
+        """
+
+        path = self._get_path(contract_id=contract_id)
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return None
+        if size == 0:
+            # Empty files can not be mapped
+            return np.empty(0, dtype=QUOTES_DTYPE)
+        return np.memmap(path, dtype=QUOTES_DTYPE, mode="r",
+                         shape=(size // QUOTES_DTYPE.itemsize,))
+
+    def write(self, contract_id: int, quotes: np.ndarray) -> None:
+        """Replace the cached quotes of a contract
+
+        :param contract_id: Contract to write the quotes for
+        :type contract_id: int
+        :param quotes: Complete quotes of the contract with QUOTES_DTYPE
+        :type quotes: np.ndarray
+        """
+
+        path = self._get_path(contract_id=contract_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Unique per writer, as readers in other processes or threads may
+        # update the same contract
+        temp_path = path.parent / \
+            f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+        np.sort(quotes, order="date").astype(QUOTES_DTYPE).tofile(temp_path)
+        os.replace(temp_path, path)
+
+    def update(self, quotes: List[Quote]) -> None:
+        """Merge quotes into the cache, replacing quotes of the same dates.
+
+        Only contracts, that are already cached, are updated. All others are
+        incomplete and need to be written with their full history first.
+        """
+
+        quotes_by_contract: Dict[int, List[Quote]] = {}
+        for quote in quotes:
+            quotes_by_contract.setdefault(quote.contract_id, []).append(quote)
+        n_updated = 0
+        for contract_id, contract_quotes in quotes_by_contract.items():
+            existing = self.read(contract_id=contract_id)
+            if existing is None:
+                continue
+            new = quotes_to_array(quotes=contract_quotes)
+            is_kept = ~np.isin(existing["date"], new["date"])
+            # Later quotes of the same date win
+            _, last = np.unique(new["date"][::-1], return_index=True)
+            new = new[::-1][last]
+            self.write(contract_id=contract_id,
+                       quotes=np.concatenate([existing[is_kept], new]))
+            n_updated += 1
+        _logger.debug(f"Updated cached quotes for {n_updated} contracts "
+                      f"within '{self._directory}'.")
+
+    def delete(self, contract_id: int) -> None:
+        self._get_path(contract_id=contract_id).unlink(missing_ok=True)
+
+    # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
+
+    def _get_path(self, contract_id: int) -> Path:
+        return self._directory / f"{contract_id}.bin"
+
+
+def quotes_to_array(quotes: List[Quote]) -> np.ndarray:
+    """Convert quotes into an array with QUOTES_DTYPE"""
+
+    array = np.empty(len(quotes), dtype=QUOTES_DTYPE)
+    array["date"] = np.array(
+        [quote.date for quote in quotes],
+        dtype="datetime64[D]").astype(np.int32)
+    for column in ("open", "high", "low", "close", "volume"):
+        array[column] = [getattr(quote, column) for quote in quotes]
+    return array
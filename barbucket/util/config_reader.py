@@ -55,7 +55,8 @@ class ConfigReader():
 
     def _initalize(self) -> None:
         """Checks for the presence of a configuration file for the current 
-        user. If not present, creates a default configuration file
+        user. If not present, creates a default configuration file. Options
+        missing within the file are read from the default configuration file.
 
         :param destination_path: Path to the configuration file
         :type destination_path: Path
@@ -74,5 +75,9 @@ class ConfigReader():
                 copyfile(source_path, destination_path)
                 _logger.info(
                     f"Created config file {destination_path} from default file.")
+        # Options, that were added after the config file was created, keep
+        # their default values
+        self._parser.read_string(resources.files("barbucket.util")
+                                 .joinpath("default_config.cfg").read_text())
         self._parser.read(self._CONFIG_FILE_PATH)
         _logger.debug(f"Read config file.")
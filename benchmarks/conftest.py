@@ -0,0 +1,32 @@
+import resource
+import sys
+from typing import Generator
+
+import pytest
+
+from barbucket.api import tws_connection_pool
+
+
+@pytest.fixture
+def unpaced(monkeypatch) -> Generator:
+    # The fake TWS has no pacing limits, so measure the pipeline itself
+    monkeypatch.setattr(
+        tws_connection_pool, "_HISTORICAL_MAX_REQUESTS", sys.maxsize)
+    monkeypatch.setattr(
+        tws_connection_pool, "_HISTORICAL_IDENTICAL_REQUEST_GAP", 0)
+    monkeypatch.setattr(
+        tws_connection_pool, "_HISTORICAL_MAX_REQUESTS_PER_CONTRACT", 0)
+    monkeypatch.setattr(
+        tws_connection_pool, "_MESSAGES_MAX_REQUESTS", sys.maxsize)
+    yield
+
+
+@pytest.fixture
+def record_peak_rss(benchmark) -> Generator:
+    yield
+    # Peak of the whole process, run a single benchmark per process to
+    # compare it between versions
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != "darwin":
+        peak_rss *= 1024
+    benchmark.extra_info["peak_rss_mb"] = round(peak_rss / 2**20, 1)
@@ -0,0 +1,144 @@
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+from ib_insync.objects import BarData
+
+from barbucket.api.tws_connection_pool import TwsConnectionPool
+from barbucket.api.tws_connector import TwsConnector
+from barbucket.business_logic.quotes_processor import QuotesProcessor
+from barbucket.domain_model.data_classes import Base, Contract, Quote
+from barbucket.domain_model.types import ApiNotationTranslator
+from barbucket.persistence.data_managers import QuotesDbManager, UniverseDbManager
+from barbucket.persistence.orm_connector import OrmConnector
+from tests.business_logic.test_quotes_processor import MockConfigReader, MockConnectionStringAssembler, _create_quotes_processor
+from tests.fake_tws import FakeTws
+
+
+pytest.importorskip("pytest_benchmark")
+
+_BARS_PER_CONTRACT = 250
+
+
+def _create_bars(n_days: int, end: date) -> List[BarData]:
+    return [
+        BarData(date=end - timedelta(days=n), open=10.0 + n % 7,
+                high=11.0 + n % 7, low=9.0 + n % 7, close=10.5 + n % 7,
+                volume=1000.0 * (n % 13 + 1))
+        for n in range(n_days)]
+
+
+def _create_quotes(contract_id: int, bars: List[BarData]) -> List[Quote]:
+    return [
+        Quote(contract_id=contract_id, date=bar.date, open=bar.open,
+              high=bar.high, low=bar.low, close=bar.close, volume=bar.volume)
+        for bar in bars]
+
+
+def _create_orm_connector(filepath: Path, n_contracts: int) -> OrmConnector:
+    orm_connector = OrmConnector(
+        connstring_assembler=MockConnectionStringAssembler(filepath=filepath),
+        base_class=Base)
+    session = orm_connector.get_session()
+    contracts = [
+        Contract(contract_type="STOCK", exchange="NYSE",
+                 broker_symbol=f"SYM{n}", exchange_symbol=f"SYM{n}",
+                 currency="USD")
+        for n in range(n_contracts)]
+    session.add_all(contracts)
+    session.flush()
+    UniverseDbManager(orm_session=session).create_universe(
+        name="BENCHMARK", contracts=contracts)
+    session.commit()
+    session.close()
+    return orm_connector
+
+
+def test_download_bar_conversion(
+        benchmark, unpaced, record_peak_rss) -> None:
+    fake_tws = FakeTws()
+    fake_tws.add_bars(
+        symbol="SYM0", bars=_create_bars(n_days=1250, end=date.today()))
+    config_reader = MockConfigReader(concurrent_requests="5")
+    tws_connector = TwsConnector(
+        config_reader=config_reader,
+        api_notation_translator=ApiNotationTranslator(),
+        connection_pool=TwsConnectionPool(
+            config_reader=config_reader,
+            client_ids_option="quotes_client_ids",
+            ib_factory=fake_tws.create_client))
+    tws_connector.connect()
+    contract = Contract(
+        id=1, contract_type="STOCK", exchange="NYSE", broker_symbol="SYM0",
+        exchange_symbol="SYM0", currency="USD")
+    quotes = benchmark(
+        tws_connector.download_historical_quotes,
+        contract=contract, duration="5 Y")
+    tws_connector.disconnect()
+    # No stats with '--benchmark-disable'
+    if benchmark.stats is not None:
+        benchmark.extra_info["rows_per_second"] = round(
+            len(quotes) / benchmark.stats.stats.mean)
+
+
+@pytest.mark.parametrize("overlap", [False, True], ids=["initial", "overlap"])
+def test_upsert_to_db(
+        benchmark, record_peak_rss, tmp_path: Path, overlap: bool) -> None:
+    n_contracts = 20
+    bars = _create_bars(n_days=_BARS_PER_CONTRACT, end=date.today())
+    counter = iter(range(1_000_000))
+
+    def setup() -> Tuple[tuple, dict]:
+        orm_connector = _create_orm_connector(
+            filepath=tmp_path / f"{next(counter)}.sqlite",
+            n_contracts=n_contracts)
+        session = orm_connector.get_session()
+        quotes_db_manager = QuotesDbManager(orm_session=session)
+        if overlap:
+            # Store all but the latest 5 days, so most rows conflict
+            for contract_id in range(1, n_contracts + 1):
+                quotes_db_manager.upsert_to_db(quotes=_create_quotes(
+                    contract_id=contract_id, bars=bars[5:]))
+            session.commit()
+        return (quotes_db_manager, session), {}
+
+    def upsert(quotes_db_manager: QuotesDbManager, session) -> None:
+        for contract_id in range(1, n_contracts + 1):
+            quotes_db_manager.upsert_to_db(quotes=_create_quotes(
+                contract_id=contract_id, bars=bars))
+        session.commit()
+
+    benchmark.pedantic(upsert, setup=setup, rounds=5)
+    if benchmark.stats is not None:
+        benchmark.extra_info["rows_per_second"] = round(
+            n_contracts * len(bars) / benchmark.stats.stats.mean)
+
+
+@pytest.mark.parametrize("n_contracts", [100, 1_000, 10_000])
+def test_quotes_processor(
+        benchmark, unpaced, record_peak_rss, tmp_path: Path,
+        n_contracts: int) -> None:
+    fake_tws = FakeTws()
+    # All contracts share the same bars, to keep the fake small
+    bars = _create_bars(n_days=_BARS_PER_CONTRACT, end=date.today())
+    for n in range(n_contracts):
+        fake_tws.add_bars(symbol=f"SYM{n}", bars=bars)
+    counter = iter(range(1_000_000))
+
+    def setup() -> Tuple[tuple, dict]:
+        orm_connector = _create_orm_connector(
+            filepath=tmp_path / f"{next(counter)}.sqlite",
+            n_contracts=n_contracts)
+        quotes_processor = _create_quotes_processor(
+            orm_connector=orm_connector, fake_tws=fake_tws,
+            config_reader=MockConfigReader(concurrent_requests="5"))
+        return (quotes_processor,), {}
+
+    def download(quotes_processor: QuotesProcessor) -> None:
+        quotes_processor.download_historical_quotes(universe="BENCHMARK")
+
+    benchmark.pedantic(download, setup=setup, rounds=1)
+    if benchmark.stats is not None:
+        benchmark.extra_info["rows_per_second"] = round(
+            n_contracts * len(bars) / benchmark.stats.stats.mean)
@@ -0,0 +1,77 @@
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Generator
+
+import pytest
+from sqlalchemy import select
+
+from barbucket.domain_model.data_classes import Quote
+from barbucket.persistence.data_managers import QuotesDbManager
+from barbucket.persistence.quotes_cache import QuotesCache
+from benchmarks.test_quotes_ingest import _create_orm_connector
+
+
+pytest.importorskip("pytest_benchmark")
+
+_N_CONTRACTS = 1_000
+_BARS_PER_CONTRACT = 1_000
+
+
+@pytest.fixture(scope="module")
+def orm_connector(tmp_path_factory) -> Generator:
+    orm_connector = _create_orm_connector(
+        filepath=tmp_path_factory.mktemp("read") / "quotes.sqlite",
+        n_contracts=_N_CONTRACTS)
+    session = orm_connector.create_session()
+    quotes_db_manager = QuotesDbManager(orm_session=session)
+    end = date(2022, 1, 1)
+    for contract_id in range(1, _N_CONTRACTS + 1):
+        quotes_db_manager.upsert_to_db(quotes=[
+            Quote(contract_id=contract_id, date=end - timedelta(days=n),
+                  open=1.0, high=1.0, low=1.0, close=1.0, volume=1.0)
+            for n in range(_BARS_PER_CONTRACT)])
+    session.commit()
+    session.close()
+    yield orm_connector
+
+
+def test_get_quotes(benchmark, orm_connector, record_peak_rss) -> None:
+    session = orm_connector.create_session()
+    quotes_db_manager = QuotesDbManager(orm_session=session)
+    quotes = benchmark.pedantic(
+        quotes_db_manager.get_quotes, kwargs={"columns": ["close"]},
+        rounds=3)
+    session.close()
+    assert len(quotes) == _N_CONTRACTS * _BARS_PER_CONTRACT
+    # No stats with '--benchmark-disable'
+    if benchmark.stats is not None:
+        benchmark.extra_info["rows_per_second"] = round(
+            len(quotes) / benchmark.stats.stats.mean)
+
+
+def test_get_quotes_with_orm(
+        benchmark, orm_connector, record_peak_rss) -> None:
+    # Baseline, loading ORM objects
+    session = orm_connector.create_session()
+
+    def read():
+        quotes = session.execute(select(Quote)).scalars().all()
+        session.expunge_all()
+        return quotes
+
+    quotes = benchmark.pedantic(read, rounds=1)
+    session.close()
+    if benchmark.stats is not None:
+        benchmark.extra_info["rows_per_second"] = round(
+            len(quotes) / benchmark.stats.stats.mean)
+
+
+def test_get_cached_quotes_array(
+        benchmark, orm_connector, tmp_path: Path) -> None:
+    session = orm_connector.create_session()
+    quotes_db_manager = QuotesDbManager(
+        orm_session=session, quotes_cache=QuotesCache(directory=tmp_path))
+    quotes_db_manager.get_quotes_array(contract_id=1)
+    quotes = benchmark(quotes_db_manager.get_quotes_array, contract_id=1)
+    session.close()
+    assert len(quotes) == _BARS_PER_CONTRACT
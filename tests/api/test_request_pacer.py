@@ -0,0 +1,100 @@
+from logging import getLogger
+from typing import Generator
+
+import pytest
+
+from barbucket.api import tws_connection_pool
+from barbucket.api.request_pacer import RequestPacer
+
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing RequestPacer")
+
+
+class MockClock():
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def mock_clock() -> Generator:
+    _logger.debug(f"---------- Fixture: mock_clock")
+    yield MockClock()
+
+
+@pytest.fixture
+def pacer(mock_clock: MockClock) -> Generator:
+    _logger.debug(f"---------- Fixture: pacer")
+    yield RequestPacer(
+        max_requests=3,
+        period=10,
+        identical_request_gap=4,
+        max_requests_per_contract=2,
+        contract_period=1,
+        clock=mock_clock)
+
+
+def test_reserve_within_budget(pacer: RequestPacer) -> None:
+    _logger.debug(f"---------- Test: test_reserve_within_budget")
+    assert pacer.reserve(request_key="r1", contract_key="c1") == 0
+    assert pacer.reserve(request_key="r2", contract_key="c2") == 0
+    assert pacer.get_remaining_budget() == 1
+
+
+def test_reserve_bucket_exhausted(
+        pacer: RequestPacer, mock_clock: MockClock) -> None:
+    _logger.debug(f"---------- Test: test_reserve_bucket_exhausted")
+    for n in range(3):
+        pacer.reserve(request_key=f"r{n}", contract_key=f"c{n}")
+    assert pacer.get_remaining_budget() == 0
+    mock_clock.now += 2
+    # first token is returned exactly one period after it was spent
+    assert pacer.reserve(request_key="r3", contract_key="c3") == 8
+
+
+def test_reserve_sliding_window_never_exceeded(mock_clock: MockClock) -> None:
+    _logger.debug(
+        f"---------- Test: test_reserve_sliding_window_never_exceeded")
+    pacer = RequestPacer(max_requests=60, period=600, clock=mock_clock)
+    slots = []
+    for n in range(500):
+        slots.append(mock_clock.now + pacer.reserve(
+            request_key=n, contract_key=n))
+        mock_clock.now += 1.7
+    for slot in slots:
+        in_window = [s for s in slots if slot <= s < slot + 600]
+        assert len(in_window) <= 60
+
+
+def test_reserve_identical_request(pacer: RequestPacer) -> None:
+    _logger.debug(f"---------- Test: test_reserve_identical_request")
+    assert pacer.reserve(request_key="r1", contract_key="c1") == 0
+    assert pacer.reserve(request_key="r1", contract_key="c2") == 4
+
+
+def test_reserve_same_contract(pacer: RequestPacer) -> None:
+    _logger.debug(f"---------- Test: test_reserve_same_contract")
+    assert pacer.reserve(request_key="r1", contract_key="c1") == 0
+    assert pacer.reserve(request_key="r2", contract_key="c1") == 0
+    assert pacer.reserve(request_key="r3", contract_key="c1") == 1
+
+
+def test_reserve_same_contract_with_ib_limit(mock_clock: MockClock) -> None:
+    _logger.debug(
+        f"---------- Test: test_reserve_same_contract_with_ib_limit")
+    pacer = RequestPacer(
+        max_requests=tws_connection_pool._HISTORICAL_MAX_REQUESTS,
+        period=tws_connection_pool._HISTORICAL_PERIOD,
+        max_requests_per_contract=(
+            tws_connection_pool._HISTORICAL_MAX_REQUESTS_PER_CONTRACT),
+        contract_period=tws_connection_pool._HISTORICAL_CONTRACT_PERIOD,
+        clock=mock_clock)
+    for n in range(5):
+        assert pacer.reserve(request_key=f"r{n}", contract_key="c1") == 0
+        mock_clock.now += 0.1
+    # The 6th request within 2 seconds waits for the 1st one to expire
+    assert pacer.reserve(request_key="r5", contract_key="c1") == \
+        pytest.approx(1.5)
@@ -0,0 +1,117 @@
+from logging import getLogger
+from pathlib import Path
+from shutil import copyfile
+from typing import Dict, Generator, List
+
+import pytest
+from ib_insync.ib import IB
+
+from barbucket.api.tws_connection_pool import TwsConnectionPool
+from barbucket.util.config_reader import ConfigReader
+
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing TwsConnectionPool")
+
+
+class MockConfigReader(ConfigReader):
+    # override
+    def __init__(self, values: Dict[str, str]) -> None:
+        self._values = values
+
+    # override
+    def get_config_value_single(self, section: str, option: str) -> str:
+        return self._values[option]
+
+    # override
+    def get_config_value_list(self, section: str, option: str) -> List[str]:
+        return self._values[option].split(",")
+
+
+@pytest.fixture
+def mock_connect(monkeypatch) -> Generator:
+    _logger.debug(f"---------- Fixture: mock_connect")
+    connected = []
+
+    def connect(ib, host, port, clientId, readonly):
+        if port == 0:
+            raise ConnectionRefusedError()
+        connected.append((host, port, clientId))
+
+    monkeypatch.setattr(IB, "connect", connect)
+    monkeypatch.setattr(IB, "disconnect", lambda ib: None)
+    yield connected
+
+
+def test_connect_single_client(mock_connect: List) -> None:
+    _logger.debug(f"---------- Test: test_connect_single_client")
+    config_reader = MockConfigReader(values={
+        "host": "127.0.0.1", "port": "7497", "additional_gateways": "",
+        "quotes_client_ids": "1"})
+    pool = TwsConnectionPool(
+        config_reader=config_reader, client_ids_option="quotes_client_ids")
+    pool.connect()
+    assert mock_connect == [("127.0.0.1", 7497, 1)]
+    assert pool.get_size() == 1
+    assert pool.get_connection() is pool.get_connection()
+
+
+def test_connect_with_baseline_config(
+        mock_connect: List, tmp_path: Path) -> None:
+    # Config files from before the connection pool connect a single client
+    _logger.debug(f"---------- Test: test_connect_with_baseline_config")
+    filepath = tmp_path / "config.cfg"
+    copyfile("tests/_resources/config/config_baseline.cfg", filepath)
+    pool = TwsConnectionPool(
+        config_reader=ConfigReader(filepath=filepath),
+        client_ids_option="quotes_client_ids")
+    pool.connect()
+    assert mock_connect == [("127.0.0.1", 7497, 1)]
+
+
+def test_connect_interleaves_gateways(mock_connect: List) -> None:
+    _logger.debug(f"---------- Test: test_connect_interleaves_gateways")
+    config_reader = MockConfigReader(values={
+        "host": "127.0.0.1", "port": "7497",
+        "additional_gateways": " 192.168.0.100:4001",
+        "quotes_client_ids": "1, 2"})
+    pool = TwsConnectionPool(
+        config_reader=config_reader, client_ids_option="quotes_client_ids")
+    pool.connect()
+    assert mock_connect == [
+        ("127.0.0.1", 7497, 1), ("192.168.0.100", 4001, 1),
+        ("127.0.0.1", 7497, 2), ("192.168.0.100", 4001, 2)]
+    turns = [pool.get_connection() for _ in range(5)]
+    assert [(c.port, c.client_id) for c in turns] == [
+        (7497, 1), (4001, 1), (7497, 2), (4001, 2), (7497, 1)]
+
+
+def test_connections_share_gateway_pacer(mock_connect: List) -> None:
+    _logger.debug(f"---------- Test: test_connections_share_gateway_pacer")
+    config_reader = MockConfigReader(values={
+        "host": "127.0.0.1", "port": "7497",
+        "additional_gateways": "192.168.0.100:4001",
+        "quotes_client_ids": "1,2"})
+    pool = TwsConnectionPool(
+        config_reader=config_reader, client_ids_option="quotes_client_ids")
+    pool.connect()
+    connections = pool.get_connections()
+    assert connections[0].historical_pacer is connections[2].historical_pacer
+    assert connections[0].historical_pacer is not \
+        connections[1].historical_pacer
+    assert connections[0].messages_pacer is not connections[2].messages_pacer
+
+
+def test_connect_failure(mock_connect: List) -> None:
+    _logger.debug(f"---------- Test: test_connect_failure")
+    config_reader = MockConfigReader(values={
+        "host": "127.0.0.1", "port": "7497",
+        "additional_gateways": "127.0.0.1:0",
+        "details_client_ids": "2"})
+    pool = TwsConnectionPool(
+        config_reader=config_reader, client_ids_option="details_client_ids")
+    with pytest.raises(ConnectionRefusedError):
+        pool.connect()
+    assert pool.get_size() == 0
+    with pytest.raises(ConnectionError):
+        pool.get_connection()
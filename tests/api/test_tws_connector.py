@@ -0,0 +1,216 @@
+from datetime import date, timedelta
+from logging import getLogger
+from pathlib import Path
+from typing import Generator, List
+
+import pytest
+from ib_insync import util
+from ib_insync.ib import IB
+from ib_insync.objects import BarData
+from ib_insync.wrapper import RequestError
+
+from barbucket.api.request_pacer import RequestPacer
+from barbucket.api.tws_connection_pool import TwsConnection, TwsConnectionPool
+from barbucket.api.tws_connector import TwsConnector
+from barbucket.domain_model.data_classes import Contract
+from barbucket.domain_model.types import ApiNotationTranslator
+from barbucket.util.config_reader import ConfigReader
+from barbucket.util.custom_exceptions import InvalidDataReceivedError
+from tests.fake_tws import FakeTws
+
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing TwsConnector")
+
+
+class MockConfigReader(ConfigReader):
+    # override
+    def __init__(self) -> None:
+        self._values = {
+            "host": "127.0.0.1", "port": "7497", "additional_gateways": "",
+            "quotes_client_ids": "1,2"}
+
+    # override
+    def get_config_value_single(self, section: str, option: str) -> str:
+        return self._values[option]
+
+    # override
+    def get_config_value_list(self, section: str, option: str) -> List[str]:
+        return self._values[option].split(",")
+
+
+class MockConnectionPool(TwsConnectionPool):
+    # override
+    def __init__(self) -> None:
+        self.connection = TwsConnection(
+            host="127.0.0.1", port=7497, client_id=1,
+            historical_pacer=RequestPacer(max_requests=60, period=600),
+            ib=IB())
+
+    # override
+    def get_connection(self) -> TwsConnection:
+        return self.connection
+
+
+@pytest.fixture
+def connection_pool() -> Generator:
+    _logger.debug(f"---------- Fixture: connection_pool")
+    yield MockConnectionPool()
+
+
+@pytest.fixture
+def tws_connector(connection_pool: MockConnectionPool) -> Generator:
+    _logger.debug(f"---------- Fixture: tws_connector")
+    yield TwsConnector(
+        config_reader=MockConfigReader(),
+        api_notation_translator=ApiNotationTranslator(),
+        connection_pool=connection_pool)
+
+
+def test_plan_initial_download(tws_connector: TwsConnector) -> None:
+    _logger.debug(f"---------- Test: test_plan_initial_download")
+    duration = tws_connector.plan_historical_request(
+        start_date=None, initial_duration="5 Y")
+    assert duration == "5 Y"
+
+
+def test_plan_short_gap(tws_connector: TwsConnector) -> None:
+    _logger.debug(f"---------- Test: test_plan_short_gap")
+    start_date = date.today() - timedelta(days=9)
+    duration = tws_connector.plan_historical_request(
+        start_date=start_date, initial_duration="5 Y")
+    assert duration == "10 D"
+
+
+def test_plan_start_today(tws_connector: TwsConnector) -> None:
+    _logger.debug(f"---------- Test: test_plan_start_today")
+    duration = tws_connector.plan_historical_request(
+        start_date=date.today(), initial_duration="5 Y")
+    assert duration == "1 D"
+
+
+def test_plan_long_gap(tws_connector: TwsConnector) -> None:
+    _logger.debug(f"---------- Test: test_plan_long_gap")
+    today = date.today()
+    assert tws_connector.plan_historical_request(
+        start_date=today - timedelta(days=364),
+        initial_duration="5 Y") == "365 D"
+    assert tws_connector.plan_historical_request(
+        start_date=today - timedelta(days=365),
+        initial_duration="5 Y") == "2 Y"
+    assert tws_connector.plan_historical_request(
+        start_date=today - timedelta(days=799),
+        initial_duration="5 Y") == "3 Y"
+
+
+def _create_bars(start: date, n_days: int, close: float) -> List[BarData]:
+    return [
+        BarData(date=start + timedelta(days=i), open=1.0, high=1.0, low=1.0,
+                close=close, volume=100.0)
+        for i in range(n_days)]
+
+
+def test_download_trims_to_start_date(
+        tws_connector: TwsConnector, connection_pool: MockConnectionPool,
+        monkeypatch) -> None:
+    _logger.debug(f"---------- Test: test_download_trims_to_start_date")
+    requests = []
+
+    async def mock_request(contract, endDateTime, durationStr, **kwargs):
+        requests.append((durationStr, endDateTime))
+        return _create_bars(start=date(2020, 1, 1), n_days=800, close=1.0)
+
+    monkeypatch.setattr(
+        connection_pool.connection.ib, "reqHistoricalDataAsync", mock_request)
+    contract = Contract(
+        id=1, contract_type="STOCK", exchange_symbol="AAA",
+        broker_symbol="AAA", name="A Inc.", currency="USD", exchange="NYSE")
+    quotes = util.run(tws_connector._download_historical_quotes_async(
+        contract=contract, duration="3 Y", start_date=date(2021, 6, 1)))
+    # Adjusted quotes can only be requested until now
+    assert requests == [("3 Y", '')]
+    assert quotes[0].date == date(2021, 6, 1)
+    assert quotes[-1].date == date(2022, 3, 10)
+
+
+def _create_contract(id: int, symbol: str) -> Contract:
+    return Contract(
+        id=id, contract_type="STOCK", exchange_symbol=symbol,
+        broker_symbol=symbol, name=symbol, currency="USD", exchange="NYSE")
+
+
+def _create_fake_connector(fake_tws: FakeTws) -> TwsConnector:
+    connection_pool = TwsConnectionPool(
+        config_reader=MockConfigReader(), client_ids_option="quotes_client_ids",
+        ib_factory=fake_tws.create_client)
+    tws_connector = TwsConnector(
+        config_reader=MockConfigReader(),
+        api_notation_translator=ApiNotationTranslator(),
+        connection_pool=connection_pool)
+    tws_connector.connect()
+    return tws_connector
+
+
+def test_download_concurrently_from_fake_tws() -> None:
+    _logger.debug(f"---------- Test: test_download_concurrently_from_fake_tws")
+    fake_tws = FakeTws(latency=0.01)
+    for symbol in ["AAA", "BBB", "CCC", "DDD"]:
+        fake_tws.generate_bars(symbol=symbol, n_days=500)
+    tws_connector = _create_fake_connector(fake_tws=fake_tws)
+    contracts = [_create_contract(id=n, symbol=symbol)
+                 for n, symbol in enumerate(["AAA", "BBB", "CCC", "DDD"])]
+    start_date = date.today() - timedelta(days=400)
+    results = list(tws_connector.download_historical_quotes_concurrently(
+        requests=[(contract, start_date) for contract in contracts],
+        initial_duration="1 Y", max_in_flight=3))
+    tws_connector.disconnect()
+    assert [contract.id for contract, _ in results] == [0, 1, 2, 3]
+    for _, quotes in results:
+        assert quotes[0].date >= start_date
+        assert len(quotes) == len({quote.date for quote in quotes})
+    # One request per contract, even for gaps of more than a year
+    assert fake_tws.n_requests == 4
+    assert fake_tws.max_in_flight == 3
+
+
+def test_download_with_pacing_violations() -> None:
+    _logger.debug(f"---------- Test: test_download_with_pacing_violations")
+    fake_tws = FakeTws(pacing_violation_rate=1)
+    fake_tws.generate_bars(symbol="AAA", n_days=10)
+    tws_connector = _create_fake_connector(fake_tws=fake_tws)
+    results = list(tws_connector.download_historical_quotes_concurrently(
+        requests=[(_create_contract(id=1, symbol="AAA"), None)],
+        initial_duration="1 Y", max_in_flight=1))
+    assert isinstance(results[0][1], RequestError)
+    assert results[0][1].code == 162
+    assert fake_tws.n_pacing_violations == 1
+
+
+def test_download_with_disconnect() -> None:
+    _logger.debug(f"---------- Test: test_download_with_disconnect")
+    fake_tws = FakeTws(latency=0.01, disconnect_after=2)
+    for symbol in ["AAA", "BBB", "CCC"]:
+        fake_tws.generate_bars(symbol=symbol, n_days=10)
+    tws_connector = _create_fake_connector(fake_tws=fake_tws)
+    contracts = [_create_contract(id=n, symbol=symbol)
+                 for n, symbol in enumerate(["AAA", "BBB", "CCC"])]
+    results = tws_connector.download_historical_quotes_concurrently(
+        requests=[(contract, None) for contract in contracts],
+        initial_duration="1 Y", max_in_flight=3)
+    with pytest.raises(ConnectionError):
+        list(results)
+
+
+def test_download_recorded_details() -> None:
+    _logger.debug(f"---------- Test: test_download_recorded_details")
+    fake_tws = FakeTws()
+    fake_tws.load(
+        path=Path("tests/_resources/fake_tws/recording.json"))
+    tws_connector = _create_fake_connector(fake_tws=fake_tws)
+    contracts = [_create_contract(id=1, symbol="AAA"),
+                 _create_contract(id=2, symbol="BBB")]
+    results = list(tws_connector.download_contract_details_concurrently(
+        contracts=contracts))
+    assert results[0][1].industry == "Technology"
+    assert results[0][1].stock_type == "COMMON_STOCK"
+    assert isinstance(results[1][1], InvalidDataReceivedError)
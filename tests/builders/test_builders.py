@@ -0,0 +1,73 @@
+from configparser import ConfigParser
+from importlib import resources
+from logging import getLogger
+from pathlib import Path
+from shutil import copyfile
+from typing import Callable, Generator
+
+import pytest
+
+from barbucket.builders.contract_details_ib_processor_builder import build_contract_details_ib_processor
+from barbucket.builders.contract_details_tv_processor_builder import build_contract_details_tv_processor
+from barbucket.builders.contracts_sync_processor_builder import build_contracts_sync_processor
+from barbucket.builders.quotes_panel_reader_builder import build_quotes_panel_reader
+from barbucket.builders.quotes_processor_builder import build_quotes_processor, build_quotes_store
+from barbucket.builders.quotes_quality_checker_builder import build_quotes_quality_checker
+from barbucket.builders.quotes_schema_migrator_builder import build_quotes_schema_migrator
+from barbucket.builders.universe_processor_builder import build_universe_processor
+from barbucket.util.config_reader import ConfigReader
+
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing builders")
+
+
+@pytest.fixture
+def baseline_home(tmp_path: Path, monkeypatch) -> Generator:
+    """Home directory with a config file, as created by versions without
+    the latest options"""
+    _logger.debug(f"---------- Fixture: baseline_home")
+    Path.mkdir(tmp_path / ".barbucket", parents=True)
+    copyfile("tests/_resources/config/config_baseline.cfg",
+             tmp_path / ".barbucket/config.cfg")
+    monkeypatch.setenv("HOME", str(tmp_path))
+    yield tmp_path
+
+
+@pytest.mark.parametrize("build", [
+    build_contract_details_ib_processor,
+    build_contract_details_tv_processor,
+    build_contracts_sync_processor,
+    build_quotes_panel_reader,
+    build_quotes_processor,
+    build_quotes_quality_checker,
+    build_quotes_schema_migrator,
+    build_universe_processor])
+def test_build_with_baseline_config(
+        baseline_home: Path, build: Callable) -> None:
+    _logger.debug(f"---------- Test: test_build_with_baseline_config")
+    assert build() is not None
+
+
+def test_quotes_stored_in_database_with_baseline_config(
+        baseline_home: Path) -> None:
+    _logger.debug(f"---------- Test: "
+                  f"test_quotes_stored_in_database_with_baseline_config")
+    config_reader = ConfigReader(
+        filepath=baseline_home / ".barbucket/config.cfg")
+    assert build_quotes_store(config_reader=config_reader) is None
+
+
+def test_all_options_with_baseline_config(baseline_home: Path) -> None:
+    # Options, that are read lazily, e.g. within the quotes processor
+    _logger.debug(f"---------- Test: test_all_options_with_baseline_config")
+    config_reader = ConfigReader(
+        filepath=baseline_home / ".barbucket/config.cfg")
+    defaults = ConfigParser(allow_no_value=True)
+    defaults.read_string(resources.files("barbucket.util")
+                         .joinpath("default_config.cfg").read_text())
+    for section in defaults.sections():
+        for option in defaults.options(section):
+            assert config_reader.get_config_value_single(
+                section=section, option=option) == \
+                defaults.get(section, option)
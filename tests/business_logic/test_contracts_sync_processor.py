@@ -0,0 +1,110 @@
+from typing import Generator, Iterator, List
+from logging import getLogger
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from barbucket.business_logic.contracts_sync_processor import ContractSyncProcessor
+from barbucket.datasource_connectors.ib_exchange_listing_reader import IbExchangeListingReader
+from barbucket.domain_model.data_classes import Base, Contract
+from barbucket.domain_model.listing_contract import ListingContract
+from barbucket.domain_model.types import Exchange
+from barbucket.persistence.data_managers import ContractsDbManager
+from barbucket.util.custom_exceptions import ExitSignalDetectedError
+
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing ContractSyncProcessor")
+
+
+def _create_listing_contract(symbol: str) -> ListingContract:
+    return ListingContract(
+        contract_type="STOCK", exchange="XETRA", broker_symbol=symbol,
+        currency="EUR", exchange_symbol=symbol, name=f"{symbol} AG")
+
+
+class MockListingReader(IbExchangeListingReader):
+    # override
+    def __init__(self, pages: List[List[str]],
+                 exit_after: int = None) -> None:
+        self.pages = pages
+        self.exit_after = exit_after
+
+    # override
+    def read_ib_exchange_listing_pages(
+            self, exchange: Exchange) -> Iterator[List[ListingContract]]:
+        for n, page in enumerate(self.pages):
+            if n == self.exit_after:
+                raise ExitSignalDetectedError("User pressed 'Ctrl+C'.")
+            yield [_create_listing_contract(symbol=symbol)
+                   for symbol in page]
+
+
+@pytest.fixture
+def orm_session() -> Generator:
+    _logger.debug(f"---------- Fixture: orm_session")
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    session = Session(engine, autoflush=False)
+    for symbol in ["SYM_0", "SYM_1", "SYM_2", "SYM_3"]:
+        session.add(Contract(
+            contract_type="STOCK", exchange="XETRA", broker_symbol=symbol,
+            exchange_symbol=symbol, currency="EUR", name=f"{symbol} AG"))
+    session.add(Contract(
+        contract_type="STOCK", exchange="NYSE", broker_symbol="SYM_0",
+        exchange_symbol="SYM_0", currency="USD", name="SYM_0 Inc."))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _sync(orm_session: Session, reader: MockListingReader) -> None:
+    processor = ContractSyncProcessor(
+        listing_reader=reader,
+        contracts_db_manager=ContractsDbManager(orm_session=orm_session),
+        orm_session=orm_session)
+    processor.override_user_acknowledge = True
+    processor.sync_contracts_to_listing(exchange=Exchange.XETRA)
+
+
+def _get_symbols(orm_session: Session, exchange: str) -> List[str]:
+    return sorted(orm_session.execute(
+        select(Contract.broker_symbol)
+        .where(Contract.exchange == exchange)).scalars().all())
+
+
+def test_sync_pages_incrementally(orm_session: Session) -> None:
+    _logger.debug(f"---------- Test: test_sync_pages_incrementally")
+    reader = MockListingReader(pages=[
+        ["SYM_1", "SYM_2", "NEW_A"],
+        ["SYM_2", "NEW_A", "SYM_3", "NEW_B"]])
+    _sync(orm_session=orm_session, reader=reader)
+    assert _get_symbols(orm_session=orm_session, exchange="XETRA") == \
+        ["NEW_A", "NEW_B", "SYM_1", "SYM_2", "SYM_3"]
+    assert _get_symbols(orm_session=orm_session, exchange="NYSE") == \
+        ["SYM_0"]
+    new_contract = orm_session.execute(select(Contract).where(
+        Contract.broker_symbol == "NEW_A")).scalar_one()
+    assert new_contract.name == "NEW_A AG"
+
+
+def test_sync_stops_on_exit_signal(orm_session: Session) -> None:
+    _logger.debug(f"---------- Test: test_sync_stops_on_exit_signal")
+    reader = MockListingReader(pages=[["SYM_1", "NEW_A"], ["SYM_2"]],
+                               exit_after=1)
+    _sync(orm_session=orm_session, reader=reader)
+    assert _get_symbols(orm_session=orm_session, exchange="XETRA") == \
+        ["SYM_0", "SYM_1", "SYM_2", "SYM_3"]
+
+
+def test_sync_aborted_by_user(orm_session: Session, monkeypatch) -> None:
+    _logger.debug(f"---------- Test: test_sync_aborted_by_user")
+    monkeypatch.setattr("builtins.input", lambda: "N")
+    processor = ContractSyncProcessor(
+        listing_reader=MockListingReader(pages=[["NEW_A"]]),
+        contracts_db_manager=ContractsDbManager(orm_session=orm_session),
+        orm_session=orm_session)
+    processor.sync_contracts_to_listing(exchange=Exchange.XETRA)
+    assert _get_symbols(orm_session=orm_session, exchange="XETRA") == \
+        ["SYM_0", "SYM_1", "SYM_2", "SYM_3"]
@@ -0,0 +1,102 @@
+from typing import Generator
+from logging import getLogger
+from pathlib import Path
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from barbucket.business_logic.quotes_panel_reader import QuotesPanelReader
+from barbucket.domain_model.data_classes import Base, Contract, Quote, QuotesStatus, UniverseMembership
+from barbucket.persistence.data_managers import QuotesDbManager, QuotesStatusDbManager, UniverseDbManager
+
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing QuotesPanelReader")
+
+
+@pytest.fixture
+def orm_session() -> Generator:
+    _logger.debug(f"---------- Fixture: orm_session")
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    session = Session(engine, autoflush=False)
+    contracts = [
+        Contract(contract_type="STOCK", broker_symbol=f"SYM_{n}",
+                 currency="EUR", exchange="XETRA")
+        for n in range(3)]
+    for contract in contracts:
+        session.add(UniverseMembership(
+            universe="TEST_UNIVERSE", contract=contract))
+    session.commit()
+    # Contract 1 misses a day, contract 3 has no quotes at all
+    for contract_id, days in [(1, [3, 5]), (2, [3, 4, 5])]:
+        for day in days:
+            session.add(Quote(
+                contract_id=contract_id, date=date(2022, 1, day),
+                open=1.0, high=1.0, low=1.0, close=contract_id * 10 + day,
+                volume=100.0))
+        session.add(QuotesStatus(
+            contract_id=contract_id, status_code=1,
+            updated_at=datetime(2022, 1, 6)))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _create_reader(orm_session: Session,
+                   cache_directory: Path = None) -> QuotesPanelReader:
+    return QuotesPanelReader(
+        universe_db_manager=UniverseDbManager(orm_session=orm_session),
+        quotes_db_manager=QuotesDbManager(orm_session=orm_session),
+        status_db_manager=QuotesStatusDbManager(orm_session=orm_session),
+        cache_directory=cache_directory)
+
+
+def test_get_panel(orm_session: Session) -> None:
+    _logger.debug(f"---------- Test: test_get_panel")
+    reader = _create_reader(orm_session=orm_session)
+    panel = reader.get_panel(universe="TEST_UNIVERSE")
+    assert panel.contract_ids.tolist() == [1, 2, 3]
+    assert panel.dates.tolist() == [
+        date(2022, 1, 3), date(2022, 1, 4), date(2022, 1, 5)]
+    assert panel.values.dtype == np.float32
+    np.testing.assert_array_equal(panel.values, [
+        [13, 23, np.nan],
+        [np.nan, 24, np.nan],
+        [15, 25, np.nan]])
+    frame = panel.to_frame()
+    assert frame.loc["2022-01-05", 2] == 25
+
+
+def test_get_panel_date_range(orm_session: Session) -> None:
+    _logger.debug(f"---------- Test: test_get_panel_date_range")
+    reader = _create_reader(orm_session=orm_session)
+    panel = reader.get_panel(
+        universe="TEST_UNIVERSE", column="open", start=date(2022, 1, 4),
+        end=date(2022, 1, 4))
+    assert panel.dates.tolist() == [date(2022, 1, 4)]
+    np.testing.assert_array_equal(panel.values, [[np.nan, 1, np.nan]])
+
+
+def test_get_panel_from_cache(orm_session: Session, tmp_path: Path) -> None:
+    _logger.debug(f"---------- Test: test_get_panel_from_cache")
+    reader = _create_reader(orm_session=orm_session, cache_directory=tmp_path)
+    first = reader.get_panel(universe="TEST_UNIVERSE")
+    assert (tmp_path / "TEST_UNIVERSE.close.npz").is_file()
+    # Quotes changed without a status update are not seen
+    orm_session.add(Quote(
+        contract_id=1, date=date(2022, 1, 4), open=1.0, high=1.0, low=1.0,
+        close=14, volume=100.0))
+    orm_session.commit()
+    cached = reader.get_panel(
+        universe="TEST_UNIVERSE", start=date(2022, 1, 4))
+    np.testing.assert_array_equal(cached.values, first.values[1:])
+    # A status update invalidates the cached panel
+    orm_session.merge(QuotesStatus(
+        contract_id=1, status_code=1, updated_at=datetime(2022, 1, 7)))
+    orm_session.commit()
+    updated = reader.get_panel(universe="TEST_UNIVERSE")
+    assert updated.values[1, 0] == 14
@@ -0,0 +1,322 @@
+from typing import Generator, List, Optional
+from logging import getLogger
+from pathlib import Path
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from barbucket.api.tws_connection_pool import TwsConnectionPool
+from barbucket.api.tws_connector import TwsConnector
+from barbucket.business_logic.quotes_processor import QuotesProcessor
+from barbucket.business_logic.quotes_status_handler import QuotesStatusHandler
+from barbucket.business_logic.quotes_writer import QuotesWriter
+from barbucket.domain_model.data_classes import Base, Contract, Quote, QuotesJournalEntry, QuotesStatus
+from barbucket.domain_model.types import ApiNotationTranslator, QuotesJournalOutcome, QuotesStatusCode
+from barbucket.persistence.connectionstring_assembler import ConnectionStringAssembler
+from barbucket.persistence.data_managers import QuotesDbManager, QuotesJournalDbManager, QuotesStatusDbManager, UniverseDbManager
+from barbucket.persistence.orm_connector import OrmConnector
+from barbucket.util.config_reader import ConfigReader
+from tests.fake_tws import FakeTws
+
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing QuotesProcessor")
+
+
+class MockConfigReader(ConfigReader):
+    # override
+    def __init__(self, **values: str) -> None:
+        self._values = {
+            "initial_duration": "1 Y",
+            "redownload_days": "5",
+            "overlap_days": "5",
+            "no_data_retry_days": "30",
+            "revision_tolerance": "0.0005",
+            "concurrent_requests": "2",
+            "write_queue_size": "20",
+            "commit_batch_size": "50",
+            "commit_interval": "10",
+            "host": "127.0.0.1",
+            "port": "7497",
+            "additional_gateways": "",
+            "quotes_client_ids": "1"}
+        self._values.update(values)
+
+    # override
+    def get_config_value_single(self, section: str, option: str) -> str:
+        return self._values[option]
+
+    # override
+    def get_config_value_list(self, section: str, option: str) -> List[str]:
+        return self._values[option].split(",")
+
+
+class MockConnectionStringAssembler(ConnectionStringAssembler):
+    # override
+    def __init__(self, filepath: Path) -> None:
+        self._filepath = filepath
+
+    # override
+    def get_connection_string(self) -> str:
+        return f"sqlite:///{self._filepath}"
+
+
+@pytest.fixture
+def orm_connector(tmp_path: Path) -> Generator:
+    _logger.debug(f"---------- Fixture: orm_connector")
+    # File database, as the writer thread gets its own connection
+    orm_connector = OrmConnector(
+        connstring_assembler=MockConnectionStringAssembler(
+            filepath=tmp_path / "test.sqlite"),
+        base_class=Base)
+    session = orm_connector.get_session()
+    contracts = [
+        Contract(contract_type="STOCK", exchange="NYSE",
+                 broker_symbol=f"SYM{n}", exchange_symbol=f"SYM{n}",
+                 currency="USD")
+        for n in range(2)]
+    session.add_all(contracts)
+    session.flush()
+    UniverseDbManager(orm_session=session).create_universe(
+        name="TEST_UNIVERSE", contracts=contracts)
+    session.commit()
+    yield orm_connector
+
+
+def _create_quotes_processor(
+        orm_connector: OrmConnector, fake_tws: FakeTws,
+        config_reader: Optional[MockConfigReader] = None) -> QuotesProcessor:
+    config_reader = config_reader or MockConfigReader()
+    orm_session = orm_connector.get_session()
+    writer_session = orm_connector.create_session()
+    return QuotesProcessor(
+        universe_db_manager=UniverseDbManager(orm_session=orm_session),
+        quotes_db_manager=QuotesDbManager(orm_session=orm_session),
+        status_db_manager=QuotesStatusDbManager(orm_session=orm_session),
+        journal_db_manager=QuotesJournalDbManager(orm_session=orm_session),
+        quotes_writer=QuotesWriter(
+            quotes_db_manager=QuotesDbManager(orm_session=writer_session),
+            status_db_manager=QuotesStatusDbManager(
+                orm_session=writer_session),
+            journal_db_manager=QuotesJournalDbManager(
+                orm_session=writer_session),
+            config_reader=config_reader,
+            orm_session=writer_session),
+        tws_connector=TwsConnector(
+            config_reader=config_reader,
+            api_notation_translator=ApiNotationTranslator(),
+            connection_pool=TwsConnectionPool(
+                config_reader=config_reader,
+                client_ids_option="quotes_client_ids",
+                ib_factory=fake_tws.create_client)),
+        status_handler=QuotesStatusHandler(),
+        config_reader=config_reader,
+        orm_session=orm_session)
+
+
+def test_refresh_revised_quotes(orm_connector: OrmConnector) -> None:
+    _logger.debug(f"---------- Test: test_refresh_revised_quotes")
+    fake_tws = FakeTws()
+    for symbol in ["SYM0", "SYM1"]:
+        fake_tws.generate_bars(symbol=symbol, n_days=300)
+    # Both contracts were downloaded two weeks ago. The history of SYM1 was
+    # adjusted since then, halving all its prices.
+    end = np.busday_offset(date.today(), -10, roll="backward").item()
+    session = orm_connector.create_session()
+    for contract_id, symbol, factor in [(1, "SYM0", 1), (2, "SYM1", 2)]:
+        quotes = [
+            Quote(contract_id=contract_id, date=bar.date, open=bar.open,
+                  high=bar.high, low=bar.low, close=bar.close * factor,
+                  volume=bar.volume)
+            for bar in fake_tws._bars[symbol] if bar.date <= end]
+        quotes.append(Quote(
+            contract_id=contract_id, date=date.today() - timedelta(days=500),
+            open=1.0, high=1.0, low=1.0, close=1.0, volume=1.0))
+        session.add_all(quotes)
+    session.commit()
+
+    quotes_processor = _create_quotes_processor(
+        orm_connector=orm_connector, fake_tws=fake_tws)
+    quotes_processor.download_historical_quotes(universe="TEST_UNIVERSE")
+
+    # One incremental request per contract and one refresh for SYM1
+    assert fake_tws.n_requests == 3
+    stored = {
+        contract_id: session.execute(
+            select(Quote.date, Quote.close)
+            .where(Quote.contract_id == contract_id)
+            .order_by(Quote.date)).all()
+        for contract_id in [1, 2]}
+    received = [(bar.date, bar.close) for bar in fake_tws._bars["SYM1"]
+                if bar.date > date.today() - timedelta(days=365)]
+    assert stored[2] == received
+    # Untouched history of SYM0, including the oldest quote
+    assert len(stored[1]) == len(fake_tws._bars["SYM0"]) + 1
+    statuses = QuotesStatusDbManager(orm_session=session).get_statuses(
+        universe="TEST_UNIVERSE")
+    assert statuses[2].status_code == QuotesStatusCode.SUCCESSFUL.value
+    assert statuses[2].earliest_quote_requested == received[0][0]
+    session.close()
+
+
+def _store_quotes(orm_connector: OrmConnector, contract_id: int,
+                  end: date, status_code: QuotesStatusCode,
+                  updated_at: datetime) -> None:
+    session = orm_connector.create_session()
+    dates = np.busday_offset(end, range(-20, 1), roll="backward")
+    session.add_all([
+        Quote(contract_id=contract_id, date=day.item(), open=1.0, high=1.0,
+              low=1.0, close=1.0, volume=1.0)
+        for day in dates])
+    session.add(QuotesStatus(
+        contract_id=contract_id, status_code=status_code.value,
+        status_text="", earliest_quote_requested=dates[0].item(),
+        latest_quote_requested=end, updated_at=updated_at))
+    session.commit()
+    session.close()
+
+
+def _store_no_data_status(orm_connector: OrmConnector, contract_id: int,
+                          updated_at: datetime) -> None:
+    session = orm_connector.create_session()
+    session.add(QuotesStatus(
+        contract_id=contract_id, status_code=QuotesStatusCode.NO_DATA.value,
+        status_text="No quotes received", updated_at=updated_at))
+    session.commit()
+    session.close()
+
+
+def _get_statuses(orm_connector: OrmConnector) -> dict:
+    session = orm_connector.create_session()
+    statuses = QuotesStatusDbManager(orm_session=session).get_statuses(
+        universe="TEST_UNIVERSE")
+    session.close()
+    return statuses
+
+
+def test_update_no_data_contract_with_quotes(
+        orm_connector: OrmConnector) -> None:
+    _logger.debug(f"---------- Test: test_update_no_data_contract_with_quotes")
+    fake_tws = FakeTws()
+    fake_tws.generate_bars(symbol="SYM0", n_days=100)
+    fake_tws.generate_bars(symbol="SYM1", n_days=100)
+    end = np.busday_offset(date.today(), -10, roll="backward").item()
+    _store_quotes(orm_connector=orm_connector, contract_id=1, end=end,
+                  status_code=QuotesStatusCode.NO_DATA,
+                  updated_at=datetime.now())
+    _store_no_data_status(orm_connector=orm_connector, contract_id=2,
+                          updated_at=datetime.now())
+    quotes_processor = _create_quotes_processor(
+        orm_connector=orm_connector, fake_tws=fake_tws)
+    quotes_processor.download_historical_quotes(universe="TEST_UNIVERSE")
+    # SYM1 had no data recently and has no quotes, so it is not requested
+    session = orm_connector.create_session()
+    assert session.execute(select(Quote.date).where(
+        Quote.contract_id == 2)).all() == []
+    session.close()
+    statuses = _get_statuses(orm_connector=orm_connector)
+    assert statuses[1].status_code == QuotesStatusCode.SUCCESSFUL.value
+    assert statuses[1].latest_quote_requested > end
+    assert statuses[2].status_code == QuotesStatusCode.NO_DATA.value
+
+
+def test_retry_no_data_contract_after_age(
+        orm_connector: OrmConnector) -> None:
+    _logger.debug(f"---------- Test: test_retry_no_data_contract_after_age")
+    fake_tws = FakeTws()
+    fake_tws.generate_bars(symbol="SYM1", n_days=100)
+    _store_quotes(orm_connector=orm_connector, contract_id=1,
+                  end=np.busday_offset(date.today(), -1,
+                                       roll="backward").item(),
+                  status_code=QuotesStatusCode.SUCCESSFUL,
+                  updated_at=datetime.now())
+    _store_no_data_status(orm_connector=orm_connector, contract_id=2,
+                          updated_at=datetime.now() - timedelta(days=31))
+    quotes_processor = _create_quotes_processor(
+        orm_connector=orm_connector, fake_tws=fake_tws)
+    quotes_processor.download_historical_quotes(universe="TEST_UNIVERSE")
+    # SYM0 is recent, SYM1 is retried
+    assert fake_tws.n_requests == 1
+    statuses = _get_statuses(orm_connector=orm_connector)
+    assert statuses[2].status_code == QuotesStatusCode.SUCCESSFUL.value
+
+
+def test_keep_status_without_new_quotes(
+        orm_connector: OrmConnector) -> None:
+    _logger.debug(f"---------- Test: test_keep_status_without_new_quotes")
+    # The TWS has no data for SYM0, e.g. during an outage
+    fake_tws = FakeTws()
+    end = np.busday_offset(date.today(), -10, roll="backward").item()
+    _store_quotes(orm_connector=orm_connector, contract_id=1, end=end,
+                  status_code=QuotesStatusCode.SUCCESSFUL,
+                  updated_at=datetime.now())
+    _store_no_data_status(orm_connector=orm_connector, contract_id=2,
+                          updated_at=datetime.now())
+    quotes_processor = _create_quotes_processor(
+        orm_connector=orm_connector, fake_tws=fake_tws)
+    quotes_processor.download_historical_quotes(universe="TEST_UNIVERSE")
+    assert fake_tws.n_requests == 1
+    statuses = _get_statuses(orm_connector=orm_connector)
+    assert statuses[1].status_code == QuotesStatusCode.SUCCESSFUL.value
+    assert statuses[1].latest_quote_requested == end
+    session = orm_connector.create_session()
+    assert len(session.execute(select(Quote.date).where(
+        Quote.contract_id == 1)).all()) == 21
+    session.close()
+
+
+def test_reset_no_data_statuses(orm_connector: OrmConnector) -> None:
+    _logger.debug(f"---------- Test: test_reset_no_data_statuses")
+    _store_quotes(orm_connector=orm_connector, contract_id=1,
+                  end=date.today(), status_code=QuotesStatusCode.SUCCESSFUL,
+                  updated_at=datetime.now())
+    _store_no_data_status(orm_connector=orm_connector, contract_id=2,
+                          updated_at=datetime.now())
+    quotes_processor = _create_quotes_processor(
+        orm_connector=orm_connector, fake_tws=FakeTws())
+    assert quotes_processor.reset_no_data_statuses(
+        universe="TEST_UNIVERSE") == 1
+    assert list(_get_statuses(orm_connector=orm_connector)) == [1]
+
+
+def test_resume_defers_only_planned_contracts(
+        orm_connector: OrmConnector, caplog) -> None:
+    _logger.debug(
+        f"---------- Test: test_resume_defers_only_planned_contracts")
+    fake_tws = FakeTws()
+    fake_tws.generate_bars(symbol="SYM0", n_days=100)
+    _store_no_data_status(orm_connector=orm_connector, contract_id=2,
+                          updated_at=datetime.now())
+    session = orm_connector.create_session()
+    session.add(QuotesJournalEntry(
+        universe="TEST_UNIVERSE", contract_id=2,
+        outcome=QuotesJournalOutcome.NO_DATA.name,
+        updated_at=datetime.now()))
+    session.commit()
+    session.close()
+    quotes_processor = _create_quotes_processor(
+        orm_connector=orm_connector, fake_tws=fake_tws)
+    with caplog.at_level("INFO"):
+        quotes_processor.download_historical_quotes(
+            universe="TEST_UNIVERSE", resume=True)
+    assert fake_tws.n_requests == 1
+    assert "1 open, 0 failed contracts deferred" in caplog.text
+
+
+def test_log_plan_beyond_pacing_budget(
+        orm_connector: OrmConnector, monkeypatch, caplog) -> None:
+    _logger.debug(f"---------- Test: test_log_plan_beyond_pacing_budget")
+    fake_tws = FakeTws()
+    for symbol in ["SYM0", "SYM1"]:
+        fake_tws.generate_bars(symbol=symbol, n_days=100)
+    monkeypatch.setattr(
+        TwsConnector, "get_remaining_historical_budget", lambda self: 1)
+    quotes_processor = _create_quotes_processor(
+        orm_connector=orm_connector, fake_tws=fake_tws)
+    with caplog.at_level("INFO"):
+        quotes_processor.download_historical_quotes(
+            universe="TEST_UNIVERSE", resume=False)
+    assert "Planned 2 downloads exceed the IB pacing budget of 1 " \
+        "requests" in caplog.text
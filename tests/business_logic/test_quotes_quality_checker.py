@@ -0,0 +1,129 @@
+from typing import Generator, List
+from logging import getLogger
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from barbucket.business_logic.quotes_quality_checker import QuotesQualityChecker
+from barbucket.domain_model.data_classes import Base, Contract, Quote, QuotesQualityCheck, UniverseMembership
+from barbucket.persistence import data_managers
+from barbucket.persistence.data_managers import ContractsDbManager, QuotesDbManager, QuotesQualityDbManager, UniverseDbManager
+from barbucket.util.config_reader import ConfigReader
+
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing QuotesQualityChecker")
+
+
+class MockConfigReader(ConfigReader):
+    # override
+    def __init__(self) -> None:
+        pass
+
+    # override
+    @classmethod
+    def get_config_value_single(cls, section: str, option: str) -> str:
+        values = {
+            "min_quotes_count": "5",
+            "max_missing_quotes_at_end": "2",
+            "max_gap_size": "1"}
+        if (section == "quality_check") and (option in values):
+            return values[option]
+        else:
+            raise NotImplementedError
+
+    # override
+    @classmethod
+    def get_config_value_list(cls, section: str, option: str) -> List[str]:
+        raise NotImplementedError
+
+
+# Business days of January 2022, starting Monday the 3rd
+_DAYS = np.busday_offset("2022-01-03", range(15)).astype(date).tolist()
+
+
+@pytest.fixture
+def orm_session() -> Generator:
+    _logger.debug(f"---------- Fixture: orm_session")
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    session = Session(engine, autoflush=False)
+    for n in range(5):
+        session.add(UniverseMembership(universe="TEST_UNIVERSE", contract=Contract(
+            contract_type="STOCK", exchange="XETRA",
+            broker_symbol=f"SYM_{n}", currency="EUR")))
+    session.commit()
+    quotes_days = {
+        1: _DAYS,  # complete
+        2: _DAYS[:5],  # ends a week early
+        3: _DAYS[:6] + _DAYS[8:],  # gap of two days
+        4: _DAYS[:2] + _DAYS[3:5] + _DAYS[-1:]}  # too few, with gaps
+    for contract_id, days in quotes_days.items():
+        for day in days:
+            session.add(Quote(
+                contract_id=contract_id, date=day, open=1.0, high=1.0,
+                low=1.0, close=1.0, volume=1.0))
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def checker(orm_session: Session) -> Generator:
+    _logger.debug(f"---------- Fixture: checker")
+    yield QuotesQualityChecker(
+        universe_db_manager=UniverseDbManager(orm_session=orm_session),
+        contracts_db_manager=ContractsDbManager(orm_session=orm_session),
+        quotes_db_manager=QuotesDbManager(orm_session=orm_session),
+        quality_db_manager=QuotesQualityDbManager(orm_session=orm_session),
+        config_reader=MockConfigReader(),
+        orm_session=orm_session)
+
+
+def test_check_universe(
+        checker: QuotesQualityChecker, orm_session: Session) -> None:
+    _logger.debug(f"---------- Test: test_check_universe")
+    checks = checker.check_universe(universe="TEST_UNIVERSE")
+    metrics = {
+        contract_id: (check.quotes_count, check.missing_quotes_at_end,
+                      check.max_gap_size, check.passed)
+        for contract_id, check in checks.items()}
+    assert metrics == {
+        1: (15, 0, 0, True),
+        2: (5, 10, 0, False),
+        3: (13, 0, 2, False),
+        4: (5, 0, 9, False),
+        5: (0, None, None, False)}
+    # Results are persisted and replaced on the next check
+    checker.check_universe(universe="TEST_UNIVERSE")
+    stored = QuotesQualityDbManager(orm_session=orm_session).get_checks(
+        universe="TEST_UNIVERSE")
+    assert stored[3].max_gap_size == 2
+    assert not stored[5].passed
+
+
+def test_create_filtered_universe(
+        checker: QuotesQualityChecker, orm_session: Session) -> None:
+    _logger.debug(f"---------- Test: test_create_filtered_universe")
+    checker.check_universe(universe="TEST_UNIVERSE")
+    checker.create_filtered_universe(universe="TEST_UNIVERSE", name="CLEAN")
+    assert UniverseDbManager(orm_session=orm_session).get_member_ids(
+        name="CLEAN") == [1]
+
+
+def test_create_filtered_universe_in_batches(
+        checker: QuotesQualityChecker, orm_session: Session,
+        monkeypatch) -> None:
+    _logger.debug(f"---------- Test: test_create_filtered_universe_in_batches")
+    monkeypatch.setattr(data_managers, "_MAX_IN_CLAUSE_IDS", 2)
+    orm_session.add_all([
+        QuotesQualityCheck(contract_id=contract_id, passed=True,
+                           checked_at=datetime.now())
+        for contract_id in range(1, 6)])
+    orm_session.commit()
+    checker.create_filtered_universe(universe="TEST_UNIVERSE", name="CLEAN")
+    assert UniverseDbManager(orm_session=orm_session).get_member_ids(
+        name="CLEAN") == [1, 2, 3, 4, 5]
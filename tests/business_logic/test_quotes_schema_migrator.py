@@ -0,0 +1,55 @@
+from typing import Generator
+from logging import getLogger
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from barbucket.business_logic.quotes_schema_migrator import QuotesSchemaMigrator
+from barbucket.domain_model.data_classes import Base, Contract, Quote
+from barbucket.persistence.data_managers import QuotesDbManager
+
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing QuotesSchemaMigrator")
+
+
+@pytest.fixture
+def orm_session() -> Generator:
+    _logger.debug(f"---------- Fixture: orm_session")
+    engine = create_engine("sqlite:///:memory:", future=True)
+    Base.metadata.create_all(engine)
+    session = Session(engine, autoflush=False)
+    for n in range(5):
+        session.add(Contract(
+            contract_type="STOCK", exchange="XETRA",
+            broker_symbol=f"SYM_{n}", currency="EUR"))
+    session.commit()
+    for contract_id in range(1, 6):
+        for day in range(3, 8):
+            session.add(Quote(
+                contract_id=contract_id, date=date(2022, 1, day),
+                open=10.5, high=11.25, low=10.0, close=day + 0.125,
+                volume=1000.0))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_migrate_to_compact_and_back(orm_session: Session) -> None:
+    _logger.debug(f"---------- Test: test_migrate_to_compact_and_back")
+    standard = QuotesDbManager(orm_session=orm_session)
+    compact = QuotesDbManager(orm_session=orm_session, compact=True)
+    expected = standard.get_quotes()
+    migrator = QuotesSchemaMigrator(
+        source_db_manager=standard, target_db_manager=compact,
+        orm_session=orm_session, batch_size=2)
+    assert migrator.migrate() == 25
+    assert standard.get_contract_ids() == []
+    assert compact.get_quotes().equals(expected)
+    migrator = QuotesSchemaMigrator(
+        source_db_manager=compact, target_db_manager=standard,
+        orm_session=orm_session)
+    assert migrator.migrate() == 25
+    assert standard.get_quotes().equals(expected)
@@ -0,0 +1,153 @@
+from typing import Generator, List
+from logging import getLogger
+from pathlib import Path
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, event, select, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from barbucket.business_logic.quotes_writer import QuotesWriter
+from barbucket.domain_model.data_classes import (
+    Base, Contract, Quote, QuotesJournalEntry)
+from barbucket.persistence.data_managers import (
+    QuotesDbManager, QuotesJournalDbManager, QuotesStatusDbManager)
+from barbucket.util.config_reader import ConfigReader
+
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing QuotesWriter")
+
+
+class MockConfigReader(ConfigReader):
+    # override
+    def __init__(self) -> None:
+        pass
+
+    # override
+    @classmethod
+    def get_config_value_single(cls, section: str, option: str) -> str:
+        values = {
+            "write_queue_size": "2",
+            "commit_batch_size": "3",
+            "commit_interval": "10"}
+        if (section == "quotes") and (option in values):
+            return values[option]
+        else:
+            raise NotImplementedError
+
+    # override
+    @classmethod
+    def get_config_value_list(cls, section: str, option: str) -> List[str]:
+        raise NotImplementedError
+
+
+@pytest.fixture
+def engine(tmp_path: Path) -> Generator:
+    _logger.debug(f"---------- Fixture: engine")
+
+    def _fk_pragma_on_connect(dbapi_con, con_record):
+        dbapi_con.execute('PRAGMA foreign_keys = 1')
+
+    # File database, as every thread gets its own connection
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'test.sqlite'}", future=True)
+    event.listen(engine, 'connect', _fk_pragma_on_connect)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        for n in range(10):
+            session.add(Contract(
+                contract_type="STOCK", exchange="XETRA",
+                broker_symbol=f"SYM_{n}", currency="EUR"))
+        session.commit()
+    yield engine
+
+
+@pytest.fixture
+def quotes_writer(engine) -> Generator:
+    _logger.debug(f"---------- Fixture: quotes_writer")
+    session = Session(engine, autoflush=False)
+    writer = QuotesWriter(
+        quotes_db_manager=QuotesDbManager(orm_session=session),
+        status_db_manager=QuotesStatusDbManager(orm_session=session),
+        journal_db_manager=QuotesJournalDbManager(orm_session=session),
+        config_reader=MockConfigReader(),
+        orm_session=session)
+    yield writer
+
+
+def _create_quotes(contract_id: int) -> List[Quote]:
+    return [
+        Quote(contract_id=contract_id, date=date(2022, 1, day), open=1.0,
+              high=1.0, low=1.0, close=1.0, volume=100.0)
+        for day in range(3, 8)]
+
+
+def test_write_all_on_stop(engine, quotes_writer: QuotesWriter) -> None:
+    _logger.debug(f"---------- Test: test_write_all_on_stop")
+    quotes_writer.start()
+    for contract_id in range(1, 11):
+        quotes_writer.put(quotes=_create_quotes(contract_id=contract_id))
+    n_written = quotes_writer.stop()
+    assert n_written == 10
+    with Session(engine) as session:
+        count = session.execute(select(func.count(Quote.date))).scalar()
+    assert count == 50
+
+
+def test_write_error_is_raised(quotes_writer: QuotesWriter) -> None:
+    _logger.debug(f"---------- Test: test_write_error_is_raised")
+    quotes_writer.start()
+    quotes_writer.put(quotes=_create_quotes(contract_id=999))  # no contract
+    quotes_writer.put(quotes=_create_quotes(contract_id=1))
+    quotes_writer.put(quotes=_create_quotes(contract_id=2))
+    with pytest.raises(IntegrityError):
+        quotes_writer.stop()
+
+
+def test_write_journal_entry(engine, quotes_writer: QuotesWriter) -> None:
+    _logger.debug(f"---------- Test: test_write_journal_entry")
+    quotes_writer.start()
+    quotes_writer.put(
+        quotes=_create_quotes(contract_id=1),
+        journal_entry=QuotesJournalEntry(
+            universe="TEST_UNIVERSE", contract_id=1, outcome="DONE"))
+    quotes_writer.put(
+        quotes=[],
+        journal_entry=QuotesJournalEntry(
+            universe="TEST_UNIVERSE", contract_id=2, outcome="FAILED",
+            error_code=200))
+    assert quotes_writer.stop() == 2
+    with Session(engine) as session:
+        outcomes = QuotesJournalDbManager(orm_session=session).get_outcomes(
+            universe="TEST_UNIVERSE")
+    assert outcomes == {1: "DONE", 2: "FAILED"}
+
+
+def test_failed_final_commit_is_raised(
+        quotes_writer: QuotesWriter, monkeypatch) -> None:
+    _logger.debug(f"---------- Test: test_failed_final_commit_is_raised")
+    quotes_writer.start()
+    quotes_writer.put(quotes=_create_quotes(contract_id=1))
+
+    def fail(n_pending: int) -> None:
+        raise RuntimeError("Commit failed")
+
+    monkeypatch.setattr(quotes_writer, "_commit", fail)
+    with pytest.raises(RuntimeError):
+        quotes_writer.stop()
+
+
+def test_write_replace(engine, quotes_writer: QuotesWriter) -> None:
+    _logger.debug(f"---------- Test: test_write_replace")
+    quotes_writer.start()
+    quotes_writer.put(quotes=_create_quotes(contract_id=1))
+    quotes_writer.put(quotes=_create_quotes(contract_id=1)[:2], replace=True)
+    quotes_writer.put(quotes=_create_quotes(contract_id=1)[:2])
+    quotes_writer.stop()
+    # The unchanged quotes are skipped
+    assert quotes_writer.get_quotes_counts() == (7, 2)
+    with Session(engine) as session:
+        count = session.execute(select(func.count(Quote.date))).scalar()
+    assert count == 2
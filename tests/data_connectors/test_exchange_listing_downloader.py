@@ -1,27 +1,109 @@
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from logging import getLogger
+from pathlib import Path
+from typing import Generator, List
 
+import pytest
 import requests
 
-from barbucket.datasource_connectors.html_downloader import HtmlDownloader
+from barbucket.datasource_connectors import html_downloader
+from barbucket.datasource_connectors.html_downloader import HtmlDownloader, create_session
 from barbucket.domain_model.types import Exchange, ApiNotationTranslator
+from barbucket.persistence.listing_page_cache import CachedPage, ListingPageCache
 
 _logger = getLogger(__name__)
 _logger.debug(f"--------- ---------- Testing ExchangeListingDownloader")
 
 
-def mock_get(url: str):
-    class MockResponse():
-        text = url
+class MockSession(requests.Session):
+    # override
+    def __init__(self) -> None:
+        pass
 
-    return MockResponse()
+    # override
+    def get(self, url: str, **kwargs) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response._content = url.encode()
+        return response
+
+
+class TimingSession(MockSession):
+    # override
+    def __init__(self) -> None:
+        self.started_at: List[float] = []
+
+    # override
+    def get(self, url: str, **kwargs) -> requests.Response:
+        self.started_at.append(time.monotonic())
+        return super().get(url, **kwargs)
+
+
+class OfflineSession(requests.Session):
+    # override
+    def __init__(self) -> None:
+        pass
+
+    # override
+    def get(self, url: str, **kwargs) -> requests.Response:
+        raise requests.exceptions.ConnectionError("Offline")
+
+
+class ListingHandler(BaseHTTPRequestHandler):
+    # Serves a fixed page with validators, after failing 'n_failures' times
+    n_failures = 0
+    n_requests = 0
+    statuses: List[int] = []
+    etag = '"v1"'
+    last_modified = formatdate(0, usegmt=True)
+
+    def do_GET(self) -> None:
+        cls = type(self)
+        cls.n_requests += 1
+        if cls.n_requests <= cls.n_failures:
+            self._send(status=503, body=b"")
+        elif self.headers.get("If-None-Match") == cls.etag:
+            self._send(status=304, body=b"")
+        else:
+            self._send(status=200, body=b"<html>listing</html>")
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes) -> None:
+        type(self).statuses.append(status)
+        self.send_response(status)
+        self.send_header("ETag", type(self).etag)
+        self.send_header("Last-Modified", type(self).last_modified)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def listing_server(monkeypatch) -> Generator:
+    _logger.debug(f"---------- Fixture: listing_server")
+    monkeypatch.setattr(html_downloader, "_BACKOFF_FACTOR", 0)
+    ListingHandler.n_failures = 0
+    ListingHandler.n_requests = 0
+    ListingHandler.statuses = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ListingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/listing"
+    server.shutdown()
+    server.server_close()
 
 
 def test_get_weblisting_singlepage(monkeypatch) -> None:
     """ """
     _logger.debug(f"---------- Test: test_get_weblisting_singlepage")
-    monkeypatch.setattr(requests, "get", mock_get)
     downloader = HtmlDownloader(
-        api_notation_translator=ApiNotationTranslator())
+        api_notation_translator=ApiNotationTranslator(),
+        session=MockSession())
     expected_html = "https://www.interactivebrokers.com/en/index.php?f=567&exch=IBIS"
     actual_html = downloader.get_weblisting_singlepage(exchange=Exchange.XETRA)
     assert actual_html == expected_html
@@ -30,11 +112,123 @@ def test_get_weblisting_singlepage(monkeypatch) -> None:
 def test_get_weblisting_multipage(monkeypatch) -> None:
     """ """
     _logger.debug(f"---------- Test: test_get_weblisting_multipage")
-    monkeypatch.setattr(requests, "get", mock_get)
     downloader = HtmlDownloader(
-        api_notation_translator=ApiNotationTranslator())
+        api_notation_translator=ApiNotationTranslator(),
+        session=MockSession())
     expected_html = ("https://www.interactivebrokers.com/en/index.php?f=2222"
                      "&exch=IBIS&showcategories=STK&p=&cc=&limit=100&page=5")
     actual_html = downloader.get_weblisting_multipage(
         exchange=Exchange.XETRA, page=5)
     assert actual_html == expected_html
+
+
+def test_download_without_cache(listing_server: str) -> None:
+    _logger.debug(f"---------- Test: test_download_without_cache")
+    downloader = HtmlDownloader(
+        api_notation_translator=ApiNotationTranslator())
+    first_html = downloader._get(
+        url=listing_server, exchange=Exchange.XETRA, page=1)
+    second_html = downloader._get(
+        url=listing_server, exchange=Exchange.XETRA, page=1)
+    downloader.close()
+    assert first_html == second_html == "<html>listing</html>"
+    # Without a cache, nothing is revalidated
+    assert ListingHandler.statuses == [200, 200]
+
+
+def test_download_within_rate_limit() -> None:
+    _logger.debug(f"---------- Test: test_download_within_rate_limit")
+    session = TimingSession()
+    downloader = HtmlDownloader(
+        api_notation_translator=ApiNotationTranslator(), session=session,
+        requests_per_second=20)
+    start = time.monotonic()
+    threads = [
+        threading.Thread(target=downloader.get_weblisting_multipage,
+                         args=(Exchange.XETRA, page))
+        for page in range(1, 7)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(session.started_at) == 6
+    # Every request waits for its own slot of 1/20 seconds
+    for n, started_at in enumerate(sorted(session.started_at)):
+        assert started_at - start >= n * 0.05
+
+
+@pytest.mark.parametrize("requests_per_second", [0, -0.5])
+def test_reject_invalid_rate(requests_per_second: float) -> None:
+    _logger.debug(f"---------- Test: test_reject_invalid_rate")
+    with pytest.raises(ValueError, match="listing_requests_per_second"):
+        HtmlDownloader(
+            api_notation_translator=ApiNotationTranslator(),
+            session=MockSession(), requests_per_second=requests_per_second)
+
+
+def test_retry_server_errors(listing_server: str) -> None:
+    _logger.debug(f"---------- Test: test_retry_server_errors")
+    ListingHandler.n_failures = 2
+    downloader = HtmlDownloader(
+        api_notation_translator=ApiNotationTranslator(),
+        session=create_session())
+    html = downloader._get(
+        url=listing_server, exchange=Exchange.XETRA, page=1)
+    assert html == "<html>listing</html>"
+    assert ListingHandler.statuses == [503, 503, 200]
+
+
+def test_give_up_after_retries(listing_server: str) -> None:
+    _logger.debug(f"---------- Test: test_give_up_after_retries")
+    ListingHandler.n_failures = 100
+    downloader = HtmlDownloader(
+        api_notation_translator=ApiNotationTranslator(),
+        session=create_session())
+    with pytest.raises(requests.exceptions.RetryError):
+        downloader._get(
+            url=listing_server, exchange=Exchange.XETRA, page=1)
+    assert ListingHandler.n_requests == html_downloader._MAX_RETRIES + 1
+
+
+def test_read_fresh_page_from_cache(
+        listing_server: str, tmp_path: Path) -> None:
+    _logger.debug(f"---------- Test: test_read_fresh_page_from_cache")
+    for _ in range(2):
+        downloader = HtmlDownloader(
+            api_notation_translator=ApiNotationTranslator(),
+            page_cache=ListingPageCache(directory=tmp_path, ttl=3600))
+        html = downloader._get(
+            url=listing_server, exchange=Exchange.XETRA, page=1)
+        assert html == "<html>listing</html>"
+    assert ListingHandler.statuses == [200]
+
+
+def test_revalidate_stale_page_from_cache(
+        listing_server: str, tmp_path: Path) -> None:
+    _logger.debug(f"---------- Test: test_revalidate_stale_page_from_cache")
+    for _ in range(2):
+        downloader = HtmlDownloader(
+            api_notation_translator=ApiNotationTranslator(),
+            page_cache=ListingPageCache(directory=tmp_path, ttl=0))
+        html = downloader._get(
+            url=listing_server, exchange=Exchange.XETRA, page=1)
+        assert html == "<html>listing</html>"
+    assert ListingHandler.statuses == [200, 304]
+
+
+def test_read_listing_offline_from_cache(tmp_path: Path) -> None:
+    _logger.debug(f"---------- Test: test_read_listing_offline_from_cache")
+    page_cache = ListingPageCache(directory=tmp_path, ttl=float("inf"))
+    dummy_file = "tests/_resources/datasource_connectors/dummy-listing_xetra_stocks_page5.html"
+    with open(dummy_file, 'r') as filereader:
+        dummy_html = filereader.read()
+    page_cache.write(exchange=Exchange.XETRA.name, page=5,
+                     cached_page=CachedPage(html=dummy_html))
+    downloader = HtmlDownloader(
+        api_notation_translator=ApiNotationTranslator(),
+        session=OfflineSession(), page_cache=page_cache)
+    html = downloader.get_weblisting_multipage(
+        exchange=Exchange.XETRA, page=5)
+    assert html == dummy_html
+    with pytest.raises(requests.exceptions.ConnectionError):
+        downloader.get_weblisting_multipage(exchange=Exchange.XETRA, page=6)
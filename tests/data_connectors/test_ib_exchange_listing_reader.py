@@ -0,0 +1,261 @@
+import threading
+import time
+from logging import getLogger
+from pathlib import Path
+from typing import Iterable, List
+
+import pytest
+
+from barbucket.datasource_connectors import ib_exchange_listing_reader
+from barbucket.datasource_connectors.contract_extractor import ContractExtractor
+from barbucket.datasource_connectors.html_corrector import HtmlCorrector
+from barbucket.datasource_connectors.html_downloader import HtmlDownloader
+from barbucket.datasource_connectors.ib_exchange_listing_reader import IbExchangeListingMultipageReader
+from barbucket.datasource_connectors.listing_page_parser import ListingPage, ListingRow
+from barbucket.datasource_connectors.pagecount_extractor import PageCountExtractor
+from barbucket.domain_model.types import ApiNotationTranslator, Exchange
+from barbucket.persistence.listing_page_cache import CachedPage, ListingPageCache
+from barbucket.util.custom_exceptions import ExitSignalDetectedError
+from tests.data_connectors.test_exchange_listing_downloader import OfflineSession
+
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing IbExchangeListingMultipageReader")
+
+
+class MockDownloader(HtmlDownloader):
+    # override
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.started_at: List[float] = []
+        self.max_in_flight = 0
+        self._n_in_flight = 0
+        self._lock = threading.Lock()
+
+    # override
+    def get_weblisting_multipage(self, exchange: Exchange, page: int) -> str:
+        with self._lock:
+            self.started_at.append(time.monotonic())
+            self._n_in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._n_in_flight)
+        # Later pages answer faster, so they complete out of order
+        time.sleep(self.latency / page)
+        with self._lock:
+            self._n_in_flight -= 1
+        return str(page)
+
+
+class MockPageCountExtractor(PageCountExtractor):
+    # override
+    def get_page_count(self, html: str) -> int:
+        return 6
+
+
+class MockContractExtractor(ContractExtractor):
+    # override
+    def __init__(self) -> None:
+        pass
+
+    # override
+    def create_contracts(self, rows: Iterable[ListingRow],
+                         exchange: Exchange) -> List[str]:
+        return [f"{row[0]}{suffix}" for row in rows for suffix in "ab"]
+
+
+def mock_parse_listing_page(html: str) -> ListingPage:
+    return ListingPage(rows=((html, "", "", ""),), page_count=6)
+
+
+class MockSignalHandler():
+    exit_after = None
+    n_checks = 0
+
+    def is_exit_requested(self) -> bool:
+        MockSignalHandler.n_checks += 1
+        return MockSignalHandler.n_checks == MockSignalHandler.exit_after
+
+
+@pytest.fixture
+def signal_handler(monkeypatch) -> MockSignalHandler:
+    _logger.debug(f"---------- Fixture: signal_handler")
+    monkeypatch.setattr(
+        ib_exchange_listing_reader, "SignalHandler", MockSignalHandler)
+    monkeypatch.setattr(ib_exchange_listing_reader, "parse_listing_page",
+                        mock_parse_listing_page)
+    MockSignalHandler.exit_after = None
+    MockSignalHandler.n_checks = 0
+    return MockSignalHandler
+
+
+def _create_reader(downloader: MockDownloader, max_concurrent_requests: int,
+                   parse_processes: int = 1) -> IbExchangeListingMultipageReader:
+    return IbExchangeListingMultipageReader(
+        downloader=downloader,
+        corrector=HtmlCorrector(),
+        pagecount_extractor=MockPageCountExtractor(),
+        contract_extractor=MockContractExtractor(),
+        max_concurrent_requests=max_concurrent_requests,
+        parse_processes=parse_processes)
+
+
+def test_read_pages_in_parallel(signal_handler: MockSignalHandler) -> None:
+    _logger.debug(f"---------- Test: test_read_pages_in_parallel")
+    downloader = MockDownloader(latency=0.2)
+    reader = _create_reader(
+        downloader=downloader, max_concurrent_requests=3)
+    pages = list(reader.read_ib_exchange_listing_pages(
+        exchange=Exchange.XETRA))
+    assert pages == [[f"{page}a", f"{page}b"] for page in range(1, 7)]
+    assert downloader.max_in_flight == 3
+
+
+def test_read_pages_stops_on_exit_signal(
+        signal_handler: MockSignalHandler) -> None:
+    _logger.debug(f"---------- Test: test_read_pages_stops_on_exit_signal")
+    signal_handler.exit_after = 1
+    downloader = MockDownloader(latency=0)
+    reader = _create_reader(
+        downloader=downloader, max_concurrent_requests=1)
+    with pytest.raises(ExitSignalDetectedError):
+        list(reader.read_ib_exchange_listing_pages(exchange=Exchange.XETRA))
+    # Pending pages are not downloaded anymore
+    assert len(downloader.started_at) < 6
+
+
+class ResourceDownloader(HtmlDownloader):
+    # override
+    def __init__(self) -> None:
+        dummy_file = "tests/_resources/datasource_connectors/dummy-listing_xetra_stocks_page5.html"
+        with open(dummy_file, 'r') as filereader:
+            self.html = filereader.read()
+
+    # override
+    def get_weblisting_multipage(self, exchange: Exchange, page: int) -> str:
+        return self.html
+
+
+def test_parse_pages_in_processes(monkeypatch) -> None:
+    _logger.debug(f"---------- Test: test_parse_pages_in_processes")
+    monkeypatch.setattr(
+        ib_exchange_listing_reader, "SignalHandler", MockSignalHandler)
+    MockSignalHandler.exit_after = None
+    downloader = ResourceDownloader()
+    contract_extractor = ContractExtractor(
+        api_notation_translator=ApiNotationTranslator())
+    reader = IbExchangeListingMultipageReader(
+        downloader=downloader,
+        corrector=HtmlCorrector(),
+        pagecount_extractor=PageCountExtractor(),
+        contract_extractor=contract_extractor,
+        max_concurrent_requests=4,
+        parse_processes=2)
+    pages = list(reader.read_ib_exchange_listing_pages(
+        exchange=Exchange.XETRA))
+    page_contracts = contract_extractor.extract_contracts(
+        html=downloader.html, exchange=Exchange.XETRA)
+    assert len(pages) == 22
+    assert pages[-1] == page_contracts
+
+
+def test_close_pages_stops_download(signal_handler: MockSignalHandler) -> None:
+    _logger.debug(f"---------- Test: test_close_pages_stops_download")
+    downloader = MockDownloader(latency=0)
+    reader = _create_reader(
+        downloader=downloader, max_concurrent_requests=1)
+    pages = reader.read_ib_exchange_listing_pages(exchange=Exchange.XETRA)
+    assert next(pages) == ["1a", "1b"]
+    pages.close()
+    assert len(downloader.started_at) < 6
+
+
+def test_read_pages_ahead_within_window(
+        signal_handler: MockSignalHandler) -> None:
+    _logger.debug(f"---------- Test: test_read_pages_ahead_within_window")
+    downloader = MockDownloader(latency=0)
+    reader = _create_reader(
+        downloader=downloader, max_concurrent_requests=1)
+    pages = reader.read_ib_exchange_listing_pages(exchange=Exchange.XETRA)
+    assert next(pages) == ["1a", "1b"]
+    assert next(pages) == ["2a", "2b"]
+    time.sleep(0.1)
+    # Page 1 is read on its own, pages 2 to 4 are within the window
+    assert len(downloader.started_at) == 4
+    pages.close()
+
+
+class BlockingDownloader(MockDownloader):
+    # override
+    def __init__(self) -> None:
+        super().__init__(latency=0)
+        self.release = threading.Event()
+
+    # override
+    def get_weblisting_multipage(self, exchange: Exchange, page: int) -> str:
+        if page > 2:
+            self.release.wait()
+        return super().get_weblisting_multipage(exchange=exchange, page=page)
+
+
+def test_close_pages_without_waiting_for_downloads(
+        signal_handler: MockSignalHandler) -> None:
+    _logger.debug(
+        f"---------- Test: test_close_pages_without_waiting_for_downloads")
+    downloader = BlockingDownloader()
+    reader = _create_reader(
+        downloader=downloader, max_concurrent_requests=2)
+    pages = reader.read_ib_exchange_listing_pages(exchange=Exchange.XETRA)
+    assert next(pages) == ["1a", "1b"]
+    assert next(pages) == ["2a", "2b"]
+    # Releases the blocked downloads, in case closing waits for them
+    timer = threading.Timer(interval=2, function=downloader.release.set)
+    timer.start()
+    started_at = time.monotonic()
+    pages.close()
+    assert time.monotonic() - started_at < 1
+    downloader.release.set()
+    timer.cancel()
+
+
+@pytest.mark.parametrize("max_concurrent_requests, parse_processes, option", [
+    (0, 1, "listing_concurrent_requests"),
+    (1, 0, "listing_parse_processes")])
+def test_reject_invalid_limits(max_concurrent_requests: int,
+                               parse_processes: int, option: str) -> None:
+    _logger.debug(f"---------- Test: test_reject_invalid_limits")
+    with pytest.raises(ValueError, match=option):
+        _create_reader(
+            downloader=MockDownloader(latency=0),
+            max_concurrent_requests=max_concurrent_requests,
+            parse_processes=parse_processes)
+
+
+def test_read_cached_listing_without_waiting(
+        monkeypatch, tmp_path: Path) -> None:
+    _logger.debug(f"---------- Test: test_read_cached_listing_without_waiting")
+    monkeypatch.setattr(
+        ib_exchange_listing_reader, "SignalHandler", MockSignalHandler)
+    MockSignalHandler.exit_after = None
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    dummy_file = "tests/_resources/datasource_connectors/dummy-listing_xetra_stocks_page5.html"
+    with open(dummy_file, 'r') as filereader:
+        html = filereader.read()
+    page_cache = ListingPageCache(directory=tmp_path, ttl=3600)
+    for page in range(1, 23):
+        page_cache.write(exchange=Exchange.XETRA.name, page=page,
+                         cached_page=CachedPage(html=html))
+    reader = IbExchangeListingMultipageReader(
+        downloader=HtmlDownloader(
+            api_notation_translator=ApiNotationTranslator(),
+            session=OfflineSession(), page_cache=page_cache,
+            requests_per_second=0.5),
+        corrector=HtmlCorrector(),
+        pagecount_extractor=PageCountExtractor(),
+        contract_extractor=ContractExtractor(
+            api_notation_translator=ApiNotationTranslator()),
+        max_concurrent_requests=4,
+        parse_processes=1)
+    pages = list(reader.read_ib_exchange_listing_pages(
+        exchange=Exchange.XETRA))
+    assert len(pages) == 22
+    assert sleeps == []
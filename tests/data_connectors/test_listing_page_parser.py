@@ -0,0 +1,43 @@
+from logging import getLogger
+
+import pytest
+
+from barbucket.datasource_connectors import listing_page_parser
+from barbucket.datasource_connectors.listing_page_parser import parse_listing_page
+
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing ListingPageParser")
+
+
+def _read_resource(name: str) -> str:
+    with open(f"tests/_resources/datasource_connectors/{name}", 'r') \
+            as filereader:
+        return filereader.read()
+
+
+@pytest.mark.parametrize("name, page_count", [
+    ("dummy-listing_xetra_stocks_page5.html", 22),
+    ("dummy-listing_xetra_etfs_singlepage.html", None)])
+def test_parsers_are_identical(name: str, page_count: int) -> None:
+    _logger.debug(f"---------- Test: test_parsers_are_identical")
+    pytest.importorskip("lxml")
+    html = _read_resource(name=name)
+    lxml_page = listing_page_parser._parse_with_lxml(html=html)
+    beautifulsoup_page = listing_page_parser._parse_with_beautifulsoup(
+        html=html)
+    assert lxml_page == beautifulsoup_page
+    assert lxml_page.page_count == page_count
+    assert len(lxml_page.rows) > 0
+
+
+def test_parse_without_lxml(monkeypatch) -> None:
+    _logger.debug(f"---------- Test: test_parse_without_lxml")
+    monkeypatch.setattr(listing_page_parser, "lxml", None)
+    parse_listing_page.cache_clear()
+    page = parse_listing_page(
+        html=_read_resource(name="dummy-listing_xetra_stocks_page5.html"))
+    parse_listing_page.cache_clear()
+    assert page.page_count == 22
+    assert len(page.rows) == 100
+    assert page.rows[0] == ("BWB", "BAADER BANK AG", "BWB", "EUR")
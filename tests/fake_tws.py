@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+import random
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from ib_insync import util
+from ib_insync.contract import Contract, ContractDetails, Stock
+from ib_insync.objects import BarData
+from ib_insync.wrapper import RequestError
+
+
+_logger = logging.getLogger(__name__)
+
+
+class FakeTws():
+    """Simulates a TWS, that replays recorded bars and contract details.
+
+    Any number of FakeIB clients can connect to it. Answers are delayed by
+    'latency' seconds. A share of 'pacing_violation_rate' of all historical
+    data requests fails with error 162 and after 'disconnect_after' requests,
+    the TWS drops all its clients. Like IB, it rejects 'ADJUSTED_LAST'
+    requests with an 'endDateTime' with error 321. Random decisions are seeded, so runs are
+    reproducible.
+    """
+
+    def __init__(self, latency: float = 0,
+                 pacing_violation_rate: float = 0,
+                 disconnect_after: Optional[int] = None,
+                 seed: int = 0) -> None:
+        self.latency = latency
+        self.pacing_violation_rate = pacing_violation_rate
+        self.disconnect_after = disconnect_after
+        self.n_requests = 0
+        self.n_pacing_violations = 0
+        self.max_in_flight = 0
+        self.n_in_flight = 0
+        self._random = random.Random(seed)
+        self._bars: Dict[str, List[BarData]] = {}
+        self._details: Dict[str, ContractDetails] = {}
+        self._clients: Set[Tuple[int, "FakeIB"]] = set()
+
+    def add_bars(self, symbol: str, bars: List[BarData]) -> None:
+        self._bars[symbol] = sorted(bars, key=lambda bar: bar.date)
+
+    def add_contract_details(
+            self, symbol: str, details: ContractDetails) -> None:
+        self._details[symbol] = details
+
+    def generate_bars(self, symbol: str, n_days: int,
+                      end: Optional[date] = None) -> None:
+        """Create a random walk of daily bars on business days until 'end'"""
+
+        end = end or date.today()
+        bars = []
+        close = 100.0
+        day = end
+        while len(bars) < n_days:
+            if day.weekday() < 5:
+                close = max(1.0, close * (1 + self._random.gauss(0, 0.02)))
+                bars.append(BarData(
+                    date=day, open=close, high=close * 1.01,
+                    low=close * 0.99, close=close,
+                    volume=float(self._random.randint(1000, 100000))))
+            day -= timedelta(days=1)
+        self.add_bars(symbol=symbol, bars=bars)
+
+    def load(self, path: Path) -> None:
+        """Load a recording of bars and contract details from a json file"""
+
+        with open(path) as file:
+            recording = json.load(file)
+        for symbol, rows in recording.get("bars", {}).items():
+            self.add_bars(symbol=symbol, bars=[
+                BarData(date=date.fromisoformat(row[0]), open=row[1],
+                        high=row[2], low=row[3], close=row[4], volume=row[5])
+                for row in rows])
+        for symbol, fields in recording.get("details", {}).items():
+            self.add_contract_details(symbol=symbol, details=ContractDetails(
+                contract=Stock(
+                    symbol=symbol, primaryExchange=fields["primary_exchange"]),
+                stockType=fields["stock_type"],
+                industry=fields["industry"],
+                category=fields["category"],
+                subcategory=fields["subcategory"]))
+
+    def save(self, path: Path) -> None:
+        """Store all bars and contract details as a json recording"""
+
+        recording = {
+            "bars": {
+                symbol: [[bar.date.isoformat(), bar.open, bar.high, bar.low,
+                          bar.close, bar.volume] for bar in bars]
+                for symbol, bars in self._bars.items()},
+            "details": {
+                symbol: {
+                    "primary_exchange": details.contract.primaryExchange,
+                    "stock_type": details.stockType,
+                    "industry": details.industry,
+                    "category": details.category,
+                    "subcategory": details.subcategory}
+                for symbol, details in self._details.items()}}
+        with open(path, "w") as file:
+            json.dump(recording, file)
+
+    def create_client(self) -> "FakeIB":
+        """Create a client, can be used as 'ib_factory' of a
+        TwsConnectionPool"""
+
+        return FakeIB(tws=self)
+
+    # ~~~~~~~~~~~~~~~~~~~~ private methods ~~~~~~~~~~~~~~~~~~~~
+
+    def _connect(self, client: "FakeIB", client_id: int) -> None:
+        if any(id_ == client_id for id_, _ in self._clients):
+            raise ConnectionError(f"Client id {client_id} is already in use.")
+        self._clients.add((client_id, client))
+
+    def _disconnect(self, client: "FakeIB") -> None:
+        self._clients = {(id_, c) for id_, c in self._clients
+                         if c is not client}
+
+    async def _request_historical_data(
+            self, client: "FakeIB", req_id: int, contract: Contract,
+            end: Union[date, str], duration: str,
+            what_to_show: str) -> List[BarData]:
+        async with self._request(client=client):
+            if (what_to_show == "ADJUSTED_LAST") and (end != ''):
+                raise RequestError(
+                    req_id, 321, "Error validating request.-'bP' : cause - "
+                    "End date not supported with adjusted last")
+            if self._random.random() < self.pacing_violation_rate:
+                self.n_pacing_violations += 1
+                raise RequestError(
+                    req_id, 162, "Historical Market Data Service error "
+                    "message:Historical data request pacing violation")
+            end_date = date.today() if end == '' else end
+            start_date = end_date - timedelta(
+                days=_get_duration_days(duration=duration))
+            bars = [bar for bar in self._bars.get(contract.symbol, [])
+                    if start_date < bar.date <= end_date]
+            if not bars:
+                raise RequestError(
+                    req_id, 162, "Historical Market Data Service error "
+                    "message:HMDS query returned no data")
+            return bars
+
+    async def _request_contract_details(
+            self, client: "FakeIB", contract: Contract) -> List[ContractDetails]:
+        async with self._request(client=client):
+            if contract.symbol not in self._details:
+                return []
+            return [self._details[contract.symbol]]
+
+    def _request(self, client: "FakeIB") -> "_Request":
+        return _Request(tws=self, client=client)
+
+
+class FakeIB():
+    """Replaces ib_insync's IB with the methods, that TwsConnector uses"""
+
+    def __init__(self, tws: FakeTws) -> None:
+        self.RaiseRequestErrors = False
+        self._tws = tws
+        self._connected = False
+        self._next_req_id = 0
+
+    def connect(self, host: str, port: int, clientId: int,
+                readonly: bool = False) -> None:
+        self._tws._connect(client=self, client_id=clientId)
+        self._connected = True
+
+    def disconnect(self) -> None:
+        self._tws._disconnect(client=self)
+        self._connected = False
+
+    def isConnected(self) -> bool:
+        return self._connected
+
+    def sleep(self, secs: float = 0.02) -> bool:
+        return util.sleep(secs)
+
+    def reqHistoricalData(
+            self, contract: Contract, endDateTime: Union[date, str],
+            durationStr: str, barSizeSetting: str, whatToShow: str,
+            useRTH: bool) -> List[BarData]:
+        return util.run(self.reqHistoricalDataAsync(
+            contract=contract, endDateTime=endDateTime,
+            durationStr=durationStr, barSizeSetting=barSizeSetting,
+            whatToShow=whatToShow, useRTH=useRTH))
+
+    async def reqHistoricalDataAsync(
+            self, contract: Contract, endDateTime: Union[date, str],
+            durationStr: str, barSizeSetting: str, whatToShow: str,
+            useRTH: bool) -> List[BarData]:
+        self._next_req_id += 1
+        return await self._tws._request_historical_data(
+            client=self, req_id=self._next_req_id, contract=contract,
+            end=endDateTime, duration=durationStr, what_to_show=whatToShow)
+
+    def reqContractDetails(self, contract: Contract) -> List[ContractDetails]:
+        return util.run(self.reqContractDetailsAsync(contract=contract))
+
+    async def reqContractDetailsAsync(
+            self, contract: Contract) -> List[ContractDetails]:
+        return await self._tws._request_contract_details(
+            client=self, contract=contract)
+
+
+class _Request():
+    # Counts a request and checks the connection before and after answering
+
+    def __init__(self, tws: FakeTws, client: FakeIB) -> None:
+        self._tws = tws
+        self._client = client
+
+    async def __aenter__(self) -> None:
+        tws = self._tws
+        if not self._client.isConnected():
+            raise ConnectionError("Not connected")
+        tws.n_requests += 1
+        if (tws.disconnect_after is not None) and \
+                (tws.n_requests > tws.disconnect_after):
+            _logger.debug(f"Fake TWS drops all clients.")
+            for _, client in list(tws._clients):
+                client.disconnect()
+            raise ConnectionError("Socket disconnect")
+        tws.n_in_flight += 1
+        tws.max_in_flight = max(tws.max_in_flight, tws.n_in_flight)
+        await asyncio.sleep(tws.latency)
+
+    async def __aexit__(self, exc_type, exc, traceback) -> None:
+        self._tws.n_in_flight -= 1
+        if exc_type is None and not self._client.isConnected():
+            raise ConnectionError("Socket disconnect")
+
+
+def _get_duration_days(duration: str) -> int:
+    value, unit = duration.split()
+    return int(value) * {"D": 1, "W": 7, "M": 31, "Y": 365}[unit]
@@ -0,0 +1,450 @@
+import os
+from typing import Generator
+from logging import getLogger
+from datetime import date, datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, event, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from barbucket.domain_model.data_classes import Base, CompactQuote, Contract, Quote, QuotesJournalEntry, QuotesStatus, UniverseMembership
+from barbucket.persistence import data_managers
+from barbucket.persistence.data_managers import QuotesDbManager, QuotesJournalDbManager, QuotesStatusDbManager, UniverseDbManager
+from barbucket.persistence.parquet_quotes_store import ParquetQuotesStore
+from barbucket.persistence.quotes_cache import QuotesCache
+
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing DataManagers")
+
+
+@pytest.fixture
+def orm_session() -> Generator:
+    _logger.debug(f"---------- Fixture: orm_session")
+
+    def _fk_pragma_on_connect(dbapi_con, con_record):
+        dbapi_con.execute('PRAGMA foreign_keys = 1')
+
+    engine = create_engine("sqlite:///:memory:", future=True)
+    event.listen(engine, 'connect', _fk_pragma_on_connect)
+    Base.metadata.create_all(engine)
+    session = Session(engine, autoflush=False)
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def pg_session() -> Generator:
+    _logger.debug(f"---------- Fixture: pg_session")
+    # A database only for testing, all tables are dropped afterwards,
+    # e.g. 'postgresql://postgres:@/postgres?host=/tmp/pgdata'
+    url = os.environ.get("BARBUCKET_TEST_POSTGRESQL_URL")
+    if not url:
+        pytest.skip("BARBUCKET_TEST_POSTGRESQL_URL is not set")
+    engine = create_engine(url, future=True)
+    try:
+        Base.metadata.create_all(engine)
+    except OperationalError as error:
+        pytest.skip(f"PostgreSQL is not available: {error}")
+    session = Session(engine, autoflush=False)
+    contract = Contract(
+        contract_type="STOCK", exchange_symbol="SYM_0",
+        broker_symbol="SYM_0", name="Name 0", currency="EUR",
+        exchange="XETRA")
+    session.add(contract)
+    session.commit()
+    yield session
+    session.close()
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def dummy_contracts(orm_session: Session) -> Generator:
+    _logger.debug(f"---------- Fixture: dummy_contracts")
+    contracts = [
+        Contract(
+            contract_type="STOCK",
+            exchange_symbol=f"SYM_{n}",
+            broker_symbol=f"SYM_{n}",
+            name=f"Name {n}",
+            currency="EUR",
+            exchange="XETRA")
+        for n in range(3)]
+    for contract in contracts:
+        orm_session.add(UniverseMembership(
+            universe="TEST_UNIVERSE", contract=contract))
+    orm_session.commit()
+    yield contracts
+
+
+def _create_quotes(contract_id: int, days: range, close: float = 1.0) -> list:
+    return [
+        Quote(contract_id=contract_id, date=date(2022, 1, day), open=close,
+              high=close, low=close, close=close, volume=100.0)
+        for day in days]
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~ QuotesDbManager ~~~~~~~~~~~~~~~~~~~~~~~~
+
+
+def test_contract_has_quotes(
+        orm_session: Session, dummy_contracts: list) -> None:
+    _logger.debug(f"---------- Test: test_contract_has_quotes")
+    manager = QuotesDbManager(orm_session=orm_session)
+    orm_session.add_all(_create_quotes(dummy_contracts[0].id, range(3, 6)))
+    orm_session.commit()
+    assert manager.contract_has_quotes(contract=dummy_contracts[0])
+    assert not manager.contract_has_quotes(contract=dummy_contracts[1])
+
+
+def test_get_latest_quote_dates(
+        orm_session: Session, dummy_contracts: list) -> None:
+    _logger.debug(f"---------- Test: test_get_latest_quote_dates")
+    manager = QuotesDbManager(orm_session=orm_session)
+    orm_session.add_all(_create_quotes(dummy_contracts[0].id, range(3, 6)))
+    orm_session.add_all(_create_quotes(dummy_contracts[2].id, range(3, 11)))
+    orm_session.commit()
+    latest_dates = manager.get_latest_quote_dates(universe="TEST_UNIVERSE")
+    assert latest_dates == {
+        dummy_contracts[0].id: date(2022, 1, 5),
+        dummy_contracts[2].id: date(2022, 1, 10)}
+
+
+def test_upsert_to_db_insert(
+        orm_session: Session, dummy_contracts: list) -> None:
+    _logger.debug(f"---------- Test: test_upsert_to_db_insert")
+    manager = QuotesDbManager(orm_session=orm_session)
+    manager.upsert_to_db(quotes=_create_quotes(
+        dummy_contracts[0].id, range(3, 13)))
+    orm_session.commit()
+    stored = orm_session.execute(select(Quote)).scalars().all()
+    assert len(stored) == 10
+
+
+def test_upsert_to_db_overlap(
+        orm_session: Session, dummy_contracts: list) -> None:
+    _logger.debug(f"---------- Test: test_upsert_to_db_overlap")
+    manager = QuotesDbManager(orm_session=orm_session)
+    manager.upsert_to_db(quotes=_create_quotes(
+        dummy_contracts[0].id, range(3, 13), close=1.0))
+    orm_session.commit()
+    manager.upsert_to_db(quotes=_create_quotes(
+        dummy_contracts[0].id, range(10, 16), close=2.0))
+    orm_session.commit()
+    stored = orm_session.execute(
+        select(Quote.date, Quote.close).order_by(Quote.date)).all()
+    assert len(stored) == 13
+    assert stored[6] == (date(2022, 1, 9), 1.0)
+    assert stored[7] == (date(2022, 1, 10), 2.0)
+    assert stored[-1] == (date(2022, 1, 15), 2.0)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_upsert_to_db_skips_unchanged(
+        orm_session: Session, dummy_contracts: list, compact: bool) -> None:
+    _logger.debug(f"---------- Test: test_upsert_to_db_skips_unchanged")
+    manager = QuotesDbManager(orm_session=orm_session, compact=compact)
+    quotes = _create_quotes(dummy_contracts[0].id, range(3, 8), close=1.23456)
+    assert manager.upsert_to_db(quotes=quotes) == 5
+    orm_session.commit()
+    # Same values, within the rounding of the compact schema
+    assert manager.upsert_to_db(quotes=_create_quotes(
+        dummy_contracts[0].id, range(3, 8), close=1.23456)) == 0
+    changed = _create_quotes(
+        dummy_contracts[0].id, range(6, 10), close=1.23456)
+    changed[0].volume = 200.0
+    # One changed and two new quotes
+    assert manager.upsert_to_db(quotes=changed) == 3
+    orm_session.commit()
+    quotes = manager.get_quotes(as_frame=False)
+    assert len(quotes["date"]) == 7
+    assert quotes["volume"][3] == 200.0
+
+
+def test_upsert_to_db_reads_only_stored_range(
+        orm_session: Session, dummy_contracts: list, monkeypatch) -> None:
+    _logger.debug(
+        f"---------- Test: test_upsert_to_db_reads_only_stored_range")
+    manager = QuotesDbManager(orm_session=orm_session)
+    contract_id = dummy_contracts[0].id
+    manager.upsert_to_db(quotes=_create_quotes(contract_id, range(3, 13)))
+    orm_session.commit()
+    reads = []
+    get_quotes = manager.get_quotes
+
+    def mock_get_quotes(**kwargs):
+        reads.append((kwargs.get("start"), kwargs.get("end")))
+        return get_quotes(**kwargs)
+
+    monkeypatch.setattr(manager, "get_quotes", mock_get_quotes)
+    # Only the overlap until the latest stored quote is compared
+    assert manager.upsert_to_db(
+        quotes=_create_quotes(contract_id, range(10, 16)),
+        stored_until={contract_id: date(2022, 1, 12)}) == 3
+    assert reads == [(date(2022, 1, 10), date(2022, 1, 12))]
+    # Contracts without quotes are not read at all
+    assert manager.upsert_to_db(
+        quotes=_create_quotes(dummy_contracts[1].id, range(3, 8)),
+        stored_until={dummy_contracts[1].id: date.min}) == 5
+    assert len(reads) == 1
+    orm_session.commit()
+    assert len(manager.get_quotes(as_frame=False)["date"]) == 18
+
+
+def test_get_quotes_as_frame(
+        orm_session: Session, dummy_contracts: list) -> None:
+    _logger.debug(f"---------- Test: test_get_quotes_as_frame")
+    manager = QuotesDbManager(orm_session=orm_session)
+    manager.upsert_to_db(
+        quotes=_create_quotes(dummy_contracts[0].id, range(3, 8)) +
+        _create_quotes(dummy_contracts[1].id, range(3, 8), close=2.0))
+    orm_session.commit()
+    quotes = manager.get_quotes(
+        contract_ids=[dummy_contracts[1].id], start=date(2022, 1, 4),
+        end=date(2022, 1, 6), columns=["close"])
+    assert list(quotes.columns) == ["contract_id", "date", "close"]
+    assert quotes["contract_id"].tolist() == [dummy_contracts[1].id] * 3
+    assert quotes["date"].dt.day.tolist() == [4, 5, 6]
+    assert quotes["close"].tolist() == [2.0] * 3
+
+
+def test_get_quotes_as_arrays(
+        orm_session: Session, dummy_contracts: list) -> None:
+    _logger.debug(f"---------- Test: test_get_quotes_as_arrays")
+    manager = QuotesDbManager(orm_session=orm_session)
+    manager.upsert_to_db(
+        quotes=_create_quotes(dummy_contracts[1].id, range(3, 5)) +
+        _create_quotes(dummy_contracts[0].id, range(3, 5)))
+    orm_session.commit()
+    quotes = manager.get_quotes(as_frame=False)
+    assert quotes["contract_id"].tolist() == [dummy_contracts[0].id] * 2 + \
+        [dummy_contracts[1].id] * 2
+    assert quotes["date"].dtype == np.dtype("datetime64[D]")
+    assert quotes["volume"].dtype == np.dtype("float64")
+    empty = manager.get_quotes(
+        contract_ids=[dummy_contracts[2].id], as_frame=False)
+    assert len(empty["date"]) == 0
+    with pytest.raises(ValueError):
+        manager.get_quotes(columns=["adjusted_close"])
+
+
+def test_compact_schema(orm_session: Session, dummy_contracts: list) -> None:
+    _logger.debug(f"---------- Test: test_compact_schema")
+    manager = QuotesDbManager(orm_session=orm_session, compact=True)
+    manager.upsert_to_db(
+        quotes=_create_quotes(dummy_contracts[0].id, range(3, 8), close=1.5))
+    manager.upsert_to_db(quotes=[Quote(
+        contract_id=dummy_contracts[0].id, date=date(2022, 1, 7),
+        open=1.23456, high=2.0, low=1.0, close=1.5, volume=1234.6)])
+    orm_session.commit()
+    quotes = manager.get_quotes(start=date(2022, 1, 6), as_frame=False)
+    assert quotes["date"].tolist() == [date(2022, 1, 6), date(2022, 1, 7)]
+    assert quotes["close"].tolist() == [1.5, 1.5]
+    # Prices keep four decimals, volumes are rounded
+    assert quotes["open"][1] == 1.2346
+    assert quotes["volume"][1] == 1235.0
+    assert manager.get_latest_quote_date(contract=dummy_contracts[0]) == \
+        date(2022, 1, 7)
+    assert manager.get_latest_quote_dates(universe="TEST_UNIVERSE") == \
+        {dummy_contracts[0].id: date(2022, 1, 7)}
+    assert not QuotesDbManager(orm_session=orm_session).contract_has_quotes(
+        contract=dummy_contracts[0])
+    schema = orm_session.execute(text(
+        "SELECT sql FROM sqlite_master WHERE name = 'quotes_compact'")).scalar()
+    assert "WITHOUT ROWID" in schema
+
+
+def test_delete_quotes(orm_session: Session, dummy_contracts: list) -> None:
+    _logger.debug(f"---------- Test: test_delete_quotes")
+    manager = QuotesDbManager(orm_session=orm_session)
+    manager.upsert_to_db(
+        quotes=_create_quotes(dummy_contracts[0].id, range(3, 5)) +
+        _create_quotes(dummy_contracts[1].id, range(3, 5)))
+    orm_session.commit()
+    assert manager.get_contract_ids() == \
+        [dummy_contracts[0].id, dummy_contracts[1].id]
+    manager.delete_quotes(contract_ids=[dummy_contracts[0].id])
+    orm_session.commit()
+    assert manager.get_contract_ids() == [dummy_contracts[1].id]
+
+
+def test_get_quotes_of_universe(
+        orm_session: Session, dummy_contracts: list) -> None:
+    _logger.debug(f"---------- Test: test_get_quotes_of_universe")
+    manager = QuotesDbManager(orm_session=orm_session)
+    orm_session.add(Contract(
+        contract_type="STOCK", exchange_symbol="OTHER", broker_symbol="OTHER",
+        name="Other", currency="EUR", exchange="XETRA"))
+    orm_session.commit()
+    other_id = orm_session.execute(
+        select(Contract.id).where(Contract.broker_symbol == "OTHER")).scalar()
+    manager.upsert_to_db(
+        quotes=_create_quotes(dummy_contracts[2].id, range(3, 5)) +
+        _create_quotes(other_id, range(3, 5)))
+    orm_session.commit()
+    quotes = manager.get_quotes(
+        universe="TEST_UNIVERSE", columns=["close"], as_frame=False)
+    assert quotes["contract_id"].tolist() == [dummy_contracts[2].id] * 2
+
+
+def test_quotes_cache_follows_commits(
+        orm_session: Session, dummy_contracts: list, tmp_path) -> None:
+    _logger.debug(f"---------- Test: test_quotes_cache_follows_commits")
+    quotes_cache = QuotesCache(directory=tmp_path)
+    manager = QuotesDbManager(
+        orm_session=orm_session, quotes_cache=quotes_cache)
+    contract_id = dummy_contracts[0].id
+    manager.upsert_to_db(quotes=_create_quotes(contract_id, range(3, 6)))
+    orm_session.commit()
+    # Cached on first read
+    assert quotes_cache.read(contract_id=contract_id) is None
+    assert len(manager.get_quotes_array(contract_id=contract_id)) == 3
+    manager.upsert_to_db(
+        quotes=_create_quotes(contract_id, range(5, 8), close=2.0))
+    orm_session.rollback()
+    assert len(quotes_cache.read(contract_id=contract_id)) == 3
+    manager.upsert_to_db(
+        quotes=_create_quotes(contract_id, range(5, 8), close=2.0))
+    orm_session.commit()
+    quotes = manager.get_quotes_array(contract_id=contract_id)
+    assert isinstance(quotes, np.memmap)
+    assert quotes["close"].tolist() == [1.0, 1.0, 2.0, 2.0, 2.0]
+
+
+def test_get_quotes_array_without_cache(
+        orm_session: Session, dummy_contracts: list) -> None:
+    _logger.debug(f"---------- Test: test_get_quotes_array_without_cache")
+    manager = QuotesDbManager(orm_session=orm_session)
+    contract_id = dummy_contracts[0].id
+    manager.upsert_to_db(quotes=_create_quotes(contract_id, range(3, 6)))
+    orm_session.commit()
+    quotes = manager.get_quotes_array(contract_id=contract_id)
+    assert quotes["date"].astype("datetime64[D]").tolist() == \
+        [date(2022, 1, day) for day in range(3, 6)]
+    assert len(manager.get_quotes_array(
+        contract_id=dummy_contracts[1].id)) == 0
+
+
+def test_upsert_to_quotes_store(
+        orm_session: Session, dummy_contracts: list, tmp_path) -> None:
+    _logger.debug(f"---------- Test: test_upsert_to_quotes_store")
+    pytest.importorskip("pyarrow")
+    manager = QuotesDbManager(
+        orm_session=orm_session,
+        quotes_store=ParquetQuotesStore(directory=tmp_path))
+    manager.upsert_to_db(
+        quotes=_create_quotes(dummy_contracts[0].id, range(3, 6)))
+    assert (tmp_path / f"exchange=XETRA/contract_id={dummy_contracts[0].id}"
+            / "quotes.parquet").is_file()
+    assert orm_session.execute(select(Quote)).first() is None
+    assert manager.contract_has_quotes(contract=dummy_contracts[0])
+    assert not manager.contract_has_quotes(contract=dummy_contracts[1])
+    assert manager.get_latest_quote_dates(universe="TEST_UNIVERSE") == {
+        dummy_contracts[0].id: date(2022, 1, 5)}
+
+
+def test_quotes_to_csv() -> None:
+    _logger.debug(f"---------- Test: test_quotes_to_csv")
+    quotes = [Quote(contract_id=1, date=date(2022, 1, 3), open=1.5,
+                    high=2.25, low=1.0, close=2.0, volume=100.0)]
+    csv = data_managers._quotes_to_csv(quotes=quotes, table=Quote.__table__)
+    assert csv.read() == "1,2022-01-03,1.5,2.25,1.0,2.0,100.0\r\n"
+    # The compact columns are converted like by SQLAlchemy
+    csv = data_managers._quotes_to_csv(
+        quotes=quotes, table=CompactQuote.__table__)
+    assert csv.read() == "1,18995,15000,22500,10000,20000,100\r\n"
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_upsert_to_db_with_copy(pg_session: Session, compact: bool) -> None:
+    _logger.debug(f"---------- Test: test_upsert_to_db_with_copy")
+    manager = QuotesDbManager(orm_session=pg_session, compact=compact)
+    assert manager.upsert_to_db(
+        quotes=_create_quotes(1, range(3, 13), close=1.0)) == 10
+    pg_session.commit()
+    assert manager.upsert_to_db(
+        quotes=_create_quotes(1, range(10, 16), close=2.0)) == 6
+    pg_session.commit()
+    quotes = manager.get_quotes(as_frame=False)
+    assert quotes["date"].astype(date).tolist() == \
+        [date(2022, 1, day) for day in range(3, 16)]
+    assert quotes["close"].tolist() == [1.0] * 7 + [2.0] * 6
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~ QuotesJournalDbManager ~~~~~~~~~~~~~~~~~~~~~~~~
+
+
+def test_journal_add_and_delete(
+        orm_session: Session, dummy_contracts: list) -> None:
+    _logger.debug(f"---------- Test: test_journal_add_and_delete")
+    manager = QuotesJournalDbManager(orm_session=orm_session)
+    manager.add_to_db(entry=QuotesJournalEntry(
+        universe="TEST_UNIVERSE", contract_id=dummy_contracts[0].id,
+        outcome="FAILED"))
+    manager.add_to_db(entry=QuotesJournalEntry(
+        universe="OTHER_UNIVERSE", contract_id=dummy_contracts[0].id,
+        outcome="DONE"))
+    orm_session.commit()
+    # Entries are replaced, not duplicated
+    manager.add_to_db(entry=QuotesJournalEntry(
+        universe="TEST_UNIVERSE", contract_id=dummy_contracts[0].id,
+        outcome="DONE"))
+    orm_session.commit()
+    assert manager.get_outcomes(universe="TEST_UNIVERSE") == {
+        dummy_contracts[0].id: "DONE"}
+    manager.delete_universe(universe="TEST_UNIVERSE")
+    orm_session.commit()
+    assert manager.get_outcomes(universe="TEST_UNIVERSE") == {}
+    assert manager.get_outcomes(universe="OTHER_UNIVERSE") == {
+        dummy_contracts[0].id: "DONE"}
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~ QuotesStatusDbManager ~~~~~~~~~~~~~~~~~~~~~~~~
+
+
+def test_status_add_and_get(
+        orm_session: Session, dummy_contracts: list) -> None:
+    _logger.debug(f"---------- Test: test_status_add_and_get")
+    manager = QuotesStatusDbManager(orm_session=orm_session)
+    manager.add_to_db(status=QuotesStatus(
+        contract_id=dummy_contracts[1].id, status_code=3, error_code=200))
+    orm_session.commit()
+    manager.add_to_db(status=QuotesStatus(
+        contract_id=dummy_contracts[1].id, status_code=1,
+        latest_quote_requested=date(2022, 1, 5)))
+    orm_session.commit()
+    statuses = manager.get_statuses(universe="TEST_UNIVERSE")
+    assert list(statuses) == [dummy_contracts[1].id]
+    assert statuses[dummy_contracts[1].id].status_code == 1
+    assert statuses[dummy_contracts[1].id].latest_quote_requested == \
+        date(2022, 1, 5)
+
+
+def test_status_get_last_update(
+        orm_session: Session, dummy_contracts: list) -> None:
+    _logger.debug(f"---------- Test: test_status_get_last_update")
+    manager = QuotesStatusDbManager(orm_session=orm_session)
+    assert manager.get_last_update(universe="TEST_UNIVERSE") is None
+    for n, day in [(0, 5), (1, 7)]:
+        manager.add_to_db(status=QuotesStatus(
+            contract_id=dummy_contracts[n].id, status_code=1,
+            updated_at=datetime(2022, 1, day)))
+    orm_session.commit()
+    assert manager.get_last_update(universe="TEST_UNIVERSE") == \
+        datetime(2022, 1, 7)
+    assert manager.get_last_update(universe="OTHER_UNIVERSE") is None
+
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~ UniverseDbManager ~~~~~~~~~~~~~~~~~~~~~~~~
+
+
+def test_universe_get_member_ids(
+        orm_session: Session, dummy_contracts: list) -> None:
+    _logger.debug(f"---------- Test: test_universe_get_member_ids")
+    manager = UniverseDbManager(orm_session=orm_session)
+    assert manager.get_member_ids(name="TEST_UNIVERSE") == \
+        sorted(contract.id for contract in dummy_contracts)
+    assert manager.get_member_ids(name="OTHER_UNIVERSE") == []
@@ -0,0 +1,76 @@
+from logging import getLogger
+from pathlib import Path
+from typing import Generator, List
+
+import pytest
+
+from barbucket.persistence.listing_page_cache import CachedPage, ListingPageCache
+
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing ListingPageCache")
+
+
+class MockClock():
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> Generator:
+    _logger.debug(f"---------- Fixture: clock")
+    yield MockClock()
+
+
+@pytest.fixture
+def page_cache(tmp_path: Path, clock: MockClock) -> Generator:
+    _logger.debug(f"---------- Fixture: page_cache")
+    yield ListingPageCache(directory=tmp_path, ttl=60, clock=clock)
+
+
+def _get_objects(directory: Path) -> List[Path]:
+    return list(directory.glob("objects/*.html.gz"))
+
+
+def test_read_missing_page(page_cache: ListingPageCache) -> None:
+    _logger.debug(f"---------- Test: test_read_missing_page")
+    assert page_cache.read(exchange="NYSE", page=1) is None
+
+
+def test_write_and_read_page(
+        page_cache: ListingPageCache, clock: MockClock) -> None:
+    _logger.debug(f"---------- Test: test_write_and_read_page")
+    page_cache.write(exchange="NYSE", page=1, cached_page=CachedPage(
+        html="<html>ä</html>", etag='"v1"', last_modified="yesterday"))
+    cached_page = page_cache.read(exchange="NYSE", page=1)
+    assert cached_page == CachedPage(
+        html="<html>ä</html>", etag='"v1"', last_modified="yesterday",
+        fetched_at=1000.0)
+    assert page_cache.is_fresh(cached_page=cached_page)
+    clock.now += 60
+    assert not page_cache.is_fresh(cached_page=cached_page)
+
+
+def test_identical_pages_share_content(
+        page_cache: ListingPageCache, tmp_path: Path) -> None:
+    _logger.debug(f"---------- Test: test_identical_pages_share_content")
+    for exchange in ["NYSE", "IBIS"]:
+        page_cache.write(exchange=exchange, page=3,
+                         cached_page=CachedPage(html="<html></html>"))
+    assert len(_get_objects(directory=tmp_path)) == 1
+
+
+def test_prune_unused_content(
+        page_cache: ListingPageCache, tmp_path: Path) -> None:
+    _logger.debug(f"---------- Test: test_prune_unused_content")
+    page_cache.write(exchange="NYSE", page=1,
+                     cached_page=CachedPage(html="old"))
+    page_cache.write(exchange="NYSE", page=1,
+                     cached_page=CachedPage(html="new"))
+    assert len(_get_objects(directory=tmp_path)) == 2
+    page_cache.prune()
+    assert len(_get_objects(directory=tmp_path)) == 1
+    assert page_cache.read(exchange="NYSE", page=1).html == "new"
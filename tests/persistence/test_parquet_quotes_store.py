@@ -0,0 +1,114 @@
+from typing import Generator, List
+from logging import getLogger
+from pathlib import Path
+from datetime import date
+
+import pytest
+
+from barbucket.domain_model.data_classes import Quote
+from barbucket.persistence import parquet_quotes_store
+from barbucket.persistence.parquet_quotes_store import ParquetQuotesStore
+
+
+pytest.importorskip("pyarrow")
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing ParquetQuotesStore")
+
+
+@pytest.fixture
+def quotes_store(tmp_path: Path) -> Generator:
+    _logger.debug(f"---------- Fixture: quotes_store")
+    yield ParquetQuotesStore(directory=tmp_path)
+
+
+def _create_quotes(contract_id: int, days: range,
+                   close: float = 1.0) -> List[Quote]:
+    return [
+        Quote(contract_id=contract_id, date=date(2022, 1, day), open=close,
+              high=close, low=close, close=close, volume=100.0)
+        for day in days]
+
+
+def test_upsert_partitions(
+        quotes_store: ParquetQuotesStore, tmp_path: Path) -> None:
+    _logger.debug(f"---------- Test: test_upsert_partitions")
+    quotes_store.upsert(
+        quotes=_create_quotes(1, range(3, 6)) + _create_quotes(2, range(3, 5)),
+        exchanges={1: "XETRA", 2: "NYSE"})
+    assert (tmp_path / "exchange=XETRA/contract_id=1/quotes.parquet").is_file()
+    assert (tmp_path / "exchange=NYSE/contract_id=2/quotes.parquet").is_file()
+    table = quotes_store.read()
+    assert table.num_rows == 5
+    assert table["contract_id"].to_pylist() == [1, 1, 1, 2, 2]
+
+
+def test_upsert_replaces_overlap(quotes_store: ParquetQuotesStore) -> None:
+    _logger.debug(f"---------- Test: test_upsert_replaces_overlap")
+    quotes_store.upsert(
+        quotes=_create_quotes(1, range(3, 8)), exchanges={1: "XETRA"})
+    quotes_store.upsert(
+        quotes=_create_quotes(1, range(6, 11), close=2.0),
+        exchanges={1: "XETRA"})
+    table = quotes_store.read(contract_ids=[1], columns=["close"])
+    assert table["date"].to_pylist() == \
+        [date(2022, 1, day) for day in range(3, 11)]
+    assert table["close"].to_pylist() == [1.0] * 3 + [2.0] * 5
+
+
+def test_read_filters_and_projects(quotes_store: ParquetQuotesStore) -> None:
+    _logger.debug(f"---------- Test: test_read_filters_and_projects")
+    quotes_store.upsert(
+        quotes=_create_quotes(1, range(3, 11)) +
+        _create_quotes(2, range(3, 11)),
+        exchanges={1: "XETRA", 2: "XETRA"})
+    table = quotes_store.read(
+        contract_ids=[2], start=date(2022, 1, 5), end=date(2022, 1, 7),
+        columns=["close"])
+    assert table.column_names == ["contract_id", "date", "close"]
+    assert table["contract_id"].to_pylist() == [2, 2, 2]
+    assert table["date"].to_pylist() == \
+        [date(2022, 1, 5), date(2022, 1, 6), date(2022, 1, 7)]
+
+
+def test_read_empty_store(quotes_store: ParquetQuotesStore) -> None:
+    _logger.debug(f"---------- Test: test_read_empty_store")
+    table = quotes_store.read(columns=["close"])
+    assert table.num_rows == 0
+    assert table.column_names == ["contract_id", "date", "close"]
+    assert quotes_store.get_latest_quote_dates() == {}
+
+
+def test_get_latest_quote_dates(quotes_store: ParquetQuotesStore) -> None:
+    _logger.debug(f"---------- Test: test_get_latest_quote_dates")
+    quotes_store.upsert(
+        quotes=_create_quotes(1, range(3, 6)) + _create_quotes(2, range(3, 9)),
+        exchanges={1: "XETRA", 2: "NYSE"})
+    assert quotes_store.get_latest_quote_dates() == {
+        1: date(2022, 1, 5), 2: date(2022, 1, 8)}
+    assert quotes_store.get_latest_quote_dates(contract_ids=[2]) == {
+        2: date(2022, 1, 8)}
+
+
+def test_read_contracts_opens_only_their_files(
+        quotes_store: ParquetQuotesStore, monkeypatch) -> None:
+    _logger.debug(
+        f"---------- Test: test_read_contracts_opens_only_their_files")
+    quotes_store.upsert(
+        quotes=[quote for contract_id in range(1, 51)
+                for quote in _create_quotes(contract_id, range(3, 6))],
+        exchanges={contract_id: ("XETRA" if contract_id % 2 else "NYSE")
+                   for contract_id in range(1, 51)})
+    sources = []
+    create_dataset = parquet_quotes_store.ds.dataset
+
+    def mock_dataset(source, **kwargs):
+        sources.append(source)
+        return create_dataset(source, **kwargs)
+
+    monkeypatch.setattr(parquet_quotes_store.ds, "dataset", mock_dataset)
+    table = quotes_store.read(contract_ids=[7, 8], columns=["close"])
+    assert table["contract_id"].to_pylist() == [7, 7, 7, 8, 8, 8]
+    assert [Path(path).parent.name for path in sources[0]] == \
+        ["contract_id=7", "contract_id=8"]
+    assert quotes_store.read(contract_ids=[99]).num_rows == 0
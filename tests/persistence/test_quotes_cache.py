@@ -0,0 +1,87 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Generator, List
+from logging import getLogger
+from pathlib import Path
+from datetime import date
+
+import numpy as np
+import pytest
+
+from barbucket.domain_model.data_classes import Quote
+from barbucket.persistence.quotes_cache import QUOTES_DTYPE, QuotesCache, quotes_to_array
+
+
+_logger = getLogger(__name__)
+_logger.debug(f"--------- ---------- Testing QuotesCache")
+
+
+@pytest.fixture
+def quotes_cache(tmp_path: Path) -> Generator:
+    _logger.debug(f"---------- Fixture: quotes_cache")
+    yield QuotesCache(directory=tmp_path)
+
+
+def _create_quotes(contract_id: int, days: range,
+                   close: float = 1.0) -> List[Quote]:
+    return [
+        Quote(contract_id=contract_id, date=date(2022, 1, day), open=close,
+              high=close, low=close, close=close, volume=100.0)
+        for day in days]
+
+
+def test_read_missing(quotes_cache: QuotesCache) -> None:
+    _logger.debug(f"---------- Test: test_read_missing")
+    assert quotes_cache.read(contract_id=1) is None
+
+
+def test_write_and_read(quotes_cache: QuotesCache) -> None:
+    _logger.debug(f"---------- Test: test_write_and_read")
+    quotes = quotes_to_array(quotes=_create_quotes(1, range(5, 2, -1)))
+    quotes_cache.write(contract_id=1, quotes=quotes)
+    cached = quotes_cache.read(contract_id=1)
+    assert isinstance(cached, np.memmap)
+    assert cached.dtype == QUOTES_DTYPE
+    assert not cached.flags.writeable
+    assert list(cached["date"].astype("datetime64[D]").tolist()) == \
+        [date(2022, 1, 3), date(2022, 1, 4), date(2022, 1, 5)]
+
+
+def test_write_empty(quotes_cache: QuotesCache) -> None:
+    _logger.debug(f"---------- Test: test_write_empty")
+    quotes_cache.write(
+        contract_id=1, quotes=np.empty(0, dtype=QUOTES_DTYPE))
+    assert len(quotes_cache.read(contract_id=1)) == 0
+
+
+def test_write_concurrently(
+        quotes_cache: QuotesCache, tmp_path: Path) -> None:
+    _logger.debug(f"---------- Test: test_write_concurrently")
+    quotes = quotes_to_array(quotes=_create_quotes(1, range(1, 30)))
+
+    def write(_: int) -> None:
+        quotes_cache.write(contract_id=1, quotes=quotes)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(write, range(200)))
+    assert len(quotes_cache.read(contract_id=1)) == 29
+    assert list(tmp_path.glob("**/*.tmp")) == []
+
+
+def test_update_replaces_overlap(quotes_cache: QuotesCache) -> None:
+    _logger.debug(f"---------- Test: test_update_replaces_overlap")
+    quotes_cache.write(
+        contract_id=1,
+        quotes=quotes_to_array(quotes=_create_quotes(1, range(3, 8))))
+    old_map = quotes_cache.read(contract_id=1)
+    quotes_cache.update(quotes=_create_quotes(1, range(6, 11), close=2.0))
+    cached = quotes_cache.read(contract_id=1)
+    assert len(cached) == 8
+    assert cached["close"].tolist() == [1.0] * 3 + [2.0] * 5
+    # Open maps keep their version
+    assert len(old_map) == 5
+
+
+def test_update_skips_uncached(quotes_cache: QuotesCache) -> None:
+    _logger.debug(f"---------- Test: test_update_skips_uncached")
+    quotes_cache.update(quotes=_create_quotes(2, range(3, 5)))
+    assert quotes_cache.read(contract_id=2) is None
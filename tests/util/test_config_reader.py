@@ -68,3 +68,34 @@ def test_read_list_value(dummy_filepath: Path) -> None:
         section="section_2",
         option="option_21")
     assert value == ["11", "22", "Something", "33.4"]
+
+
+@pytest.fixture
+def baseline_filepath(mock_filepath: Path) -> Generator:
+    """Creating config file, as created by versions without the latest
+    options"""
+    _logger.debug(f"---------- Fixture: baseline_filepath")
+    baseline_file = "tests/_resources/config/config_baseline.cfg"
+    Path.mkdir(mock_filepath.parent, parents=True, exist_ok=True)
+    copyfile(baseline_file, mock_filepath)
+    yield mock_filepath
+
+
+def test_read_missing_option_from_defaults(baseline_filepath: Path) -> None:
+    _logger.debug(f"---------- Test: test_read_missing_option_from_defaults")
+    config_reader = ConfigReader(filepath=baseline_filepath)
+    assert config_reader.get_config_value_list(
+        section="tws_connector", option="quotes_client_ids") == ["1"]
+    assert config_reader.get_config_value_list(
+        section="tws_connector", option="additional_gateways") == [""]
+
+
+def test_user_value_overrides_default(dummy_filepath: Path) -> None:
+    _logger.debug(f"---------- Test: test_user_value_overrides_default")
+    with open(dummy_filepath, 'a') as writer:
+        writer.write("\n[tws_connector]\nport = 4002\n")
+    config_reader = ConfigReader(filepath=dummy_filepath)
+    assert config_reader.get_config_value_single(
+        section="tws_connector", option="port") == "4002"
+    assert config_reader.get_config_value_single(
+        section="tws_connector", option="host") == "127.0.0.1"